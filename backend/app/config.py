@@ -11,16 +11,127 @@ OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 PINECONE_API_KEY = os.getenv("PINECONE_API_KEY")
 PINECONE_INDEX_NAME = os.getenv("PINECONE_INDEX_NAME")
 DATABASE_URL = os.getenv("DATABASE_URL")
+# 'pinecone' queries the remote index; 'local' serves the chunks from memory-mapped files
+# written by the ingestion script, which is enough for a corpus of a few PDFs.
+VECTOR_STORE_BACKEND = os.getenv("VECTOR_STORE_BACKEND", "pinecone").lower()
+LOCAL_INDEX_DIR = os.getenv("LOCAL_INDEX_DIR", os.path.join(os.path.dirname(__file__), '..', 'vector_index'))
+# How often the backend re-reads which index version is live, and how long ingestion keeps
+# the replaced version around. The grace period must be longer than the check interval.
+VECTOR_VERSION_CHECK_SECONDS = int(os.getenv("VECTOR_VERSION_CHECK_SECONDS", "30"))
+VECTOR_VERSION_GRACE_SECONDS = int(os.getenv("VECTOR_VERSION_GRACE_SECONDS", "900"))
 
 # --- Validation ---
 # We check for the key here, so the app fails fast if it's missing.
 if not OPENAI_API_KEY:
     raise ValueError("FATAL ERROR: OPENAI_API_KEY is not set in your .env file.")
-if not PINECONE_API_KEY or not PINECONE_INDEX_NAME:
+if VECTOR_STORE_BACKEND == "pinecone" and (not PINECONE_API_KEY or not PINECONE_INDEX_NAME):
     raise ValueError("FATAL ERROR: Pinecone API key or index name is not set in your .env file.")
 if not DATABASE_URL:
     raise ValueError("FATAL ERROR: DATABASE_URL is not set in your .env file.")
 
+# --- OpenAI HTTP Connection Pool ---
+# Shared by every chat model and the embeddings client (see services/openai_clients.py).
+OPENAI_MAX_CONNECTIONS = int(os.getenv("OPENAI_MAX_CONNECTIONS", "100"))
+OPENAI_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("OPENAI_MAX_KEEPALIVE_CONNECTIONS", "20"))
+OPENAI_KEEPALIVE_EXPIRY_SECONDS = float(os.getenv("OPENAI_KEEPALIVE_EXPIRY_SECONDS", "60"))
+OPENAI_CONNECT_TIMEOUT_SECONDS = float(os.getenv("OPENAI_CONNECT_TIMEOUT_SECONDS", "5"))
+OPENAI_READ_TIMEOUT_SECONDS = float(os.getenv("OPENAI_READ_TIMEOUT_SECONDS", "60"))
+OPENAI_MAX_RETRIES = int(os.getenv("OPENAI_MAX_RETRIES", "2"))
+
+# --- Scheduling Database Pool ---
+# Applies to both engines in services/database.py. Supabase closes idle pooler connections,
+# so connections are recycled well before that and checked with a ping on checkout.
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT_SECONDS = float(os.getenv("DB_POOL_TIMEOUT_SECONDS", "10"))
+DB_POOL_RECYCLE_SECONDS = int(os.getenv("DB_POOL_RECYCLE_SECONDS", "1800"))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() == "true"
+# Server-side limit per statement; 0 disables it.
+DB_STATEMENT_TIMEOUT_MS = int(os.getenv("DB_STATEMENT_TIMEOUT_MS", "5000"))
+# Statements slower than this are logged as warnings with the turn's trace ID; faster ones at debug level.
+DB_SLOW_QUERY_MS = float(os.getenv("DB_SLOW_QUERY_MS", "200"))
+# Run scheduling queries on asyncpg instead of psycopg2 in worker threads (PostgreSQL only).
+DB_ASYNC_ENGINE = os.getenv("DB_ASYNC_ENGINE", "true").lower() == "true"
+# Set when DATABASE_URL points at a transaction-mode pooler (Supabase port 6543), which
+# cannot keep asyncpg's named prepared statements between transactions.
+DB_TRANSACTION_POOLER = os.getenv("DB_TRANSACTION_POOLER", "false").lower() == "true"
+# Check at startup that the slot hold table and the free-slot index on "Schedule" exist,
+# creating them if not (the index concurrently).
+DB_ENSURE_SCHEMA = os.getenv("DB_ENSURE_SCHEMA", "true").lower() == "true"
+
+# --- Slot Search ---
+# When the requested window is full, the same query also returns the first slots of the
+# next days with availability in that window, looking this many days ahead.
+SLOT_SEARCH_HORIZON_DAYS = int(os.getenv("SLOT_SEARCH_HORIZON_DAYS", "30"))
+SLOT_SEARCH_NEXT_DAYS = int(os.getenv("SLOT_SEARCH_NEXT_DAYS", "3"))
+SLOT_SEARCH_SLOTS_PER_DAY = int(os.getenv("SLOT_SEARCH_SLOTS_PER_DAY", "3"))
+
+# --- Availability Cache ---
+# Free slots per (position, day) are kept in memory, so most searches skip the database.
+# Bookings update it write-through and reach the other workers and replicas through PostgreSQL
+# LISTEN/NOTIFY; the TTL bounds staleness when a notification cannot arrive (e.g. behind a
+# transaction pooler, which does not support LISTEN). 0 days disables the cache.
+AVAILABILITY_CACHE_MAX_DAYS = int(os.getenv("AVAILABILITY_CACHE_MAX_DAYS", "4096"))
+AVAILABILITY_CACHE_TTL_SECONDS = int(os.getenv("AVAILABILITY_CACHE_TTL_SECONDS", "300"))
+AVAILABILITY_NOTIFY = os.getenv("AVAILABILITY_NOTIFY", "true").lower() == "true"
+
+# --- Slot Holds ---
+# Slots presented to a candidate are reserved for their session for this many minutes, so the
+# slot they confirm is not booked by someone else meanwhile. 0 disables holds (PostgreSQL only).
+SLOT_HOLD_MINUTES = int(os.getenv("SLOT_HOLD_MINUTES", "5"))
+# Expired holds are ignored right away; the sweeper deletes them this often, BATCH rows at a time.
+SLOT_HOLD_SWEEP_SECONDS = int(os.getenv("SLOT_HOLD_SWEEP_SECONDS", "60"))
+SLOT_HOLD_SWEEP_BATCH = int(os.getenv("SLOT_HOLD_SWEEP_BATCH", "500"))
+
+# --- Session Store ---
+# 'memory' keeps sessions in-process (single worker only); 'sqlite' shares them between
+# the workers of one host; 'redis' shares them between workers and replicas.
+SESSION_BACKEND = os.getenv("SESSION_BACKEND", "memory").lower()
+SESSION_SQLITE_PATH = os.getenv("SESSION_SQLITE_PATH", "/tmp/chatbot_sessions.sqlite3")
+REDIS_URL = os.getenv("REDIS_URL")
+# Bounds for the session store; idle sessions are evicted after the TTL.
+SESSION_MAX_ENTRIES = int(os.getenv("SESSION_MAX_ENTRIES", "10000"))
+SESSION_IDLE_TTL_SECONDS = int(os.getenv("SESSION_IDLE_TTL_SECONDS", "1800"))
+SESSION_MAX_MEMORY_MB = int(os.getenv("SESSION_MAX_MEMORY_MB", "256"))
+
+# --- Conversation History Budgets ---
+# Verbatim history each node sends to its LLM (one turn = user message + reply).
+ROUTER_HISTORY_MAX_TURNS = int(os.getenv("ROUTER_HISTORY_MAX_TURNS", "4"))
+ROUTER_HISTORY_MAX_TOKENS = int(os.getenv("ROUTER_HISTORY_MAX_TOKENS", "1500"))
+SQL_HISTORY_MAX_TURNS = int(os.getenv("SQL_HISTORY_MAX_TURNS", "6"))
+SQL_HISTORY_MAX_TOKENS = int(os.getenv("SQL_HISTORY_MAX_TOKENS", "3000"))
+# Messages older than the last KEEP are folded into a rolling summary, BATCH at a time.
+HISTORY_SUMMARY_KEEP_MESSAGES = int(os.getenv("HISTORY_SUMMARY_KEEP_MESSAGES", "12"))
+HISTORY_SUMMARY_BATCH_MESSAGES = int(os.getenv("HISTORY_SUMMARY_BATCH_MESSAGES", "8"))
+HISTORY_SUMMARY_MODEL = os.getenv("HISTORY_SUMMARY_MODEL", "gpt-4o-mini")
+# Tokenizer used to count history tokens, loaded on first use; empty to always use the
+# approximate count (about four characters per token), which needs no BPE file download.
+HISTORY_TOKENIZER_MODEL = os.getenv("HISTORY_TOKENIZER_MODEL", "gpt-4o")
+
+# --- Router Decision Cache ---
+ROUTER_CACHE_MAX_ENTRIES = int(os.getenv("ROUTER_CACHE_MAX_ENTRIES", "2048"))
+ROUTER_CACHE_TTL_SECONDS = int(os.getenv("ROUTER_CACHE_TTL_SECONDS", "3600"))
+
+# --- Query Embedding Cache ---
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "text-embedding-3-small")
+EMBEDDING_CACHE_MAX_ENTRIES = int(os.getenv("EMBEDDING_CACHE_MAX_ENTRIES", "4096"))
+EMBEDDING_CACHE_TTL_SECONDS = int(os.getenv("EMBEDDING_CACHE_TTL_SECONDS", "86400"))
+# Optional SQLite file shared by the workers of a host and kept across restarts; empty disables it.
+EMBEDDING_CACHE_PATH = os.getenv("EMBEDDING_CACHE_PATH", "")
+# 'float16' halves the memory and disk footprint at a negligible cost in retrieval quality.
+EMBEDDING_CACHE_DTYPE = os.getenv("EMBEDDING_CACHE_DTYPE", "float32")
+
+# --- Semantic Answer Cache ---
+# RAG answers are reused for questions about the same role whose embeddings are at least this
+# similar (cosine). 0 entries disables the cache.
+ANSWER_CACHE_SIMILARITY_THRESHOLD = float(os.getenv("ANSWER_CACHE_SIMILARITY_THRESHOLD", "0.95"))
+ANSWER_CACHE_MAX_ENTRIES_PER_ROLE = int(os.getenv("ANSWER_CACHE_MAX_ENTRIES_PER_ROLE", "256"))
+ANSWER_CACHE_TTL_SECONDS = int(os.getenv("ANSWER_CACHE_TTL_SECONDS", "86400"))
+
+# --- Speculative Retrieval ---
+# When the session already has a role, start retrieval for the message while the router LLM runs.
+SPECULATIVE_RETRIEVAL = os.getenv("SPECULATIVE_RETRIEVAL", "true").lower() == "true"
+
 # --- Job Role Mapping (remains the same) ---
 JOB_ROLE_MAPPING = {
     "data_analyst": {
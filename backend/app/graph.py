@@ -1,20 +1,27 @@
-from typing import TypedDict, List, Optional
+from typing import Any, TypedDict, List, Optional
 from langgraph.graph import StateGraph, END
 from langchain_core.messages import BaseMessage
 
 # Import the real nodes
-from .services.router import intelligent_router_node
+from .services.speculative import router_node
 from .services.rag_system import rag_node
 from .services.sql_database import sql_node
 from .services.end_detection import end_conversation_node
+from .services.metrics import timed_node
 
 class GraphState(TypedDict):
+    # Owner of the slot holds taken while scheduling (see services/slot_holds.py)
+    session_id: Optional[str]
     user_message: str
     conversation_history: List[BaseMessage]
+    history_summary: Optional[str]
     bot_response: str
     next_node: str
     logs: List[str]
     current_job_role: Optional[str]
+    role_mention_only: Optional[bool]
+    # Retrieval started by the router for the RAG node (see services/speculative.py)
+    speculative_retrieval: Optional[Any]
     booking_status: Optional[str]
     conversation_ended: Optional[bool]
     new_session_required: Optional[bool]
@@ -24,10 +31,11 @@ class GraphState(TypedDict):
 # --- Graph Definition ---
 workflow = StateGraph(GraphState)
 
-workflow.add_node("router", intelligent_router_node)
-workflow.add_node("rag_system", rag_node)
-workflow.add_node("sql_database", sql_node)
-workflow.add_node("end_conversation", end_conversation_node)
+# Every node is timed, labelled with the route and role the turn ended up on
+workflow.add_node("router", timed_node("router", router_node))
+workflow.add_node("rag_system", timed_node("rag_system", rag_node))
+workflow.add_node("sql_database", timed_node("sql_database", sql_node))
+workflow.add_node("end_conversation", timed_node("end_conversation", end_conversation_node))
 
 workflow.set_entry_point("router")
 
@@ -17,10 +17,13 @@ logger = logging.getLogger(__name__)
 load_dotenv()
 
 import os
-from typing import List, Optional
+import json
+import asyncio
+from typing import Dict, List, Optional
 from uuid import uuid4
-from fastapi import FastAPI
+from fastapi import FastAPI, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 from langchain_core.messages import HumanMessage, AIMessage
 
@@ -30,9 +33,11 @@ def validate_environment_variables():
     required_vars = {
         "OPENAI_API_KEY": os.getenv("OPENAI_API_KEY"),
         "DATABASE_URL": os.getenv("DATABASE_URL"),
-        "PINECONE_API_KEY": os.getenv("PINECONE_API_KEY"),
-        "PINECONE_INDEX_NAME": os.getenv("PINECONE_INDEX_NAME")
     }
+    # Pinecone credentials are only needed when retrieval is not served from the local index
+    if os.getenv("VECTOR_STORE_BACKEND", "pinecone").lower() == "pinecone":
+        required_vars["PINECONE_API_KEY"] = os.getenv("PINECONE_API_KEY")
+        required_vars["PINECONE_INDEX_NAME"] = os.getenv("PINECONE_INDEX_NAME")
     
     missing_vars = [var for var, value in required_vars.items() if not value]
     
@@ -57,7 +62,23 @@ except Exception as e:
 
 # Import our compiled graph and config AFTER loading .env
 from .graph import compiled_graph, GraphState
-from .config import JOB_ROLE_MAPPING
+from .config import (
+    JOB_ROLE_MAPPING, SESSION_BACKEND, SESSION_SQLITE_PATH, REDIS_URL,
+    SESSION_MAX_ENTRIES, SESSION_IDLE_TTL_SECONDS, SESSION_MAX_MEMORY_MB, DB_ENSURE_SCHEMA,
+)
+from .services.session_store import create_session_store, new_session_state
+from .services.session_locks import SessionLockManager
+from .services.history import needs_compaction, summarize_overflow, apply_compaction
+from .services.fast_path import fast_path_matcher
+from .services.router import router_cache
+from .services.rag_system import embedding_cache, vector_store, answer_cache
+from .services.speculative import speculation_stats
+from .services.openai_clients import pool_stats as openai_pool_stats, close_http_clients
+from .services import metrics
+from .services.tracing import start_trace, RequestTrace
+from .services.database import engine as database_engine, pool_stats as database_pool_stats, dispose_engines
+from .services.schedule_schema import check_schedule_schema
+from .services.sql_database import availability_cache, availability_listener, slot_holds
 
 class ChatRequest(BaseModel):
     session_id: str
@@ -69,6 +90,9 @@ class ChatResponse(BaseModel):
     new_session_required: Optional[bool] = False
     new_session_id: Optional[str] = None
     welcome_message: Optional[str] = None
+    trace_id: Optional[str] = None
+    # Milliseconds per stage (router, retrieval, generation, sql) and in total, as in Server-Timing
+    timings: Optional[Dict[str, float]] = None
 
 app = FastAPI(
     title="Production-Ready Chatbot API",
@@ -85,9 +109,23 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Server-Timing", "X-Request-ID"],
 )
 
-SESSIONS = {}
+SESSIONS = create_session_store(
+    backend=SESSION_BACKEND,
+    max_entries=SESSION_MAX_ENTRIES,
+    idle_ttl_seconds=SESSION_IDLE_TTL_SECONDS,
+    max_memory_bytes=SESSION_MAX_MEMORY_MB * 1024 * 1024,
+    sqlite_path=SESSION_SQLITE_PATH,
+    redis_url=REDIS_URL,
+)
+# Serializes concurrent turns of the same session (double-submits, Streamlit reruns)
+SESSION_LOCKS = SessionLockManager()
+# Strong references to fire-and-forget tasks so they are not garbage collected mid-run
+BACKGROUND_TASKS = set()
+# Long-running tasks stopped at shutdown: the availability listener and the slot hold sweeper
+SERVICE_TASKS: List[asyncio.Task] = []
 
 @app.on_event("startup")
 async def startup_event():
@@ -95,8 +133,27 @@ async def startup_event():
     logger.info("🚀 FastAPI application starting up...")
     logger.info(f"📊 Environment: {'Production' if os.getenv('ENVIRONMENT') == 'production' else 'Development'}")
     logger.info(f"🔧 Debug mode: {os.getenv('DEBUG', 'False')}")
+    logger.info(f"🗂️ Session backend: {SESSIONS.backend}")
+    logger.info(f"📚 Vector store backend: {vector_store.backend}")
+    if DB_ENSURE_SCHEMA:
+        # In the background, so building the index on a large table does not delay startup
+        task = asyncio.create_task(asyncio.to_thread(check_schedule_schema, database_engine))
+        BACKGROUND_TASKS.add(task)
+        task.add_done_callback(BACKGROUND_TASKS.discard)
+    if availability_listener is not None:
+        SERVICE_TASKS.append(asyncio.create_task(availability_listener.run()))
+    if slot_holds is not None:
+        SERVICE_TASKS.append(asyncio.create_task(slot_holds.run_sweeper()))
     logger.info("✅ Application startup completed")
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Stop the service tasks and close the shared OpenAI and database connection pools."""
+    for task in SERVICE_TASKS:
+        task.cancel()
+    await close_http_clients()
+    await dispose_engines()
+
 @app.get("/")
 def read_root():
     logger.info("📡 Root endpoint called")
@@ -116,15 +173,71 @@ async def health_check():
     }
     
     # Check if all required services are available
-    all_healthy = all(env_status.values())
+    required_status = dict(env_status)
+    if vector_store.backend != "pinecone":
+        del required_status["pinecone_api_key"], required_status["pinecone_index_name"]
+    all_healthy = all(required_status.values())
     
     return {
         "status": "healthy" if all_healthy else "unhealthy",
         "environment_variables": env_status,
+        "sessions": await SESSIONS.stats(),
+        "session_locks": SESSION_LOCKS.stats(),
+        "router_fast_path": fast_path_matcher.stats(),
+        "router_cache": router_cache.stats(),
+        "embedding_cache": embedding_cache.stats(),
+        "vector_store": vector_store.stats(),
+        "answer_cache": answer_cache.stats(),
+        "speculative_retrieval": speculation_stats.stats(),
+        "openai_http_pool": openai_pool_stats.stats(),
+        "database_pool": database_pool_stats(),
+        "availability_cache": {**availability_cache.stats(),
+                               **(availability_listener.stats() if availability_listener else {"listening": False})},
+        "slot_holds": slot_holds.stats() if slot_holds else {"enabled": False},
         "timestamp": str(uuid4()),
         "version": "1.0.0"
     }
 
+def collect_cache_lookups() -> dict:
+    """Hits and misses of every cache, read from the counters the caches already keep."""
+    fast_path = fast_path_matcher.stats()
+    router = router_cache.stats()
+    embedding = embedding_cache.stats()
+    answer = answer_cache.stats()
+    availability = availability_cache.stats()
+    return {
+        ("router_fast_path", "hit"): sum(fast_path["hits"].values()),
+        ("router_fast_path", "miss"): fast_path["misses"],
+        ("router_cache", "hit"): router["hits"],
+        ("router_cache", "miss"): router["misses"],
+        ("embedding_cache", "hit"): embedding["memory_hits"] + embedding["disk_hits"],
+        ("embedding_cache", "miss"): embedding["misses"],
+        ("embedding_cache", "coalesced"): embedding["coalesced"],
+        ("answer_cache", "hit"): answer["hits"],
+        ("answer_cache", "miss"): answer["misses"],
+        ("availability_cache", "hit"): availability["hits"],
+        ("availability_cache", "miss"): availability["misses"],
+    }
+
+metrics.register_callback(
+    "chatbot_cache_lookups_total", "Cache lookups by cache and result.", "counter", ("cache", "result"),
+    collect_cache_lookups)
+metrics.register_callback(
+    "chatbot_active_turns", "Sessions with a turn in progress.", "gauge", (),
+    lambda: {(): SESSION_LOCKS.stats()["active_locks"]})
+metrics.register_callback(
+    "chatbot_openai_http_total", "Requests and new connections on the shared OpenAI HTTP pool.", "counter", ("event",),
+    lambda: {("request",): openai_pool_stats.requests, ("connection_opened",): openai_pool_stats.connections_opened})
+
+@app.get("/metrics")
+async def metrics_endpoint():
+    """Prometheus scrape endpoint."""
+    sessions = await SESSIONS.stats()
+    # Redis keeps no session count without a full key scan
+    if "active_sessions" in sessions:
+        metrics.SESSIONS.set(sessions["active_sessions"])
+    return Response(metrics.render(), media_type=metrics.CONTENT_TYPE_LATEST)
+
 @app.get("/env-test")
 async def environment_test():
     """Test endpoint to verify environment variables (without exposing values)."""
@@ -149,96 +262,216 @@ async def environment_test():
         ])
     }
 
+GRAPH_NODES = ("router", "rag_system", "sql_database", "end_conversation")
+# Nodes whose LLM output is the user-facing answer and is therefore streamed as tokens.
+STREAMED_NODES = ("rag_system", "sql_database")
+
+async def prepare_graph_run(session_id: str, user_message: str):
+    """Loads (or creates) the session, records the user turn and builds the graph inputs."""
+    session = await SESSIONS.get(session_id)
+    if session is None:
+        # Persisted by finalize_turn at the end of the turn, saving a store round trip
+        session = new_session_state()
+        metrics.SESSIONS_CREATED.inc()
+        logger.info(f"🆕 New session created: {session_id[:8]}...")
+
+    conversation_history = session["conversation_history"]
+    conversation_history.append(HumanMessage(content=user_message))
+
+    inputs = {
+        "session_id": session_id,
+        "user_message": user_message,
+        "conversation_history": conversation_history,
+        "history_summary": session.get("history_summary"),
+        "logs": [],
+        "current_job_role": session.get("current_job_role"),
+        "booking_status": session.get("booking_status")
+    }
+
+    config = {
+        "configurable": {"session_id": session_id},
+        "recursion_limit": 25  # Increase recursion limit for debugging
+    }
+    return inputs, config, session
+
+async def finalize_turn(session_id: str, session: dict, response_state: GraphState, trace: RequestTrace) -> ChatResponse:
+    """Applies the graph result to the session store and builds the response."""
+    bot_response = response_state.get("bot_response", "Sorry, I encountered an error.")
+    logs = response_state.get("logs", [])
+
+    session["conversation_history"].append(AIMessage(content=bot_response))
+
+    # Check if conversation has ended and new session is required
+    conversation_ended = response_state.get("conversation_ended", False)
+    new_session_required = response_state.get("new_session_required", False)
+
+    new_session_id: Optional[str] = None
+    welcome_message: Optional[str] = None
+
+    if conversation_ended and new_session_required:
+        # Clean up the current session
+        await SESSIONS.delete(session_id)
+        logs.append(f"Session {session_id} cleaned up - creating a new session")
+        logger.info(f"🔄 Session ended and cleanup completed: {session_id[:8]}...")
+
+        # Create a brand new session id and initialize empty state
+        new_session_id = str(uuid4())
+        await SESSIONS.create(new_session_id)
+        logs.append(f"New session created: {new_session_id}")
+
+        # Build a standard welcome message with available roles
+        friendly_names = [role['friendly_name'] for role in JOB_ROLE_MAPPING.values()]
+        welcome_message = (
+            "Hello! I'm an AI career assistant. I can help you with the following open positions:\n"
+            f"- {'\n- '.join(friendly_names)}\n\n"
+            "Which role are you interested in learning more about?"
+        )
+    else:
+        # Update session state with the new values from the graph and persist the turn
+        session.update({
+            "current_job_role": response_state.get("current_job_role"),
+            "booking_status": response_state.get("booking_status")
+        })
+        await SESSIONS.save(session_id, session)
+
+    return ChatResponse(
+        bot_response=bot_response,
+        logs=logs,
+        new_session_required=new_session_required,
+        new_session_id=new_session_id,
+        welcome_message=welcome_message,
+        trace_id=trace.trace_id,
+        timings=trace.timings_ms(),
+    )
+
+async def compact_session_history(session_id: str, session: dict):
+    """Folds old turns of a session into its rolling summary, off the request path."""
+    try:
+        # The summary LLM call runs without the session lock so the next turn is not delayed
+        compaction = await summarize_overflow(session)
+        if compaction is None:
+            return
+        async with SESSION_LOCKS.hold(session_id):
+            current = await SESSIONS.get(session_id)
+            if current is not None and apply_compaction(current, compaction):
+                await SESSIONS.save(session_id, current)
+                logger.info(f"🧾 History compacted for session: {session_id[:8]}...")
+    except Exception as e:
+        logger.error(f"💥 History compaction failed for session {session_id[:8]}...: {str(e)}")
+
+def schedule_history_compaction(session_id: str, session: dict, response: ChatResponse):
+    """Starts a background compaction once enough old turns have accumulated."""
+    if response.new_session_required or not needs_compaction(session):
+        return
+    task = asyncio.create_task(compact_session_history(session_id, session))
+    BACKGROUND_TASKS.add(task)
+    task.add_done_callback(BACKGROUND_TASKS.discard)
+
 @app.post("/chat", response_model=ChatResponse)
-async def chat_endpoint(request: ChatRequest):
-    logger.info(f"💬 Chat endpoint called - Session: {request.session_id[:8]}...")
+async def chat_endpoint(request: ChatRequest, http_request: Request, http_response: Response):
+    trace = start_trace(http_request.headers.get("X-Request-ID"))
+    http_response.headers["X-Request-ID"] = trace.trace_id
+    logger.info(f"💬 Chat endpoint called - Session: {request.session_id[:8]}... - Trace: {trace.trace_id}")
     
     try:
         session_id = request.session_id
-        if session_id not in SESSIONS:
-            SESSIONS[session_id] = {
-                "conversation_history": [],
-                "current_job_role": None,
-                "booking_status": None
-            }
-            logger.info(f"🆕 New session created: {session_id[:8]}...")
-        
-        conversation_history = SESSIONS[session_id]["conversation_history"]
-        conversation_history.append(HumanMessage(content=request.user_message))
-
-        inputs = {
-            "user_message": request.user_message,
-            "conversation_history": conversation_history,
-            "logs": [],
-            "current_job_role": SESSIONS[session_id].get("current_job_role"),
-            "booking_status": SESSIONS[session_id].get("booking_status")
-        }
-        
-        config = {
-            "configurable": {"session_id": session_id},
-            "recursion_limit": 25  # Increase recursion limit for debugging
-        }
-        
-        logger.info(f"🔄 Invoking graph for session: {session_id[:8]}...")
-        response_state: GraphState = compiled_graph.invoke(inputs, config)
-        
-        bot_response = response_state.get("bot_response", "Sorry, I encountered an error.")
-        logs = response_state.get("logs", [])
-        
-        conversation_history.append(AIMessage(content=bot_response))
-        
-        # Check if conversation has ended and new session is required
-        conversation_ended = response_state.get("conversation_ended", False)
-        new_session_required = response_state.get("new_session_required", False)
-
-        new_session_id: Optional[str] = None
-        welcome_message: Optional[str] = None
-
-        if conversation_ended and new_session_required:
-            # Clean up the current session
-            if session_id in SESSIONS:
-                del SESSIONS[session_id]
-            logs.append(f"Session {session_id} cleaned up - creating a new session")
-            logger.info(f"🔄 Session ended and cleanup completed: {session_id[:8]}...")
-
-            # Create a brand new session id and initialize empty state
-            new_session_id = str(uuid4())
-            SESSIONS[new_session_id] = {
-                "conversation_history": [],
-                "current_job_role": None,
-                "booking_status": None
-            }
-            logs.append(f"New session created: {new_session_id}")
-
-            # Build a standard welcome message with available roles
-            friendly_names = [role['friendly_name'] for role in JOB_ROLE_MAPPING.values()]
-            welcome_message = (
-                "Hello! I'm an AI career assistant. I can help you with the following open positions:\n"
-                f"- {'\n- '.join(friendly_names)}\n\n"
-                "Which role are you interested in learning more about?"
-            )
-        else:
-            # Update session state with the new values from the graph (only if session still exists)
-            if session_id in SESSIONS:
-                SESSIONS[session_id].update({
-                    "current_job_role": response_state.get("current_job_role"),
-                    "booking_status": response_state.get("booking_status")
-                })
-
-        logger.info(f"✅ Chat response generated successfully for session: {session_id[:8]}...")
-        return ChatResponse(
-            bot_response=bot_response,
-            logs=logs,
-            new_session_required=new_session_required,
-            new_session_id=new_session_id,
-            welcome_message=welcome_message,
-        )
+        # Turns of one session run in order; the lock covers load, graph run and save
+        async with SESSION_LOCKS.hold(session_id):
+            inputs, config, session = await prepare_graph_run(session_id, request.user_message)
+            
+            logger.info(f"🔄 Invoking graph for session: {session_id[:8]}...")
+            response_state: GraphState = await compiled_graph.ainvoke(inputs, config)
+            
+            response = await finalize_turn(session_id, session, response_state, trace)
+        schedule_history_compaction(session_id, session, response)
+        http_response.headers["Server-Timing"] = trace.server_timing()
+        logger.info(f"✅ Chat response generated successfully for session: {session_id[:8]}... - {trace.server_timing()}")
+        return response
     except Exception as e:
         import traceback
+        metrics.ERRORS.inc(component="endpoint", operation="chat")
         error_msg = f"Error in chat endpoint: {str(e)}"
-        logger.error(f"💥 Chat endpoint error: {error_msg}")
+        logger.error(f"💥 Chat endpoint error (trace {trace.trace_id}): {error_msg}")
         logger.error(f"📋 Traceback: {traceback.format_exc()}")
+        http_response.headers["Server-Timing"] = trace.server_timing()
         return ChatResponse(
             bot_response="I'm sorry, I encountered an error. Please try again.",
-            logs=[error_msg]
+            logs=[error_msg],
+            trace_id=trace.trace_id,
+            timings=trace.timings_ms(),
         )
+
+def format_sse(event: str, data: dict) -> str:
+    """Formats a single server-sent event."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+@app.post("/chat/stream")
+async def chat_stream_endpoint(request: ChatRequest, http_request: Request):
+    """
+    Streams a chat turn as server-sent events:
+    - `node`: a graph node started
+    - `route`: the router's decision and the resulting role state
+    - `token`: a chunk of the answer as the LLM generates it
+    - `done`: the final ChatResponse, sent after the session has been updated
+    - `error`: the turn failed
+    Headers are sent before the turn runs, so the stage timings travel in the `done`
+    payload instead of a Server-Timing header.
+    """
+    trace_id = start_trace(http_request.headers.get("X-Request-ID")).trace_id
+    logger.info(f"💬 Chat stream endpoint called - Session: {request.session_id[:8]}... - Trace: {trace_id}")
+
+    async def event_stream():
+        # The body is streamed from another task, so the trace is started again in its context
+        trace = start_trace(trace_id)
+        try:
+            session_id = request.session_id
+            async with SESSION_LOCKS.hold(session_id):
+                inputs, config, session = await prepare_graph_run(session_id, request.user_message)
+
+                logger.info(f"🔄 Streaming graph for session: {session_id[:8]}...")
+                response_state: Optional[GraphState] = None
+                async for event in compiled_graph.astream_events(inputs, config, version="v2"):
+                    kind = event["event"]
+                    node = event.get("metadata", {}).get("langgraph_node")
+
+                    if kind == "on_chain_start" and event["name"] in GRAPH_NODES and node == event["name"]:
+                        yield format_sse("node", {"node": node})
+                    elif kind == "on_chain_end" and event["name"] == "router" and node == "router":
+                        output = event["data"].get("output") or {}
+                        yield format_sse("route", {
+                            "next_node": output.get("next_node"),
+                            "current_job_role": output.get("current_job_role"),
+                        })
+                    elif kind == "on_chat_model_stream" and node in STREAMED_NODES:
+                        content = event["data"]["chunk"].content
+                        if content:
+                            yield format_sse("token", {"node": node, "content": content})
+                    elif kind == "on_chain_end" and not event.get("parent_ids"):
+                        # The root run has no parents; its output is the final graph state.
+                        response_state = event["data"].get("output")
+
+                if response_state is None:
+                    raise RuntimeError("Graph stream finished without a final state")
+
+                response = await finalize_turn(session_id, session, response_state, trace)
+            schedule_history_compaction(session_id, session, response)
+            logger.info(f"✅ Chat stream completed successfully for session: {session_id[:8]}... - {trace.server_timing()}")
+            yield format_sse("done", response.model_dump())
+        except Exception as e:
+            import traceback
+            metrics.ERRORS.inc(component="endpoint", operation="chat_stream")
+            error_msg = f"Error in chat stream endpoint: {str(e)}"
+            logger.error(f"💥 Chat stream endpoint error (trace {trace.trace_id}): {error_msg}")
+            logger.error(f"📋 Traceback: {traceback.format_exc()}")
+            yield format_sse("error", ChatResponse(
+                bot_response="I'm sorry, I encountered an error. Please try again.",
+                logs=[error_msg],
+                trace_id=trace.trace_id,
+                timings=trace.timings_ms(),
+            ).model_dump())
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no", "X-Request-ID": trace_id},
+    )
@@ -0,0 +1,109 @@
+import time
+import threading
+from typing import Dict, List, Optional
+import numpy as np
+
+class _RoleAnswers:
+    """Cached answers of one role: a matrix of unit question vectors and the matching rows."""
+
+    def __init__(self):
+        self.vectors: Optional[np.ndarray] = None
+        self.expires_at = np.empty(0)
+        self.answers: List[str] = []
+        # Seconds the original retrieval and generation took, i.e. what a hit saves
+        self.costs: List[float] = []
+
+    def keep(self, mask: np.ndarray) -> None:
+        self.vectors = self.vectors[mask]
+        self.expires_at = self.expires_at[mask]
+        self.answers = [answer for answer, kept in zip(self.answers, mask) if kept]
+        self.costs = [cost for cost, kept in zip(self.costs, mask) if kept]
+
+class SemanticAnswerCache:
+    """
+    RAG answers cached per role and looked up by question embedding: a new question whose
+    cosine similarity to a cached one reaches the threshold gets the cached answer.
+    Entries are bound to the index revision they were generated from, so re-ingestion
+    drops them all.
+    """
+
+    def __init__(self, similarity_threshold: float, max_entries_per_role: int, ttl_seconds: float):
+        self.similarity_threshold = similarity_threshold
+        self.max_entries_per_role = max_entries_per_role
+        self.ttl_seconds = ttl_seconds
+        self.revision: Optional[str] = None
+        self._roles: Dict[str, _RoleAnswers] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.saved_seconds = 0.0
+
+    @staticmethod
+    def _unit(vector: np.ndarray) -> np.ndarray:
+        vector = np.asarray(vector, dtype=np.float32)
+        return vector / (np.linalg.norm(vector) or 1.0)
+
+    def _check_revision(self, revision: Optional[str]) -> None:
+        if revision != self.revision:
+            if self._roles:
+                self.invalidations += 1
+            self._roles.clear()
+            self.revision = revision
+
+    def lookup(self, role_id: str, vector: np.ndarray, revision: Optional[str]) -> Optional[str]:
+        with self._lock:
+            self._check_revision(revision)
+            bucket = self._roles.get(role_id)
+            if bucket is None or not bucket.answers:
+                self.misses += 1
+                return None
+            scores = bucket.vectors @ self._unit(vector)
+            scores[bucket.expires_at < time.monotonic()] = -np.inf
+            best = int(np.argmax(scores))
+            if scores[best] < self.similarity_threshold:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.saved_seconds += bucket.costs[best]
+            return bucket.answers[best]
+
+    def store(self, role_id: str, vector: np.ndarray, answer: str, cost_seconds: float,
+              revision: Optional[str]) -> None:
+        if self.max_entries_per_role <= 0:
+            return
+        with self._lock:
+            self._check_revision(revision)
+            bucket = self._roles.setdefault(role_id, _RoleAnswers())
+            row = self._unit(vector)[np.newaxis, :]
+            now = time.monotonic()
+            if bucket.vectors is None:
+                bucket.vectors = row
+            else:
+                bucket.keep(bucket.expires_at >= now)
+                bucket.vectors = np.vstack([bucket.vectors, row])
+            bucket.expires_at = np.append(bucket.expires_at, now + self.ttl_seconds)
+            bucket.answers.append(answer)
+            bucket.costs.append(cost_seconds)
+            # Oldest entries go first once the role is full
+            overflow = len(bucket.answers) - self.max_entries_per_role
+            if overflow > 0:
+                bucket.keep(np.arange(len(bucket.answers)) >= overflow)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._roles.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": {role_id: len(bucket.answers) for role_id, bucket in self._roles.items()},
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "saved_seconds": round(self.saved_seconds, 3),
+                "avg_saved_ms": round(self.saved_seconds / self.hits * 1000, 1) if self.hits else 0.0,
+                "invalidations": self.invalidations,
+                "revision": self.revision,
+            }
@@ -0,0 +1,221 @@
+import asyncio
+import logging
+import time
+from array import array
+from bisect import bisect_left
+from collections import OrderedDict
+from datetime import date, timedelta
+from typing import Awaitable, Callable, Dict, Hashable, Optional
+from sqlalchemy import text
+from .database import async_database_url
+
+logger = logging.getLogger(__name__)
+
+# Bookings are broadcast on this channel, so every worker and replica can update its cache.
+# Payload: "<position>\t<YYYY-MM-DD>\t<HH:MM>" for a booked slot, or "*" to drop everything.
+AVAILABILITY_CHANNEL = "schedule_availability"
+RESET_PAYLOAD = "*"
+
+NOTIFY_QUERY = text("SELECT pg_notify(:channel, :payload)")
+FREE_SLOTS_QUERY = text("""
+    SELECT date, time FROM "Schedule"
+    WHERE available = TRUE AND position = :position AND date BETWEEN :first_date AND :last_date
+    ORDER BY date, time;
+""")
+
+def minute_of_day(value) -> int:
+    return value.hour * 60 + value.minute
+
+def format_slot(day: date, minute: int) -> str:
+    return f"{day:%Y-%m-%d} {minute // 60:02d}:{minute % 60:02d}"
+
+def load_free_slots(connection, position: str, first_date: date, last_date: date) -> Dict[date, array]:
+    """Free slots of every day in the range as sorted minutes since midnight; days without any are empty."""
+    days = {first_date + timedelta(days=offset): array("H") for offset in range((last_date - first_date).days + 1)}
+    rows = connection.execute(FREE_SLOTS_QUERY, {"position": position, "first_date": first_date, "last_date": last_date})
+    for slot_date, slot_time in rows:
+        days[slot_date].append(minute_of_day(slot_time))
+    return days
+
+def without_slots(days: Dict[date, array], slots) -> Dict[date, array]:
+    """Copy of `days` without the given (date, time) slots; the cached arrays are left untouched."""
+    excluded = {}
+    for slot_date, slot_time in slots:
+        excluded.setdefault(slot_date, set()).add(minute_of_day(slot_time))
+    if not excluded:
+        return days
+    return {day: array("H", (minute for minute in minutes if minute not in excluded[day])) if day in excluded else minutes
+            for day, minutes in days.items()}
+
+def notify_booking(connection, position: str, day: date, minute: int) -> None:
+    """Announces a booking; NOTIFY is transactional, so it is only delivered if the booking commits."""
+    if connection.dialect.name == "postgresql":
+        connection.execute(NOTIFY_QUERY, {"channel": AVAILABILITY_CHANNEL,
+                                          "payload": f"{position}\t{day.isoformat()}\t{minute // 60:02d}:{minute % 60:02d}"})
+
+def notify_reset(connection) -> None:
+    """Tells every cache to drop its availability, e.g. after the schedule was reseeded."""
+    connection.execute(NOTIFY_QUERY, {"channel": AVAILABILITY_CHANNEL, "payload": RESET_PAYLOAD})
+
+class AvailabilityCache:
+    """
+    Free slots per (position, day) as compact sorted arrays of minutes since midnight.
+    A search reads its whole date range from memory, or loads the range in one query on a miss.
+    Bookings remove their slot write-through, and bookings in other processes arrive through
+    LISTEN/NOTIFY (see AvailabilityListener); the TTL bounds staleness if a notification is missed.
+    """
+
+    def __init__(self, max_days: int, ttl_seconds: float):
+        self.max_days = max_days
+        self.ttl_seconds = ttl_seconds
+        # (position, day) -> (expires_at, free minutes), least recently used first
+        self._days: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        # Bumped on every change, so a load that raced with a booking is not stored
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.updates = 0
+        self.notifications = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_days > 0
+
+    def _cached_range(self, position: str, first_date: date, last_date: date) -> Optional[Dict[date, array]]:
+        now = time.monotonic()
+        days = {}
+        for offset in range((last_date - first_date).days + 1):
+            day = first_date + timedelta(days=offset)
+            entry = self._days.get((position, day))
+            if entry is None or entry[0] < now:
+                return None
+            days[day] = entry[1]
+        for day in days:
+            self._days.move_to_end((position, day))
+        return days
+
+    async def free_slots(self, position: str, first_date: date, last_date: date,
+                         load: Callable[[str, date, date], Awaitable[Dict[date, array]]]) -> Dict[date, array]:
+        """Returns the free slots of every day in the range, calling `load` only if any day is missing or expired."""
+        days = self._cached_range(position, first_date, last_date)
+        if days is not None:
+            self.hits += 1
+            return days
+        self.misses += 1
+        generation = self._generation
+        days = await load(position, first_date, last_date)
+        if generation == self._generation:
+            expires_at = time.monotonic() + self.ttl_seconds
+            for day, minutes in days.items():
+                self._days[(position, day)] = (expires_at, minutes)
+                self._days.move_to_end((position, day))
+            while len(self._days) > self.max_days:
+                self._days.popitem(last=False)
+                self.evictions += 1
+        return days
+
+    def remove_slot(self, position: str, day: date, minute: int) -> None:
+        """Write-through for a slot that is no longer free."""
+        self._generation += 1
+        entry = self._days.get((position, day))
+        if entry is None:
+            return
+        minutes = entry[1]
+        index = bisect_left(minutes, minute)
+        if index < len(minutes) and minutes[index] == minute:
+            # Replaced rather than modified, since a search may still hold the old array
+            self._days[(position, day)] = (entry[0], minutes[:index] + minutes[index + 1:])
+            self.updates += 1
+
+    def invalidate_day(self, position: str, day: date) -> None:
+        """Drops a day whose cached state is in doubt, so the next search reloads it."""
+        self._generation += 1
+        self._days.pop((position, day), None)
+
+    def clear(self) -> None:
+        self._generation += 1
+        self._days.clear()
+
+    def apply_notification(self, payload: str) -> None:
+        self.notifications += 1
+        if payload == RESET_PAYLOAD:
+            self.clear()
+            return
+        try:
+            position, day, slot_time = payload.split("\t")
+            hours, minutes = slot_time.split(":")
+            self.remove_slot(position, date.fromisoformat(day), int(hours) * 60 + int(minutes))
+        except ValueError:
+            logger.warning(f"⚠️ Ignoring malformed availability notification: {payload!r}")
+            self.clear()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "days": len(self._days),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "write_through_updates": self.updates,
+            "notifications": self.notifications,
+        }
+
+class AvailabilityListener:
+    """
+    Keeps a dedicated asyncpg connection LISTENing for bookings made by other processes.
+    Notifications sent while it is disconnected are lost, so the cache is cleared on every
+    (re)connect. Transaction-mode poolers do not support LISTEN; the TTL covers that setup.
+    """
+
+    def __init__(self, cache: AvailabilityCache, dsn: str, connect_args: dict, retry_seconds: float = 5.0):
+        self.cache = cache
+        self.dsn = dsn
+        self.connect_args = connect_args
+        self.retry_seconds = retry_seconds
+        self.listening = False
+        self.connected = asyncio.Event()
+        self.reconnects = 0
+
+    @classmethod
+    def from_url(cls, cache: AvailabilityCache, url: str) -> "AvailabilityListener":
+        # asyncpg takes a plain postgresql:// DSN
+        parsed, connect_args = async_database_url(url)
+        return cls(cache, parsed.set(drivername="postgresql").render_as_string(hide_password=False), connect_args)
+
+    def _on_notification(self, connection, pid, channel, payload) -> None:
+        self.cache.apply_notification(payload)
+
+    async def run(self) -> None:
+        # Imported here so SQLite setups do not need asyncpg installed
+        import asyncpg
+        while True:
+            try:
+                connection = await asyncpg.connect(self.dsn, **self.connect_args)
+            except Exception as e:
+                logger.warning(f"⚠️ Availability listener could not connect: {e}")
+                await asyncio.sleep(self.retry_seconds)
+                continue
+            closed = asyncio.Event()
+            connection.add_termination_listener(lambda _: closed.set())
+            try:
+                await connection.add_listener(AVAILABILITY_CHANNEL, self._on_notification)
+                self.cache.clear()
+                self.listening = True
+                self.connected.set()
+                await closed.wait()
+                logger.warning("⚠️ Availability listener connection lost; reconnecting")
+            except Exception as e:
+                logger.warning(f"⚠️ Availability listener failed: {e}")
+            finally:
+                self.listening = False
+                self.connected.clear()
+                if not connection.is_closed():
+                    await connection.close()
+            self.reconnects += 1
+            await asyncio.sleep(self.retry_seconds)
+
+    def stats(self) -> dict:
+        return {"listening": self.listening, "reconnects": self.reconnects}
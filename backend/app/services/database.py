@@ -0,0 +1,172 @@
+import asyncio
+import logging
+import time
+from typing import Callable, Optional, TypeVar
+from uuid import uuid4
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine, URL, make_url
+from sqlalchemy.pool import QueuePool
+from ..config import (
+    DATABASE_URL, DB_POOL_SIZE, DB_MAX_OVERFLOW, DB_POOL_TIMEOUT_SECONDS, DB_POOL_RECYCLE_SECONDS,
+    DB_POOL_PRE_PING, DB_STATEMENT_TIMEOUT_MS, DB_SLOW_QUERY_MS, DB_ASYNC_ENGINE, DB_TRANSACTION_POOLER,
+)
+from prometheus_client import Histogram
+from .metrics import register_callback
+from .tracing import current_trace_id
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+POOL_CHECKOUT_SECONDS = Histogram(
+    "chatbot_db_pool_checkout_seconds", "Time to get a scheduling database connection from the pool, including the pre-ping.",
+    ("engine",), buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 10.0))
+
+def sync_database_url(url: str) -> URL:
+    if url.startswith("postgres://"):
+        url = "postgresql://" + url[len("postgres://"):]
+    parsed = make_url(url)
+    if parsed.drivername == "postgresql":
+        # psycopg2 is the driver we ship; newer SQLAlchemy releases default to psycopg 3
+        parsed = parsed.set(drivername="postgresql+psycopg2")
+    return parsed
+
+def async_database_url(url: str):
+    """Returns the asyncpg URL and connect arguments; asyncpg takes `ssl` instead of libpq's `sslmode`."""
+    parsed = sync_database_url(url).set(drivername="postgresql+asyncpg")
+    query = dict(parsed.query)
+    sslmode = query.pop("sslmode", None)
+    connect_args = {}
+    if sslmode and sslmode != "disable":
+        connect_args["ssl"] = sslmode
+    return parsed.set(query=query), connect_args
+
+def pool_options() -> dict:
+    return {
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_timeout": DB_POOL_TIMEOUT_SECONDS,
+        "pool_recycle": DB_POOL_RECYCLE_SECONDS,
+        "pool_pre_ping": DB_POOL_PRE_PING,
+    }
+
+# The trace ID is logged next to each statement's duration rather than added to the SQL text:
+# a per-turn comment would make every statement unique and defeat asyncpg's prepared statement cache.
+def start_statement_timer(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("statement_started", []).append(time.perf_counter())
+
+def log_statement_with_trace_id(conn, cursor, statement, parameters, context, executemany):
+    elapsed_ms = (time.perf_counter() - conn.info["statement_started"].pop()) * 1000
+    level = logging.WARNING if elapsed_ms >= DB_SLOW_QUERY_MS else logging.DEBUG
+    if logger.isEnabledFor(level):
+        logger.log(level, f"🗄️ SQL {elapsed_ms:.1f} ms trace_id={current_trace_id() or '-'}: {' '.join(statement.split())[:120]}")
+
+def handle_statement_error(context) -> None:
+    # A failed statement never reaches after_cursor_execute, so its start time is dropped here
+    started = context.connection.info.get("statement_started") if context.connection is not None else None
+    if started:
+        started.pop()
+
+def instrument_engine(engine: Engine) -> None:
+    event.listen(engine, "before_cursor_execute", start_statement_timer)
+    event.listen(engine, "after_cursor_execute", log_statement_with_trace_id)
+    event.listen(engine, "handle_error", handle_statement_error)
+
+def create_database_engine(url: str) -> Engine:
+    parsed = sync_database_url(url)
+    if parsed.get_backend_name() == "sqlite":
+        # Local runs and tests; SQLite brings its own single-connection pools
+        engine = create_engine(parsed)
+    else:
+        connect_args = {"options": f"-c statement_timeout={DB_STATEMENT_TIMEOUT_MS}"} if DB_STATEMENT_TIMEOUT_MS else {}
+        engine = create_engine(parsed, connect_args=connect_args, **pool_options())
+    instrument_engine(engine)
+    return engine
+
+def create_async_database_engine(url: str):
+    # Imported here so the sync-only setup does not need asyncpg and greenlet installed
+    from sqlalchemy.ext.asyncio import create_async_engine
+    parsed, connect_args = async_database_url(url)
+    if DB_STATEMENT_TIMEOUT_MS:
+        connect_args["server_settings"] = {"statement_timeout": str(DB_STATEMENT_TIMEOUT_MS)}
+    if DB_TRANSACTION_POOLER:
+        # The pooler may hand each transaction a different server connection
+        connect_args["statement_cache_size"] = 0
+        connect_args["prepared_statement_name_func"] = lambda: f"__asyncpg_{uuid4()}__"
+        parsed = parsed.update_query_dict({"prepared_statement_cache_size": "0"})
+    engine = create_async_engine(parsed, connect_args=connect_args, **pool_options())
+    instrument_engine(engine.sync_engine)
+    return engine
+
+# --- Engines ---
+# The sync engine serves scripts and SQLite; scheduling queries use the async engine when enabled.
+engine = create_database_engine(DATABASE_URL)
+async_engine = (
+    create_async_database_engine(DATABASE_URL)
+    if DB_ASYNC_ENGINE and engine.dialect.name == "postgresql" else None
+)
+
+def _run_on_sync_engine(work: Callable[..., T], args: tuple, write: bool) -> T:
+    started = time.perf_counter()
+    with engine.connect() as connection:
+        POOL_CHECKOUT_SECONDS.labels(engine="sync").observe(time.perf_counter() - started)
+        if not write:
+            return work(connection, *args)
+        with connection.begin():
+            return work(connection, *args)
+
+async def run_query(work: Callable[..., T], *args, write: bool = False) -> T:
+    """
+    Runs `work(connection, *args)` on a pooled connection and returns its result.
+    With `write`, the work runs in a transaction committed when it returns.
+    On the async engine the work runs on the event loop through `run_sync`; otherwise
+    it runs in a worker thread on the sync engine.
+    """
+    if async_engine is None:
+        return await asyncio.to_thread(_run_on_sync_engine, work, args, write)
+    started = time.perf_counter()
+    async with async_engine.connect() as connection:
+        POOL_CHECKOUT_SECONDS.labels(engine="async").observe(time.perf_counter() - started)
+        if not write:
+            return await connection.run_sync(work, *args)
+        async with connection.begin():
+            return await connection.run_sync(work, *args)
+
+def active_pool() -> Optional[QueuePool]:
+    pool = (async_engine.sync_engine if async_engine is not None else engine).pool
+    return pool if isinstance(pool, QueuePool) else None
+
+def pool_stats() -> dict:
+    pool = active_pool()
+    if pool is None:
+        return {"engine": "sync", "pooled": False}
+    checked_out = pool.checkedout()
+    capacity = DB_POOL_SIZE + max(DB_MAX_OVERFLOW, 0)
+    return {
+        "engine": "async" if async_engine is not None else "sync",
+        "pooled": True,
+        "checked_out": checked_out,
+        "idle": pool.checkedin(),
+        "capacity": capacity,
+        "saturation": round(checked_out / capacity, 4) if capacity else 0.0,
+    }
+
+def collect_pool_connections() -> dict:
+    stats = pool_stats()
+    return {(state,): stats[state] for state in ("checked_out", "idle") if state in stats}
+
+def collect_pool_saturation() -> dict:
+    stats = pool_stats()
+    return {(): stats["saturation"]} if "saturation" in stats else {}
+
+register_callback(
+    "chatbot_db_pool_connections", "Scheduling database connections by state.", "gauge", ("state",),
+    collect_pool_connections)
+register_callback(
+    "chatbot_db_pool_saturation", "Checked-out connections as a share of pool size plus overflow.", "gauge", (),
+    collect_pool_saturation)
+
+async def dispose_engines() -> None:
+    if async_engine is not None:
+        await async_engine.dispose()
+    engine.dispose()
@@ -0,0 +1,118 @@
+import asyncio
+import hashlib
+import sqlite3
+import threading
+from typing import Awaitable, Callable, Dict, List, Optional
+import numpy as np
+from .cache import TTLCache
+from .metrics import external_call
+
+def normalize_query(text: str) -> str:
+    """Collapses whitespace and case so trivially different queries share an embedding."""
+    return " ".join(text.lower().split())
+
+class DiskVectorStore:
+    """
+    SQLite file of embedding vectors keyed by hash, shared by all workers on a host
+    and kept across restarts. Vectors are stored as raw float16/float32 bytes.
+    """
+
+    def __init__(self, path: str, dtype: str):
+        self.dtype = np.dtype(dtype)
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        self._connection.execute("PRAGMA busy_timeout=5000")
+        self._connection.execute("CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, vector BLOB NOT NULL)")
+
+    def get(self, key: str) -> Optional[np.ndarray]:
+        with self._lock:
+            row = self._connection.execute("SELECT vector FROM embeddings WHERE key = ?", (key,)).fetchone()
+        return np.frombuffer(row[0], dtype=self.dtype) if row else None
+
+    def set(self, key: str, vector: np.ndarray) -> None:
+        with self._lock:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO embeddings (key, vector) VALUES (?, ?)",
+                (key, vector.astype(self.dtype).tobytes()),
+            )
+
+class EmbeddingCache:
+    """
+    Two-tier cache for query embeddings: an in-process LRU in front of an optional
+    on-disk store. Keys combine the embedding model name with the normalized text,
+    so changing the model never serves stale vectors. Concurrent requests for the same
+    text share one API call.
+    """
+
+    def __init__(self, model_name: str, embed: Callable[[str], Awaitable[List[float]]],
+                 max_entries: int, ttl_seconds: float,
+                 disk_path: Optional[str] = None, dtype: str = "float32"):
+        self.model_name = model_name
+        self.embed = embed
+        self.dtype = np.dtype(dtype)
+        self.memory = TTLCache(max_entries=max_entries, ttl_seconds=ttl_seconds)
+        self.disk = DiskVectorStore(disk_path, dtype) if disk_path else None
+        self.disk_hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        # key -> embedding call in progress
+        self._inflight: Dict[str, asyncio.Task] = {}
+
+    def key(self, text: str) -> str:
+        return hashlib.sha256(f"{self.model_name}\0{normalize_query(text)}".encode("utf-8")).hexdigest()
+
+    async def embed_query(self, text: str) -> np.ndarray:
+        """Returns the embedding of `text`, calling the embedding API only on a miss in both tiers."""
+        key = self.key(text)
+        vector = self.memory.get(key)
+        if vector is not None:
+            return vector
+        if self.disk is not None:
+            vector = await asyncio.to_thread(self.disk.get, key)
+            if vector is not None:
+                self.disk_hits += 1
+                self.memory.set(key, vector)
+                return vector
+
+        # The API call runs as its own task, so a caller being cancelled never fails the others
+        task = self._inflight.get(key)
+        if task is None:
+            self.misses += 1
+            task = asyncio.ensure_future(self._embed_and_store(key, text))
+            self._inflight[key] = task
+            task.add_done_callback(lambda done: self._forget(key, done))
+        else:
+            self.coalesced += 1
+        return await asyncio.shield(task)
+
+    def _forget(self, key: str, task: asyncio.Task) -> None:
+        self._inflight.pop(key, None)
+        # Mark a failure as retrieved even if every caller was cancelled before it happened
+        if not task.cancelled():
+            task.exception()
+
+    async def _embed_and_store(self, key: str, text: str) -> np.ndarray:
+        with external_call("openai", "embedding"):
+            vector = np.asarray(await self.embed(text), dtype=self.dtype)
+        # Cached arrays are shared between requests, so they must never be modified
+        vector.flags.writeable = False
+        self.memory.set(key, vector)
+        if self.disk is not None:
+            await asyncio.to_thread(self.disk.set, key, vector)
+        return vector
+
+    def stats(self) -> dict:
+        memory = self.memory.stats()
+        lookups = memory["hits"] + self.disk_hits + self.misses
+        return {
+            "memory_entries": memory["entries"],
+            "memory_hits": memory["hits"],
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "hit_rate": round((memory["hits"] + self.disk_hits) / lookups, 4) if lookups else 0.0,
+            "dtype": self.dtype.name,
+            "disk_enabled": self.disk is not None,
+        }
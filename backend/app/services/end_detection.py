@@ -1,5 +1,9 @@
 
-def end_conversation_node(state):
+# Phrases that close the conversation; also used by the router's fast path.
+SIGN_OFF_PHRASES = ['thank you, that\'s all', 'goodbye', 'no more questions', 'that\'s it', 'thanks, bye', 'end of conversation']
+NOT_INTERESTED_PHRASES = ['not interested', 'no interest', 'not for me', 'not what i\'m looking for']
+
+async def end_conversation_node(state):
     """
     Handles the end of the conversation by setting a final message and signaling session restart.
     """
@@ -12,12 +16,11 @@ def end_conversation_node(state):
     user_message_lower = state['user_message'].lower()
     
     # Check for sign-off phrases
-    sign_off_phrases = ['thank you, that\'s all', 'goodbye', 'no more questions', 'that\'s it', 'thanks, bye', 'end of conversation']
-    if any(phrase in user_message_lower for phrase in sign_off_phrases):
+    if any(phrase in user_message_lower for phrase in SIGN_OFF_PHRASES):
         state["bot_response"] = "Thank you for your time. Have a great day!"
     
     # Check for not interested in roles
-    elif any(phrase in user_message_lower for phrase in ['not interested', 'no interest', 'not for me', 'not what i\'m looking for']):
+    elif any(phrase in user_message_lower for phrase in NOT_INTERESTED_PHRASES):
         state["bot_response"] = "I understand. Thank you for your interest in our company. If you change your mind or have any questions in the future, feel free to reach out. Have a great day!"
     
     # Check for booked interview with no more questions
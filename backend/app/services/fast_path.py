@@ -0,0 +1,136 @@
+import re
+import threading
+from dataclasses import dataclass
+from typing import Dict, Iterable, Optional
+from ..config import JOB_ROLE_MAPPING
+from .end_detection import SIGN_OFF_PHRASES, NOT_INTERESTED_PHRASES
+from .rag_system import GREETING_PHRASES, POSITION_INQUIRY_PHRASES
+
+# Words that may surround a role or greeting phrase without changing its meaning ("the Data
+# Analyst role please"). Exits never take fillers: "is the job not for me?" is a question.
+FILLER_WORDS = ["the", "a", "an", "role", "roles", "position", "positions", "job", "jobs", "please",
+                "there", "are", "is", "open", "available", "do", "you", "have", "currently"]
+# A bare phrase plus a few filler words; longer messages always go to the LLM.
+MAX_MESSAGE_LENGTH = 80
+
+_END = ""
+
+@dataclass(frozen=True)
+class FastPathDecision:
+    """A routing decision resolved locally, without calling the router LLM."""
+    intent: str
+    next_node: str
+    job_role_id: Optional[str] = None
+
+def normalize(text: str) -> str:
+    """Lowercases, drops apostrophes and turns punctuation into single spaces."""
+    text = text.lower().replace("'", "").replace("’", "")
+    return " ".join(re.sub(r"[^a-z0-9]+", " ", text).split())
+
+def build_trie_regex(phrases: Iterable[str]) -> str:
+    """
+    Compiles phrases into one regex whose alternatives share common word prefixes,
+    so matching cost does not grow with the number of phrases.
+    """
+    trie: dict = {}
+    for phrase in phrases:
+        node = trie
+        for word in phrase.split():
+            node = node.setdefault(word, {})
+        node[_END] = {}
+    return _trie_to_regex(trie)
+
+def _trie_to_regex(node: dict) -> str:
+    branches = []
+    for word, child in sorted(node.items()):
+        if word == _END:
+            continue
+        if set(child) == {_END}:
+            branches.append(re.escape(word))
+        else:
+            optional = "?" if _END in child else ""
+            branches.append(f"{re.escape(word)}(?: {_trie_to_regex(child)}){optional}")
+    return "(?:" + "|".join(branches) + ")"
+
+class FastPathMatcher:
+    """
+    Resolves unambiguous messages (a bare role name, a greeting, a sign-off) from
+    precompiled phrase lists. Anything else, including phrases that map to more than
+    one intent, returns None and is left to the router LLM.
+    """
+
+    def __init__(self, phrase_intents: Dict[str, set]):
+        self.phrase_intents = phrase_intents
+        fillers = build_trie_regex(FILLER_WORDS)
+        phrases = build_trie_regex(phrase_intents)
+        self.pattern = re.compile(rf"^(?:{fillers} )*(?P<phrase>{phrases})(?: {fillers})*$")
+        self._lock = threading.Lock()
+        self.hits: Dict[str, int] = {}
+        self.misses = 0
+
+    def match(self, message: str, current_job_role: Optional[str] = None,
+              booking_in_progress: bool = False) -> Optional[FastPathDecision]:
+        decision = self._resolve(message, current_job_role, booking_in_progress)
+        with self._lock:
+            if decision is None:
+                self.misses += 1
+            else:
+                self.hits[decision.intent] = self.hits.get(decision.intent, 0) + 1
+        return decision
+
+    def _resolve(self, message: str, current_job_role: Optional[str],
+                 booking_in_progress: bool) -> Optional[FastPathDecision]:
+        if len(message) > MAX_MESSAGE_LENGTH:
+            return None
+        normalized = normalize(message)
+        found = self.pattern.match(normalized)
+        if not found:
+            return None
+        intents = self.phrase_intents[found.group("phrase")]
+        if len(intents) != 1:
+            return None
+        intent, value = next(iter(intents))
+
+        # While scheduling, a bare role may answer the agent's "which position?" rather than ask for an overview
+        if intent == "role":
+            return None if booking_in_progress else FastPathDecision("role", "rag_system", job_role_id=value)
+        # Ending the session is only safe when the message is exactly the phrase
+        if intent in ("sign_off", "not_interested"):
+            return FastPathDecision(intent, "end_conversation") if normalized == found.group("phrase") else None
+        # Greetings and position questions only have a fixed answer while no role is selected
+        if intent in ("greeting", "position_inquiry") and not current_job_role:
+            return FastPathDecision(intent, "rag_system")
+        return None
+
+    def stats(self) -> dict:
+        with self._lock:
+            hits = sum(self.hits.values())
+            total = hits + self.misses
+            return {
+                "hits": dict(self.hits),
+                "misses": self.misses,
+                "hit_rate": round(hits / total, 4) if total else 0.0,
+            }
+
+def build_phrase_intents() -> Dict[str, set]:
+    """Maps each normalized phrase to the (intent, value) pairs it can stand for."""
+    phrase_intents: Dict[str, set] = {}
+
+    def add(phrase: str, intent: str, value: Optional[str] = None):
+        phrase_intents.setdefault(normalize(phrase), set()).add((intent, value))
+
+    for role_id, role_info in JOB_ROLE_MAPPING.items():
+        for alias in [role_info["friendly_name"], *role_info["aliases"]]:
+            add(alias, "role", role_id)
+    for phrase in SIGN_OFF_PHRASES:
+        add(phrase, "sign_off")
+    for phrase in NOT_INTERESTED_PHRASES:
+        add(phrase, "not_interested")
+    for phrase in GREETING_PHRASES:
+        add(phrase, "greeting")
+    for phrase in POSITION_INQUIRY_PHRASES:
+        add(phrase, "position_inquiry")
+        add(phrase + "s", "position_inquiry")
+    return phrase_intents
+
+fast_path_matcher = FastPathMatcher(build_phrase_intents())
@@ -0,0 +1,147 @@
+import logging
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import List, Optional
+import tiktoken
+from langchain_core.messages import BaseMessage, HumanMessage, SystemMessage
+from langchain_core.prompts import ChatPromptTemplate
+from langchain_core.output_parsers import StrOutputParser
+from .openai_clients import create_chat_model
+from .metrics import external_call
+from ..config import (
+    HISTORY_SUMMARY_MODEL, HISTORY_TOKENIZER_MODEL,
+    HISTORY_SUMMARY_KEEP_MESSAGES, HISTORY_SUMMARY_BATCH_MESSAGES,
+    ROUTER_HISTORY_MAX_TURNS, ROUTER_HISTORY_MAX_TOKENS,
+    SQL_HISTORY_MAX_TURNS, SQL_HISTORY_MAX_TOKENS,
+)
+
+logger = logging.getLogger(__name__)
+
+# --- Token Budgets ---
+@dataclass(frozen=True)
+class HistoryBudget:
+    """How much verbatim history a node sends to its LLM. One turn is a user message plus the reply."""
+    max_turns: int
+    max_tokens: int
+
+ROUTER_HISTORY_BUDGET = HistoryBudget(ROUTER_HISTORY_MAX_TURNS, ROUTER_HISTORY_MAX_TOKENS)
+SQL_HISTORY_BUDGET = HistoryBudget(SQL_HISTORY_MAX_TURNS, SQL_HISTORY_MAX_TOKENS)
+
+# Chat-format overhead OpenAI adds per message on top of its content.
+TOKENS_PER_MESSAGE = 4
+# Roughly four characters per token for English text
+CHARS_PER_TOKEN = 4
+
+@lru_cache(maxsize=1)
+def get_encoding():
+    """
+    The tokenizer, loaded on first use: tiktoken downloads its BPE file unless it is cached
+    (TIKTOKEN_CACHE_DIR). None if it is disabled or cannot be loaded, e.g. offline.
+    """
+    if not HISTORY_TOKENIZER_MODEL:
+        return None
+    try:
+        return tiktoken.encoding_for_model(HISTORY_TOKENIZER_MODEL)
+    except Exception as e:
+        logger.warning(f"⚠️ Could not load the {HISTORY_TOKENIZER_MODEL} tokenizer, approximating token counts: {e}")
+        return None
+
+@lru_cache(maxsize=8192)
+def count_tokens(text: str) -> int:
+    encoding = get_encoding()
+    if encoding is None:
+        return len(text) // CHARS_PER_TOKEN
+    return len(encoding.encode(text))
+
+def count_message_tokens(message: BaseMessage) -> int:
+    return TOKENS_PER_MESSAGE + count_tokens(message.content)
+
+def build_prompt_history(state, budget: HistoryBudget) -> List[BaseMessage]:
+    """
+    Returns the history a node should send to its LLM: the most recent messages that fit
+    the budget, preceded by the rolling summary of everything older.
+    The newest message is always kept, even if it alone exceeds the token budget.
+    """
+    history = state.get("conversation_history", [])
+    max_messages = budget.max_turns * 2
+    window: List[BaseMessage] = []
+    tokens = 0
+    for message in reversed(history):
+        message_tokens = count_message_tokens(message)
+        if window and (len(window) >= max_messages or tokens + message_tokens > budget.max_tokens):
+            break
+        window.append(message)
+        tokens += message_tokens
+    window.reverse()
+
+    summary = state.get("history_summary")
+    if summary:
+        window.insert(0, SystemMessage(content=f"Summary of the earlier conversation:\n{summary}"))
+    return window
+
+# --- Rolling Summary ---
+summary_llm = create_chat_model(HISTORY_SUMMARY_MODEL)
+
+summary_prompt = ChatPromptTemplate.from_template("""You maintain a running summary of a conversation between a job candidate and a recruiting assistant.
+Update the summary with the new messages below. Keep every fact later turns may rely on: the candidate's name,
+the role being discussed, questions already answered, date and time preferences, slots offered, and bookings made.
+Be concise and write plain sentences.
+
+CURRENT SUMMARY:
+{summary}
+
+NEW MESSAGES:
+{messages}
+
+UPDATED SUMMARY:
+""")
+
+summary_chain = summary_prompt | summary_llm | StrOutputParser()
+
+def needs_compaction(session: dict) -> bool:
+    """True when enough messages have aged out of the kept window to fold a batch into the summary."""
+    overflow = len(session.get("conversation_history", [])) - HISTORY_SUMMARY_KEEP_MESSAGES
+    return overflow >= HISTORY_SUMMARY_BATCH_MESSAGES
+
+@dataclass(frozen=True)
+class HistoryCompaction:
+    """A new rolling summary covering the first `cutoff` messages of the history."""
+    previous_summary: Optional[str]
+    summary: str
+    cutoff: int
+
+async def summarize_overflow(session: dict) -> Optional[HistoryCompaction]:
+    """
+    Summarizes the messages older than the kept window together with the previous summary.
+    Only the new batch is sent to the LLM, so each message is summarized once.
+    Does not modify the session, so it can run without holding the session lock.
+    """
+    if not needs_compaction(session):
+        return None
+    history = session["conversation_history"]
+    cutoff = len(history) - HISTORY_SUMMARY_KEEP_MESSAGES
+    batch = "\n".join(
+        f"{'Candidate' if isinstance(message, HumanMessage) else 'Assistant'}: {message.content}"
+        for message in history[:cutoff]
+    )
+    previous_summary = session.get("history_summary")
+    with external_call("openai", "history_summary"):
+        summary = await summary_chain.ainvoke({
+            "summary": previous_summary or "(no summary yet)",
+            "messages": batch,
+        })
+    return HistoryCompaction(previous_summary, summary, cutoff)
+
+def apply_compaction(session: dict, compaction: HistoryCompaction) -> bool:
+    """
+    Replaces the summarized messages with the new summary.
+    History is append-only between compactions, so the summarized prefix is still intact
+    as long as nobody else has replaced the summary in the meantime.
+    Returns True if the session changed.
+    """
+    history = session.get("conversation_history", [])
+    if session.get("history_summary") != compaction.previous_summary or len(history) < compaction.cutoff:
+        return False
+    session["history_summary"] = compaction.summary
+    session["conversation_history"] = history[compaction.cutoff:]
+    return True
@@ -0,0 +1,114 @@
+import os
+import time
+from typing import Callable, Dict, Optional, Tuple
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Gauge, Histogram, generate_latest, multiprocess,
+)
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+from .tracing import record_external_call, record_node
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+class CallbackCollector:
+    """A counter or gauge read at scrape time from a component that already keeps the number."""
+
+    def __init__(self, name: str, documentation: str, kind: str, labelnames: Tuple[str, ...],
+                 collect: Callable[[], Dict[tuple, float]]):
+        self.name = name
+        self.documentation = documentation
+        self.family = CounterMetricFamily if kind == "counter" else GaugeMetricFamily
+        self.labelnames = list(labelnames)
+        self.read = collect
+
+    def describe(self):
+        # Registration only needs the name, so the components are not read before they are set up
+        return [self.family(self.name, self.documentation, labels=self.labelnames)]
+
+    def collect(self):
+        family = self.family(self.name, self.documentation, labels=self.labelnames)
+        for key, value in self.read().items():
+            family.add_metric(list(key), value)
+        yield family
+
+# Callback metrics read this process's components, so they are kept apart from the counters and
+# histograms, which prometheus_client aggregates across processes in multiprocess mode.
+callbacks = CollectorRegistry()
+
+def register_callback(name: str, documentation: str, kind: str, labelnames: Tuple[str, ...],
+                      collect: Callable[[], Dict[tuple, float]]) -> CallbackCollector:
+    collector = CallbackCollector(name, documentation, kind, labelnames, collect)
+    callbacks.register(collector)
+    return collector
+
+def render(multiprocess_dir: Optional[str] = None) -> bytes:
+    """
+    Scrape output. With several uvicorn workers, set PROMETHEUS_MULTIPROC_DIR to an empty directory:
+    each worker then writes its samples there and every scrape aggregates all of them. Callback
+    metrics always describe the worker that answers the scrape.
+    """
+    multiprocess_dir = multiprocess_dir or os.getenv("PROMETHEUS_MULTIPROC_DIR")
+    if multiprocess_dir:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry, path=multiprocess_dir)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry) + generate_latest(callbacks)
+
+# --- Application Metrics ---
+NODE_SECONDS = Histogram(
+    "chatbot_node_duration_seconds", "Time spent in each graph node.", ("node", "route", "role"),
+    buckets=LATENCY_BUCKETS)
+EXTERNAL_CALL_SECONDS = Histogram(
+    "chatbot_external_call_duration_seconds", "Time spent in calls to OpenAI, the vector store and Postgres.",
+    ("service", "operation"), buckets=LATENCY_BUCKETS)
+ERRORS = Counter(
+    "chatbot_errors_total", "Errors raised by graph nodes, external calls and endpoints.", ("component", "operation"))
+SESSIONS_CREATED = Counter(
+    "chatbot_sessions_created_total", "Sessions started by a first message.")
+# Set by whichever worker answers the scrape, so across workers the latest value is the right one
+SESSIONS = Gauge(
+    "chatbot_sessions", "Sessions held by the session store, sampled at scrape time.", multiprocess_mode="mostrecent")
+
+class ExternalCall:
+    """Times one call to an external service, also towards the current request trace, and counts it as an error if it raises."""
+    __slots__ = ("service", "operation", "started")
+
+    def __init__(self, service: str, operation: str):
+        self.service = service
+        self.operation = operation
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        seconds = time.perf_counter() - self.started
+        EXTERNAL_CALL_SECONDS.labels(service=self.service, operation=self.operation).observe(seconds)
+        record_external_call(self.service, self.operation, seconds)
+        # Cancellation (e.g. a discarded speculative retrieval) is a BaseException, not a failure
+        if exc_type is not None and issubclass(exc_type, Exception):
+            ERRORS.labels(component=self.service, operation=self.operation).inc()
+        return False
+
+def external_call(service: str, operation: str) -> ExternalCall:
+    return ExternalCall(service, operation)
+
+def timed_node(name: str, node):
+    """Wraps an async graph node so its latency is recorded with the route and role it ended on."""
+    async def run(state):
+        started = time.perf_counter()
+        try:
+            state = await node(state)
+        except Exception:
+            seconds = time.perf_counter() - started
+            ERRORS.labels(component="node", operation=name).inc()
+            NODE_SECONDS.labels(node=name, route="error", role="none").observe(seconds)
+            record_node(name, seconds)
+            raise
+        seconds = time.perf_counter() - started
+        NODE_SECONDS.labels(node=name, route=state.get("next_node") or "none",
+                            role=state.get("current_job_role") or "none").observe(seconds)
+        record_node(name, seconds)
+        return state
+    run.__name__ = name
+    return run
@@ -0,0 +1,102 @@
+import threading
+import httpx
+from langchain_openai import ChatOpenAI, OpenAIEmbeddings
+from .tracing import current_trace_id
+from ..config import (
+    OPENAI_API_KEY, OPENAI_MAX_CONNECTIONS, OPENAI_MAX_KEEPALIVE_CONNECTIONS,
+    OPENAI_KEEPALIVE_EXPIRY_SECONDS, OPENAI_CONNECT_TIMEOUT_SECONDS, OPENAI_READ_TIMEOUT_SECONDS,
+    OPENAI_MAX_RETRIES,
+)
+
+class ConnectionPoolStats:
+    """
+    Counts requests and newly opened connections on the shared HTTP clients.
+    Every request that does not open a connection reused a kept-alive one.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.connections_opened = 0
+
+    def record_request(self) -> None:
+        with self._lock:
+            self.requests += 1
+
+    def record_connection(self) -> None:
+        with self._lock:
+            self.connections_opened += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            reused = max(0, self.requests - self.connections_opened)
+            return {
+                "requests": self.requests,
+                "connections_opened": self.connections_opened,
+                "connection_reuse_rate": round(reused / self.requests, 4) if self.requests else 0.0,
+                "max_connections": OPENAI_MAX_CONNECTIONS,
+                "max_keepalive_connections": OPENAI_MAX_KEEPALIVE_CONNECTIONS,
+            }
+
+# httpcore reports connection setup through the "trace" request extension
+CONNECT_EVENT = "connection.connect_tcp.complete"
+
+def build_http_clients(stats: ConnectionPoolStats, limits: httpx.Limits, timeout: httpx.Timeout):
+    """
+    Builds a sync and an async httpx client that report their requests and new connections to `stats`
+    and tag each request with the trace ID of the turn it belongs to.
+    """
+
+    def trace(event_name, info):
+        if event_name == CONNECT_EVENT:
+            stats.record_connection()
+
+    async def async_trace(event_name, info):
+        trace(event_name, info)
+
+    def on_request(request):
+        stats.record_request()
+        request.extensions["trace"] = trace
+        trace_id = current_trace_id()
+        if trace_id:
+            # Shown next to the OpenAI request ID in their logs and error reports
+            request.headers["X-Client-Request-Id"] = trace_id
+
+    async def on_async_request(request):
+        on_request(request)
+        request.extensions["trace"] = async_trace
+
+    sync_client = httpx.Client(limits=limits, timeout=timeout, event_hooks={"request": [on_request]})
+    async_client = httpx.AsyncClient(limits=limits, timeout=timeout, event_hooks={"request": [on_async_request]})
+    return sync_client, async_client
+
+# --- Shared Clients ---
+# One connection pool for every model and node, so TLS handshakes and kept-alive
+# connections to the OpenAI API are shared instead of each client opening its own.
+pool_stats = ConnectionPoolStats()
+http_client, async_http_client = build_http_clients(
+    pool_stats,
+    limits=httpx.Limits(
+        max_connections=OPENAI_MAX_CONNECTIONS,
+        max_keepalive_connections=OPENAI_MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry=OPENAI_KEEPALIVE_EXPIRY_SECONDS,
+    ),
+    timeout=httpx.Timeout(OPENAI_READ_TIMEOUT_SECONDS, connect=OPENAI_CONNECT_TIMEOUT_SECONDS),
+)
+
+def create_chat_model(model: str, temperature: float = 0) -> ChatOpenAI:
+    return ChatOpenAI(
+        model=model, openai_api_key=OPENAI_API_KEY, temperature=temperature,
+        http_client=http_client, http_async_client=async_http_client, max_retries=OPENAI_MAX_RETRIES,
+    )
+
+def create_embeddings(model: str, **kwargs) -> OpenAIEmbeddings:
+    return OpenAIEmbeddings(
+        model=model, openai_api_key=OPENAI_API_KEY,
+        http_client=http_client, http_async_client=async_http_client, max_retries=OPENAI_MAX_RETRIES,
+        **kwargs,
+    )
+
+async def close_http_clients() -> None:
+    http_client.close()
+    await async_http_client.aclose()
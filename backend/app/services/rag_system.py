@@ -1,32 +1,58 @@
-from pinecone import Pinecone
-from langchain_openai import OpenAIEmbeddings, ChatOpenAI
+import time
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.output_parsers import StrOutputParser
-from ..config import JOB_ROLE_MAPPING, OPENAI_API_KEY, PINECONE_API_KEY, PINECONE_INDEX_NAME
-
-# --- Initialize Pinecone client ---
-pc = Pinecone(api_key=PINECONE_API_KEY)
-
-embeddings_model = OpenAIEmbeddings(model="text-embedding-3-small", openai_api_key=OPENAI_API_KEY)
-llm = ChatOpenAI(model="gpt-4o", openai_api_key=OPENAI_API_KEY, temperature=0)
-
-def get_retrieved_documents(query: str, logs: list, role_id: str = None, k: int = 5) -> str:
-    logs.append("Retrieving documents from Pinecone...")
-    pinecone_index = pc.Index(PINECONE_INDEX_NAME)
-    
-    filter_dict = {}
+from ..config import (
+    JOB_ROLE_MAPPING, PINECONE_API_KEY, PINECONE_INDEX_NAME,
+    VECTOR_STORE_BACKEND, LOCAL_INDEX_DIR, VECTOR_VERSION_CHECK_SECONDS,
+    EMBEDDING_MODEL, EMBEDDING_CACHE_MAX_ENTRIES, EMBEDDING_CACHE_TTL_SECONDS,
+    EMBEDDING_CACHE_PATH, EMBEDDING_CACHE_DTYPE,
+    ANSWER_CACHE_SIMILARITY_THRESHOLD, ANSWER_CACHE_MAX_ENTRIES_PER_ROLE, ANSWER_CACHE_TTL_SECONDS,
+)
+from .embedding_cache import EmbeddingCache
+from .answer_cache import SemanticAnswerCache
+from .openai_clients import create_chat_model, create_embeddings
+from .metrics import external_call
+from .vector_store import create_vector_store
+
+# --- Initialize the retrieval backend (Pinecone or the local index) ---
+vector_store = create_vector_store(
+    backend=VECTOR_STORE_BACKEND,
+    model_name=EMBEDDING_MODEL,
+    local_index_dir=LOCAL_INDEX_DIR,
+    pinecone_api_key=PINECONE_API_KEY,
+    pinecone_index_name=PINECONE_INDEX_NAME,
+    version_check_seconds=VECTOR_VERSION_CHECK_SECONDS,
+)
+
+embeddings_model = create_embeddings(EMBEDDING_MODEL)
+# Repeated questions reuse their query embedding instead of calling the embeddings API
+embedding_cache = EmbeddingCache(
+    model_name=EMBEDDING_MODEL,
+    embed=embeddings_model.aembed_query,
+    max_entries=EMBEDDING_CACHE_MAX_ENTRIES,
+    ttl_seconds=EMBEDDING_CACHE_TTL_SECONDS,
+    disk_path=EMBEDDING_CACHE_PATH or None,
+    dtype=EMBEDDING_CACHE_DTYPE,
+)
+# Answers depend only on the question and the role's chunks, so near-identical questions share one
+answer_cache = SemanticAnswerCache(
+    similarity_threshold=ANSWER_CACHE_SIMILARITY_THRESHOLD,
+    max_entries_per_role=ANSWER_CACHE_MAX_ENTRIES_PER_ROLE,
+    ttl_seconds=ANSWER_CACHE_TTL_SECONDS,
+)
+llm = create_chat_model("gpt-4o")
+
+async def get_retrieved_documents(query: str, logs: list, role_id: str = None, k: int = 5) -> str:
+    logs.append(f"Retrieving documents from {vector_store.backend} vector store...")
     if role_id:
-        filter_dict['role_id'] = role_id
         logs.append(f"Applying metadata filter: role_id = '{role_id}'")
 
-    query_embedding = embeddings_model.embed_query(query)
-    
-    retrieval_results = pinecone_index.query(
-        vector=query_embedding, top_k=k, filter=filter_dict or None, include_metadata=True
-    )
+    query_embedding = await embedding_cache.embed_query(query)
+    with external_call("vector_store", "query"):
+        texts = await vector_store.query(query_embedding, top_k=k, role_id=role_id)
     
-    context = "\n\n---\n\n".join([match['metadata']['text'] for match in retrieval_results['matches']])
-    logs.append(f"Found {len(retrieval_results['matches'])} relevant document chunks.")
+    context = "\n\n---\n\n".join(texts)
+    logs.append(f"Found {len(texts)} relevant document chunks.")
     return context
 
 template = """You are an expert assistant answering questions about a job description.
@@ -46,8 +72,23 @@ USER INPUT:
 RESPONSE:
 """
 prompt = ChatPromptTemplate.from_template(template)
-
-def rag_node(state):
+rag_chain = prompt | llm | StrOutputParser()
+
+def generate_role_overview(role_id: str, chunk_texts: list) -> str:
+    """
+    Generates the general overview rule 2 asks for when a role is just mentioned, from the
+    whole job description. Called by the ingestion script; rag_node serves the stored result.
+    """
+    return rag_chain.invoke({
+        "context": "\n\n---\n\n".join(chunk_texts),
+        "question": JOB_ROLE_MAPPING[role_id]["friendly_name"],
+    })
+
+# Phrases answered without retrieval when no role is selected; also used by the router's fast path.
+POSITION_INQUIRY_PHRASES = ['open position', 'available position', 'what position', 'current position', 'what roles', 'what jobs']
+GREETING_PHRASES = ['hi', 'hello', 'my name is', 'i am', 'i\'m']
+
+async def rag_node(state):
     logs = state.get("logs", [])
     logs.append("Executing RAG node...")
     user_message = state["user_message"]
@@ -75,7 +116,7 @@ Which specific role interests you the most?"""
         
         # Check for position inquiry
         user_message_lower = user_message.lower()
-        if any(phrase in user_message_lower for phrase in ['open position', 'available position', 'what position', 'current position', 'what roles', 'what jobs']):
+        if any(phrase in user_message_lower for phrase in POSITION_INQUIRY_PHRASES):
             state["bot_response"] = """Here are our current open positions:
 
 • Data Analyst
@@ -88,7 +129,7 @@ Which role are you interested in learning more about?"""
             return state
         
         # Check for introductions/greetings
-        elif any(phrase in user_message_lower for phrase in ['hi', 'hello', 'my name is', 'i am', 'i\'m']):
+        elif any(phrase in user_message_lower for phrase in GREETING_PHRASES):
             state["bot_response"] = """Hello! I'm an AI career assistant. I can help you with the following open positions:
 
 • Data Analyst
@@ -106,12 +147,47 @@ Which role are you interested in learning more about?"""
             state["logs"] = logs
             return state
 
-    context = get_retrieved_documents(user_message, logs, role_id)
-    
-    rag_chain = prompt | llm | StrOutputParser()
-    
-    logs.append("Generating final answer with LLM...")
-    bot_response = rag_chain.invoke({"context": context, "question": user_message})
+    # Retrieval the router may have started for this role while it was deciding
+    speculation = state.get("speculative_retrieval")
+    state["speculative_retrieval"] = None
+
+    # A bare role mention always gets the same overview, so serve the one built at ingestion
+    bot_response = None
+    if state.get("role_mention_only"):
+        with external_call("vector_store", "overview"):
+            bot_response = await vector_store.get_overview(role_id)
+        if bot_response:
+            logs.append(f"Serving precomputed overview for role '{role_id}'.")
+            if speculation:
+                speculation.discard("overview")
+        else:
+            logs.append(f"No precomputed overview for role '{role_id}' - generating one.")
+
+    if not bot_response:
+        # The same embedding serves the answer-cache lookup and, on a miss, retrieval
+        query_embedding = await embedding_cache.embed_query(user_message)
+        revision = await vector_store.current_revision()
+        bot_response = answer_cache.lookup(role_id, query_embedding, revision)
+        if bot_response:
+            logs.append("Answer cache hit - reusing the answer to a similar question.")
+            if speculation:
+                speculation.discard("answer_cache")
+
+    if not bot_response:
+        started = time.perf_counter()
+        context = None
+        if speculation:
+            context = await speculation.take()
+            logs.extend(speculation.logs)
+            if context is not None:
+                logs.append("Using speculative retrieval result.")
+        if context is None:
+            context = await get_retrieved_documents(user_message, logs, role_id)
+        
+        logs.append("Generating final answer with LLM...")
+        with external_call("openai", "generation"):
+            bot_response = await rag_chain.ainvoke({"context": context, "question": user_message})
+        answer_cache.store(role_id, query_embedding, bot_response, time.perf_counter() - started, revision)
 
     # Append a clear scheduling call-to-action when a role is selected and not yet booked
     should_offer = bool(state.get('should_offer_scheduling', False) or (
@@ -1,9 +1,15 @@
 import os
+import json
+import hashlib
 from typing import Literal, Optional
-from langchain_openai import ChatOpenAI
 from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
 from pydantic import BaseModel, Field # UPDATED IMPORT
-from ..config import JOB_ROLE_MAPPING, OPENAI_API_KEY
+from ..config import JOB_ROLE_MAPPING, ROUTER_CACHE_MAX_ENTRIES, ROUTER_CACHE_TTL_SECONDS
+from .history import build_prompt_history, ROUTER_HISTORY_BUDGET
+from .fast_path import fast_path_matcher, normalize
+from .cache import TTLCache
+from .openai_clients import create_chat_model
+from .metrics import external_call
 
 # --- Dynamic Configuration from Central Mapping ---
 VALID_ROLE_IDS = list(JOB_ROLE_MAPPING.keys())
@@ -24,9 +30,13 @@ class RouteQuery(BaseModel):
         None,
         description="If the user's query is about a specific job, extract its canonical ID."
     )
+    role_mention_only: bool = Field(
+        False,
+        description="True if the message only names a job role (e.g. 'Data analyst') without asking anything specific about it."
+    )
 
 # --- LLM and Prompt Setup ---
-llm = ChatOpenAI(model="gpt-4o", openai_api_key=OPENAI_API_KEY, temperature=0)
+llm = create_chat_model("gpt-4o")
 structured_llm = llm.with_structured_output(RouteQuery)
 
 system_prompt = f"""You are a professional, polite, and helpful AI chat Assistant.
@@ -71,7 +81,36 @@ prompt = ChatPromptTemplate.from_messages([
 
 router_chain = prompt | structured_llm
 
-def intelligent_router_node(state):
+# --- Router Decision Cache ---
+# The router prompt is static and the LLM runs at temperature 0, so its decision is a
+# function of the user message and the history window it is shown. The cache key covers
+# exactly those inputs (plus the session's role and booking state), so a cached decision
+# is only reused when the LLM would be asked the same question.
+router_cache = TTLCache(max_entries=ROUTER_CACHE_MAX_ENTRIES, ttl_seconds=ROUTER_CACHE_TTL_SECONDS)
+
+def router_cache_key(user_message: str, current_job_role, booking_status, history_window) -> str:
+    window = [(message.type, message.content) for message in history_window]
+    payload = json.dumps([normalize(user_message), current_job_role, booking_status, window])
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+async def route_with_llm(state) -> RouteQuery:
+    """Asks the router LLM for a decision, reusing a cached one for identical inputs."""
+    history_window = build_prompt_history(state, ROUTER_HISTORY_BUDGET)
+    key = router_cache_key(state["user_message"], state.get("current_job_role"),
+                           state.get("booking_status"), history_window)
+    cached = router_cache.get(key)
+    if cached is not None:
+        state['logs'].append("Router cache hit - reusing previous decision")
+        return cached
+    with external_call("openai", "router"):
+        route_decision = await router_chain.ainvoke({
+            "user_message": state["user_message"],
+            "conversation_history": history_window
+        })
+    router_cache.set(key, route_decision)
+    return route_decision
+
+async def intelligent_router_node(state):
     if 'logs' not in state: state['logs'] = []
     state['logs'].append("Executing intelligent router...")
     
@@ -87,13 +126,20 @@ def intelligent_router_node(state):
         state['questions_asked'] = int(state.get('questions_asked', 0)) + 1
 
     
-    route_decision = router_chain.invoke({
-        "user_message": state["user_message"],
-        "conversation_history": state.get("conversation_history", [])
-    })
+    # Unambiguous messages (a bare role name, a greeting, a sign-off) are resolved locally
+    fast_path = fast_path_matcher.match(state["user_message"], state.get("current_job_role"),
+                                        booking_in_progress=state.get("booking_status") == "in_progress")
+    if fast_path:
+        state['logs'].append(f"Fast-path match: '{fast_path.intent}' - skipping router LLM")
+        route_decision = RouteQuery(next_node=fast_path.next_node, job_role_id=fast_path.job_role_id,
+                                    role_mention_only=fast_path.intent == "role")
+    else:
+        route_decision = await route_with_llm(state)
     
     state['logs'].append(f"Router decision: {route_decision.next_node}")
     state["next_node"] = route_decision.next_node
+    # Lets the RAG node answer a bare role mention with the precomputed overview
+    state["role_mention_only"] = bool(route_decision.role_mention_only and route_decision.job_role_id)
     
     # ROLE STATE MANAGEMENT - ONLY THE ROUTER CAN CHANGE THIS
     if route_decision.job_role_id:
@@ -131,6 +177,10 @@ def intelligent_router_node(state):
         # Don't set bot_response here - let the end_conversation_node do it
         state['logs'].append("Routing to end_conversation_node for proper session handling")
 
+    # The scheduling conversation is over once the candidate moves on to something else
+    if state.get('booking_status') == 'in_progress' and route_decision.next_node != "sql_database":
+        state['booking_status'] = None
+
     # Encourage scheduling if a role is already selected and no booking yet
     if state.get('current_job_role') and state.get('booking_status') != 'confirmed':
         state['should_offer_scheduling'] = True
@@ -0,0 +1,118 @@
+import logging
+from typing import Optional
+from sqlalchemy import text
+
+logger = logging.getLogger(__name__)
+
+# Every slot search and booking filters on available free slots of one position by date and
+# time. Indexing only free slots keeps the index small as bookings accumulate, and because
+# it holds every column the search reads, searches are answered by index-only scans.
+SCHEDULE_SLOTS_INDEX = "schedule_available_slots_idx"
+SCHEDULE_SLOTS_INDEX_DDL = (
+    'CREATE INDEX {concurrently} IF NOT EXISTS ' + SCHEDULE_SLOTS_INDEX +
+    ' ON "Schedule" (position, date, time) WHERE available'
+)
+
+# Slots presented to a candidate are held for their session for a few minutes (see
+# services/slot_holds.py). Expired rows are ignored by every query and swept in batches.
+HOLDS_TABLE_DDL = (
+    text("""
+        CREATE TABLE IF NOT EXISTS "ScheduleHold" (
+            position VARCHAR(20) NOT NULL, date DATE NOT NULL, time TIME NOT NULL,
+            session_id TEXT NOT NULL, expires_at TIMESTAMPTZ NOT NULL,
+            PRIMARY KEY (position, date, time)
+        )
+    """),
+    text('CREATE INDEX IF NOT EXISTS schedule_hold_session_idx ON "ScheduleHold" (session_id)'),
+    text('CREATE INDEX IF NOT EXISTS schedule_hold_expires_idx ON "ScheduleHold" (expires_at)'),
+)
+
+INDEX_STATE_QUERY = text("""
+    SELECT i.indisvalid FROM pg_index i
+    JOIN pg_class c ON c.oid = i.indexrelid
+    WHERE c.relname = :name AND i.indrelid = '"Schedule"'::regclass
+""")
+
+# CREATE INDEX CONCURRENTLY leaves the index invalid until it finishes, so an invalid index
+# is only a failed build if no session is still building it
+BUILD_IN_PROGRESS_QUERY = text("""
+    SELECT EXISTS (SELECT 1 FROM pg_stat_progress_create_index WHERE relid = '"Schedule"'::regclass)
+""")
+# Workers and replicas starting together check the index one at a time; the others leave it alone
+TRY_BUILD_LOCK_QUERY = text("SELECT pg_try_advisory_lock(hashtext(:name))")
+BUILD_UNLOCK_QUERY = text("SELECT pg_advisory_unlock(hashtext(:name))")
+
+def schedule_index_state(connection) -> Optional[bool]:
+    """None if the index is missing, False if it is invalid (being built or a failed build), True if usable."""
+    return connection.execute(INDEX_STATE_QUERY, {"name": SCHEDULE_SLOTS_INDEX}).scalar()
+
+def ensure_schedule_index(connection, concurrently: bool = True, rebuild: bool = True) -> str:
+    """
+    Creates the free-slot index if it is missing and, with `rebuild`, rebuilds it if a previous
+    concurrent build failed. `concurrently` keeps the table writable but needs an autocommit connection.
+    Returns what was done: 'present', 'created', 'rebuilt', 'invalid' (left for a rebuild) or
+    'building' (another session is checking or building it).
+    """
+    state = schedule_index_state(connection)
+    if state:
+        return "present"
+    # Not waited for: a session waiting on the lock holds a snapshot the concurrent build would wait on
+    if not connection.execute(TRY_BUILD_LOCK_QUERY, {"name": SCHEDULE_SLOTS_INDEX}).scalar():
+        return "building"
+    try:
+        state = schedule_index_state(connection)
+        if state:
+            return "present"
+        if state is False:
+            if connection.execute(BUILD_IN_PROGRESS_QUERY).scalar():
+                return "building"
+            if not rebuild:
+                return "invalid"
+        keyword = "CONCURRENTLY" if concurrently else ""
+        # Building the index can take longer than the statement timeout used for queries
+        connection.execute(text("SET statement_timeout = 0"))
+        try:
+            if state is False:
+                connection.execute(text(f"DROP INDEX {keyword} IF EXISTS {SCHEDULE_SLOTS_INDEX}"))
+            connection.execute(text(SCHEDULE_SLOTS_INDEX_DDL.format(concurrently=keyword)))
+        finally:
+            connection.execute(text("RESET statement_timeout"))
+        return "rebuilt" if state is False else "created"
+    finally:
+        connection.execute(BUILD_UNLOCK_QUERY, {"name": SCHEDULE_SLOTS_INDEX})
+
+def ensure_hold_table(connection) -> None:
+    for statement in HOLDS_TABLE_DDL:
+        connection.execute(statement)
+
+def check_schedule_index(engine) -> Optional[str]:
+    """
+    Startup check: creates the free-slot index if it is missing, without locking the table.
+    An invalid index is only reported; rebuilding it is left to `seed_sql_database.py --migrate-only`.
+    Failures (e.g. no DDL privilege) are logged and the app keeps running on sequential scans.
+    """
+    if engine.dialect.name != "postgresql":
+        return None
+    try:
+        with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as connection:
+            result = ensure_schedule_index(connection, concurrently=True, rebuild=False)
+    except Exception as e:
+        logger.warning(f"⚠️ Could not check or create index {SCHEDULE_SLOTS_INDEX}: {e}")
+        return None
+    if result == "invalid":
+        logger.warning(f"⚠️ Index {SCHEDULE_SLOTS_INDEX} is invalid; rebuild it with "
+                       "`python scripts/seed_sql_database.py --migrate-only`")
+    elif result != "present":
+        logger.info(f"🗂️ Index {SCHEDULE_SLOTS_INDEX} {result}")
+    return result
+
+def check_schedule_schema(engine) -> None:
+    """Startup check for the slot hold table, then the free-slot index."""
+    if engine.dialect.name != "postgresql":
+        return
+    try:
+        with engine.begin() as connection:
+            ensure_hold_table(connection)
+    except Exception as e:
+        logger.warning(f"⚠️ Could not check or create table \"ScheduleHold\": {e}")
+    check_schedule_index(engine)
@@ -0,0 +1,41 @@
+import asyncio
+from contextlib import asynccontextmanager
+
+class SessionLockManager:
+    """
+    Per-session asyncio locks, so turns within one session run one at a time in
+    arrival order while different sessions run in parallel.
+
+    Locks are reference counted and dropped as soon as no request holds or waits
+    for them, so the table only ever contains sessions with in-flight requests and
+    nothing is left behind when a session expires or is rotated.
+    Locks are per worker process: with several workers, requests of one session are
+    only serialized within the worker that receives them.
+    """
+
+    def __init__(self):
+        # session_id -> [lock, number of requests holding or waiting for it]
+        self._locks: dict = {}
+        self.contended = 0
+
+    @asynccontextmanager
+    async def hold(self, session_id: str):
+        entry = self._locks.get(session_id)
+        if entry is None:
+            entry = self._locks[session_id] = [asyncio.Lock(), 0]
+        if entry[0].locked():
+            self.contended += 1
+        entry[1] += 1
+        try:
+            async with entry[0]:
+                yield
+        finally:
+            entry[1] -= 1
+            if entry[1] == 0:
+                del self._locks[session_id]
+
+    def __len__(self) -> int:
+        return len(self._locks)
+
+    def stats(self) -> dict:
+        return {"active_locks": len(self._locks), "contended_acquisitions": self.contended}
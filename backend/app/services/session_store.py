@@ -0,0 +1,312 @@
+import sys
+import json
+import time
+import zlib
+import sqlite3
+import asyncio
+import threading
+from collections import OrderedDict
+from typing import Optional
+from langchain_core.messages import HumanMessage, AIMessage
+
+# Rough per-message overhead of a HumanMessage/AIMessage object on top of its content.
+MESSAGE_OVERHEAD_BYTES = 600
+SESSION_OVERHEAD_BYTES = 1024
+
+# Serialized sessions larger than this are zlib-compressed.
+COMPRESS_THRESHOLD_BYTES = 512
+# Short keys keep the serialized form of the well-known fields small.
+SHORT_KEYS = {"current_job_role": "r", "booking_status": "b", "history_summary": "s"}
+LONG_KEYS = {short: long for long, short in SHORT_KEYS.items()}
+
+def new_session_state() -> dict:
+    """Returns the initial state of a conversation session."""
+    return {
+        "conversation_history": [],
+        "current_job_role": None,
+        "booking_status": None,
+        "history_summary": None
+    }
+
+def estimate_session_size(session: dict) -> int:
+    """Estimates the memory held by a session, dominated by its message history."""
+    size = SESSION_OVERHEAD_BYTES + sys.getsizeof(session.get("history_summary") or "")
+    for message in session.get("conversation_history", []):
+        size += MESSAGE_OVERHEAD_BYTES + sys.getsizeof(message.content)
+    return size
+
+def serialize_session(session: dict) -> bytes:
+    """
+    Encodes a session as compact JSON: the history becomes a list of ["h"|"a", content]
+    pairs and well-known fields use one-letter keys. Large payloads are zlib-compressed.
+    """
+    payload = {"h": [
+        ["h" if isinstance(message, HumanMessage) else "a", message.content]
+        for message in session.get("conversation_history", [])
+    ]}
+    for key, value in session.items():
+        if key != "conversation_history":
+            payload[SHORT_KEYS.get(key, key)] = value
+    raw = json.dumps(payload, separators=(",", ":")).encode("utf-8")
+    if len(raw) >= COMPRESS_THRESHOLD_BYTES:
+        return b"z" + zlib.compress(raw)
+    return b"j" + raw
+
+def deserialize_session(data: bytes) -> dict:
+    """Decodes a session produced by serialize_session."""
+    raw = zlib.decompress(data[1:]) if data[:1] == b"z" else data[1:]
+    payload = json.loads(raw)
+    session = new_session_state()
+    session["conversation_history"] = [
+        HumanMessage(content=content) if kind == "h" else AIMessage(content=content)
+        for kind, content in payload.pop("h", [])
+    ]
+    for key, value in payload.items():
+        session[LONG_KEYS.get(key, key)] = value
+    return session
+
+class SessionStore:
+    """
+    Interface of the conversation session stores.
+    Sessions are dicts with `conversation_history`, `current_job_role` and `booking_status`.
+    A session returned by `get` must be passed back to `save` for changes to persist.
+    """
+    backend = "base"
+
+    async def get(self, session_id: str) -> Optional[dict]:
+        """Returns the session, or None if it is unknown or expired."""
+        raise NotImplementedError
+
+    async def save(self, session_id: str, session: dict) -> None:
+        """Stores the session after a turn and refreshes its idle timer."""
+        raise NotImplementedError
+
+    async def delete(self, session_id: str) -> None:
+        raise NotImplementedError
+
+    async def stats(self) -> dict:
+        """Returns size and eviction counters for monitoring."""
+        raise NotImplementedError
+
+    async def create(self, session_id: str) -> dict:
+        """Creates (or resets) a session with empty state."""
+        session = new_session_state()
+        await self.save(session_id, session)
+        return session
+
+class InMemorySessionStore(SessionStore):
+    """
+    Bounded in-process session store.
+    Sessions are kept in least-recently-used order and evicted when they have been
+    idle for longer than `idle_ttl_seconds`, when there are more than `max_entries`
+    sessions, or when their estimated total size exceeds `max_memory_bytes`.
+    Only suitable for a single worker process.
+    """
+    backend = "memory"
+
+    def __init__(self, max_entries: int, idle_ttl_seconds: float, max_memory_bytes: int):
+        self.max_entries = max_entries
+        self.idle_ttl_seconds = idle_ttl_seconds
+        self.max_memory_bytes = max_memory_bytes
+        # session_id -> [last_access, session, estimated_size], oldest access first
+        self._sessions: "OrderedDict[str, list]" = OrderedDict()
+        self._memory_bytes = 0
+        self._lock = threading.Lock()
+        self.evictions = {"ttl": 0, "lru": 0, "memory": 0}
+
+    async def get(self, session_id: str) -> Optional[dict]:
+        with self._lock:
+            now = time.monotonic()
+            self._expire(now)
+            entry = self._sessions.get(session_id)
+            if entry is None:
+                return None
+            entry[0] = now
+            self._sessions.move_to_end(session_id)
+            return entry[1]
+
+    async def save(self, session_id: str, session: dict) -> None:
+        with self._lock:
+            now = time.monotonic()
+            size = estimate_session_size(session)
+            previous = self._sessions.pop(session_id, None)
+            if previous is not None:
+                self._memory_bytes -= previous[2]
+            self._sessions[session_id] = [now, session, size]
+            self._memory_bytes += size
+            self._expire(now)
+            self._enforce_bounds(keep=session_id)
+
+    async def delete(self, session_id: str) -> None:
+        with self._lock:
+            entry = self._sessions.pop(session_id, None)
+            if entry is not None:
+                self._memory_bytes -= entry[2]
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    async def stats(self) -> dict:
+        with self._lock:
+            self._expire(time.monotonic())
+            return {
+                "backend": self.backend,
+                "active_sessions": len(self._sessions),
+                "memory_bytes": self._memory_bytes,
+                "max_entries": self.max_entries,
+                "max_memory_bytes": self.max_memory_bytes,
+                "idle_ttl_seconds": self.idle_ttl_seconds,
+                "evictions": dict(self.evictions),
+            }
+
+    def _evict_oldest(self, reason: str) -> None:
+        _, entry = self._sessions.popitem(last=False)
+        self._memory_bytes -= entry[2]
+        self.evictions[reason] += 1
+
+    def _expire(self, now: float) -> None:
+        # Entries are ordered by last access, so expired sessions are always at the front.
+        while self._sessions:
+            last_access = next(iter(self._sessions.values()))[0]
+            if now - last_access <= self.idle_ttl_seconds:
+                break
+            self._evict_oldest("ttl")
+
+    def _enforce_bounds(self, keep: str) -> None:
+        # The session that was just saved is the most recent one and is never evicted.
+        while len(self._sessions) > self.max_entries and next(iter(self._sessions)) != keep:
+            self._evict_oldest("lru")
+        while self._memory_bytes > self.max_memory_bytes and next(iter(self._sessions)) != keep:
+            self._evict_oldest("memory")
+
+class SQLiteSessionStore(SessionStore):
+    """
+    Session store backed by a SQLite file, shared by all worker processes on one host.
+    Idle sessions are purged lazily; the oldest sessions are purged beyond `max_entries`.
+    """
+    backend = "sqlite"
+    # Expired rows are purged every this many saves instead of on every request.
+    PURGE_EVERY_SAVES = 100
+
+    def __init__(self, path: str, idle_ttl_seconds: float, max_entries: int):
+        self.path = path
+        self.idle_ttl_seconds = idle_ttl_seconds
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._saves = 0
+        self.evictions = {"ttl": 0, "lru": 0}
+        self._connection = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        self._connection.execute("PRAGMA busy_timeout=5000")
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS sessions ("
+            "session_id TEXT PRIMARY KEY, data BLOB NOT NULL, last_access REAL NOT NULL)"
+        )
+        self._connection.execute("CREATE INDEX IF NOT EXISTS sessions_last_access ON sessions (last_access)")
+
+    def _execute(self, sql: str, params: tuple = ()):
+        with self._lock:
+            return self._connection.execute(sql, params).fetchall()
+
+    def _get(self, session_id: str) -> Optional[dict]:
+        now = time.time()
+        rows = self._execute(
+            "UPDATE sessions SET last_access = ? WHERE session_id = ? AND last_access >= ? RETURNING data",
+            (now, session_id, now - self.idle_ttl_seconds),
+        )
+        return deserialize_session(rows[0][0]) if rows else None
+
+    def _save(self, session_id: str, session: dict) -> None:
+        self._execute(
+            "INSERT INTO sessions (session_id, data, last_access) VALUES (?, ?, ?) "
+            "ON CONFLICT(session_id) DO UPDATE SET data = excluded.data, last_access = excluded.last_access",
+            (session_id, serialize_session(session), time.time()),
+        )
+        self._saves += 1
+        if self._saves % self.PURGE_EVERY_SAVES == 0:
+            self._purge()
+
+    def _purge(self) -> None:
+        expired = self._execute(
+            "DELETE FROM sessions WHERE last_access < ? RETURNING session_id",
+            (time.time() - self.idle_ttl_seconds,),
+        )
+        self.evictions["ttl"] += len(expired)
+        overflow = self._execute(
+            "DELETE FROM sessions WHERE session_id IN ("
+            "SELECT session_id FROM sessions ORDER BY last_access DESC LIMIT -1 OFFSET ?) RETURNING session_id",
+            (self.max_entries,),
+        )
+        self.evictions["lru"] += len(overflow)
+
+    def _stats(self) -> dict:
+        count = self._execute("SELECT count(*) FROM sessions WHERE last_access >= ?",
+                              (time.time() - self.idle_ttl_seconds,))[0][0]
+        return {
+            "backend": self.backend,
+            "active_sessions": count,
+            "max_entries": self.max_entries,
+            "idle_ttl_seconds": self.idle_ttl_seconds,
+            "evictions": dict(self.evictions),
+        }
+
+    # SQLite calls are blocking, so they run in a worker thread.
+    async def get(self, session_id: str) -> Optional[dict]:
+        return await asyncio.to_thread(self._get, session_id)
+
+    async def save(self, session_id: str, session: dict) -> None:
+        await asyncio.to_thread(self._save, session_id, session)
+
+    async def delete(self, session_id: str) -> None:
+        await asyncio.to_thread(self._execute, "DELETE FROM sessions WHERE session_id = ?", (session_id,))
+
+    async def stats(self) -> dict:
+        return await asyncio.to_thread(self._stats)
+
+class RedisSessionStore(SessionStore):
+    """
+    Session store for any Redis-protocol server (Redis, Valkey, Azure Cache for Redis),
+    shared by all workers and replicas. Idle expiry uses native key TTLs, which are
+    refreshed on every read and write.
+    `client` is an asyncio Redis client, e.g. `redis.asyncio.Redis.from_url(url)`.
+    """
+    backend = "redis"
+
+    def __init__(self, client, idle_ttl_seconds: float, key_prefix: str = "chat:session:"):
+        self.client = client
+        # Redis rejects non-positive expiry times
+        self.idle_ttl_seconds = max(1, int(idle_ttl_seconds))
+        self.key_prefix = key_prefix
+
+    def _key(self, session_id: str) -> str:
+        return f"{self.key_prefix}{session_id}"
+
+    async def get(self, session_id: str) -> Optional[dict]:
+        # GETEX reads the value and slides the idle TTL in a single round trip.
+        data = await self.client.getex(self._key(session_id), ex=self.idle_ttl_seconds)
+        return deserialize_session(data) if data is not None else None
+
+    async def save(self, session_id: str, session: dict) -> None:
+        await self.client.set(self._key(session_id), serialize_session(session), ex=self.idle_ttl_seconds)
+
+    async def delete(self, session_id: str) -> None:
+        await self.client.delete(self._key(session_id))
+
+    async def stats(self) -> dict:
+        # Counting keys would need a SCAN; Redis reports expiries in its own INFO stats.
+        return {"backend": self.backend, "idle_ttl_seconds": self.idle_ttl_seconds}
+
+def create_session_store(backend: str, max_entries: int, idle_ttl_seconds: float,
+                         max_memory_bytes: int, sqlite_path: str = None, redis_url: str = None) -> SessionStore:
+    """Builds the session store selected by configuration."""
+    if backend == "memory":
+        return InMemorySessionStore(max_entries, idle_ttl_seconds, max_memory_bytes)
+    if backend == "sqlite":
+        return SQLiteSessionStore(sqlite_path, idle_ttl_seconds, max_entries)
+    if backend == "redis":
+        if not redis_url:
+            raise ValueError("FATAL ERROR: SESSION_BACKEND is 'redis' but REDIS_URL is not set.")
+        import redis.asyncio as redis_asyncio
+        return RedisSessionStore(redis_asyncio.Redis.from_url(redis_url), idle_ttl_seconds)
+    raise ValueError(f"FATAL ERROR: Unknown SESSION_BACKEND '{backend}'. Use 'memory', 'sqlite' or 'redis'.")
@@ -0,0 +1,125 @@
+import asyncio
+import logging
+from datetime import date, time
+from typing import Any, Callable, Iterable, Set, Tuple
+from sqlalchemy import text
+from .database import run_query
+from .metrics import external_call
+
+logger = logging.getLogger(__name__)
+
+Slot = Tuple[date, time]
+
+RELEASE_HOLDS_QUERY = text('DELETE FROM "ScheduleHold" WHERE session_id = :session_id;')
+HELD_ELSEWHERE_QUERY = text("""
+    SELECT date, time FROM "ScheduleHold"
+    WHERE position = :position AND date BETWEEN :first_date AND :last_date
+      AND session_id <> :session_id AND expires_at > now();
+""")
+# Takes each slot that is free of holds, already held by this session, or whose hold expired.
+# Slots returned are held by the session; the others are held by another candidate.
+# Rows are locked in (date, time) order, so sessions holding overlapping slots cannot deadlock.
+HOLD_SLOTS_QUERY = text("""
+    INSERT INTO "ScheduleHold" (position, date, time, session_id, expires_at)
+    SELECT :position, slot.date, slot.time, :session_id, now() + make_interval(mins => :minutes)
+    FROM unnest(CAST(:dates AS date[]), CAST(:times AS time[])) AS slot(date, time)
+    ORDER BY slot.date, slot.time
+    ON CONFLICT (position, date, time) DO UPDATE
+    SET session_id = EXCLUDED.session_id, expires_at = EXCLUDED.expires_at
+    WHERE "ScheduleHold".session_id = EXCLUDED.session_id OR "ScheduleHold".expires_at <= now()
+    RETURNING date, time;
+""")
+# Locked rows are skipped, so sweepers on several replicas never wait on each other or on a hold being renewed
+SWEEP_HOLDS_QUERY = text("""
+    DELETE FROM "ScheduleHold" WHERE ctid IN (
+        SELECT ctid FROM "ScheduleHold" WHERE expires_at <= now()
+        ORDER BY expires_at LIMIT :batch FOR UPDATE SKIP LOCKED
+    );
+""")
+
+def hold_slots(connection, session_id: str, position: str, slots: Iterable[Slot], minutes: int) -> Set[Slot]:
+    """Replaces the session's holds with the given slots, returning those it now holds."""
+    # Ranked order differs between searches; a fixed lock order does not
+    slots = sorted(slots)
+    connection.execute(RELEASE_HOLDS_QUERY, {"session_id": session_id})
+    if not slots:
+        return set()
+    rows = connection.execute(HOLD_SLOTS_QUERY, {
+        "session_id": session_id, "position": position, "minutes": minutes,
+        "dates": [slot_date for slot_date, _ in slots], "times": [slot_time for _, slot_time in slots],
+    })
+    return {(slot_date, slot_time) for slot_date, slot_time in rows}
+
+def hold_ranked_slots(connection, session_id: str, position: str, first_date: date, last_date: date,
+                      rank: Callable[[Any, Set[Slot]], Any], minutes: int) -> Tuple[Any, int]:
+    """
+    Ranks the slots of the date range that no other session holds with `rank(connection, held_elsewhere)`,
+    then holds the ranked slots for the session, all in one transaction. Returns the search restricted
+    to the slots actually held (another session may take one in between) and how many were requested.
+    """
+    held_elsewhere = {tuple(row) for row in connection.execute(HELD_ELSEWHERE_QUERY, {
+        "session_id": session_id, "position": position, "first_date": first_date, "last_date": last_date,
+    })}
+    search = rank(connection, held_elsewhere)
+    requested = search.slots()
+    return search.only(hold_slots(connection, session_id, position, requested, minutes)), len(requested)
+
+def release_holds(connection, session_id: str) -> None:
+    connection.execute(RELEASE_HOLDS_QUERY, {"session_id": session_id})
+
+def sweep_expired_holds(connection, batch: int) -> int:
+    return connection.execute(SWEEP_HOLDS_QUERY, {"batch": batch}).rowcount
+
+class SlotHolds:
+    """
+    Short-lived reservations of the slots presented to a session, kept in the "ScheduleHold"
+    table so they apply across workers and replicas. A booking succeeds unless another
+    session holds the slot; a successful booking releases the session's other holds.
+    """
+
+    def __init__(self, minutes: int, sweep_seconds: float, sweep_batch: int):
+        self.minutes = minutes
+        self.sweep_seconds = sweep_seconds
+        self.sweep_batch = sweep_batch
+        self.granted = 0
+        self.lost_races = 0
+        self.swept = 0
+
+    async def hold_search(self, session_id: str, position: str, first_date: date, last_date: date,
+                          rank: Callable[[Any, Set[Slot]], Any]) -> Any:
+        """Runs a slot search that skips slots held by other sessions and holds what it presents."""
+        with external_call("postgres", "hold_slots"):
+            search, requested = await run_query(hold_ranked_slots, session_id, position, first_date, last_date,
+                                                rank, self.minutes, write=True)
+        held = len(search.slots())
+        self.granted += held
+        self.lost_races += requested - held
+        return search
+
+    async def sweep(self) -> int:
+        """Deletes expired holds batch by batch, each in its own short transaction."""
+        deleted = 0
+        while True:
+            with external_call("postgres", "sweep_holds"):
+                count = await run_query(sweep_expired_holds, self.sweep_batch, write=True)
+            deleted += count
+            if count < self.sweep_batch:
+                break
+        self.swept += deleted
+        return deleted
+
+    async def run_sweeper(self) -> None:
+        while True:
+            await asyncio.sleep(self.sweep_seconds)
+            try:
+                await self.sweep()
+            except Exception as e:
+                logger.warning(f"⚠️ Sweeping expired slot holds failed: {e}")
+
+    def stats(self) -> dict:
+        return {
+            "hold_minutes": self.minutes,
+            "granted": self.granted,
+            "lost_races": self.lost_races,
+            "swept": self.swept,
+        }
@@ -0,0 +1,115 @@
+import asyncio
+import time
+from typing import Awaitable, Callable, Dict, Optional
+from ..config import SPECULATIVE_RETRIEVAL
+from .router import intelligent_router_node
+from .rag_system import get_retrieved_documents
+
+class SpeculationStats:
+    """How often speculative retrieval was used or thrown away, and the time it saved or wasted."""
+
+    def __init__(self):
+        self.launched = 0
+        self.used = 0
+        self.failed = 0
+        self.discarded: Dict[str, int] = {}
+        self.saved_seconds = 0.0
+        self.wasted_seconds = 0.0
+
+    def stats(self) -> dict:
+        return {
+            "enabled": SPECULATIVE_RETRIEVAL,
+            "launched": self.launched,
+            "used": self.used,
+            "failed": self.failed,
+            "discarded": dict(self.discarded),
+            "use_rate": round(self.used / self.launched, 4) if self.launched else 0.0,
+            "saved_seconds": round(self.saved_seconds, 3),
+            "wasted_seconds": round(self.wasted_seconds, 3),
+        }
+
+speculation_stats = SpeculationStats()
+
+class SpeculativeRetrieval:
+    """
+    Retrieval for the session's current role, started before the router has decided.
+    The RAG node takes the result if the turn stays on that role; otherwise it is discarded.
+    """
+
+    def __init__(self, role_id: str, retrieve: Callable[[list], Awaitable[str]], stats: SpeculationStats):
+        self.role_id = role_id
+        self.logs: list = []
+        self.stats = stats
+        self.started_at = time.perf_counter()
+        self.finished_at: Optional[float] = None
+        self.settled = False
+        self.task = asyncio.ensure_future(self._run(retrieve))
+        stats.launched += 1
+
+    async def _run(self, retrieve) -> str:
+        try:
+            return await retrieve(self.logs)
+        finally:
+            self.finished_at = time.perf_counter()
+
+    async def take(self) -> Optional[str]:
+        """Returns the retrieved context, or None if the retrieval failed."""
+        self.settled = True
+        waiting_since = time.perf_counter()
+        try:
+            context = await self.task
+        except Exception as e:
+            self.stats.failed += 1
+            self.logs.append(f"Speculative retrieval failed: {e}")
+            return None
+        self.stats.used += 1
+        # Whatever ran before the RAG node started waiting was hidden behind the router
+        hidden = (self.finished_at - self.started_at) - (time.perf_counter() - waiting_since)
+        self.stats.saved_seconds += max(0.0, hidden)
+        return context
+
+    def discard(self, reason: str) -> None:
+        if self.settled:
+            return
+        self.settled = True
+        self.stats.discarded[reason] = self.stats.discarded.get(reason, 0) + 1
+        self.stats.wasted_seconds += (self.finished_at or time.perf_counter()) - self.started_at
+        if not self.task.done():
+            self.task.cancel()
+        # Nobody awaits a discarded task, so consume its outcome here
+        self.task.add_done_callback(lambda task: task.cancelled() or task.exception())
+
+async def speculative_router_node(state):
+    """
+    Runs the router while retrieval for the session's current role is already in flight.
+    The retrieval is handed to the RAG node only if the router keeps the turn on that role.
+    """
+    role_id = state.get("current_job_role")
+    speculation = None
+    if role_id:
+        user_message = state["user_message"]
+        speculation = SpeculativeRetrieval(
+            role_id, lambda logs: get_retrieved_documents(user_message, logs, role_id), speculation_stats
+        )
+
+    try:
+        state = await intelligent_router_node(state)
+    except BaseException:
+        # The router failed or the turn was cancelled (e.g. a stream client disconnected)
+        if speculation is not None:
+            speculation.discard("error")
+        raise
+
+    state["speculative_retrieval"] = None
+    if speculation is None:
+        return state
+    if state.get("next_node") != "rag_system":
+        speculation.discard("route")
+    elif state.get("current_job_role") != role_id:
+        speculation.discard("role_changed")
+    else:
+        state["logs"].append("Speculative retrieval started alongside the router.")
+        state["speculative_retrieval"] = speculation
+    return state
+
+router_node = speculative_router_node if SPECULATIVE_RETRIEVAL else intelligent_router_node
@@ -1,13 +1,29 @@
 import os
-from sqlalchemy import create_engine, text
-from langchain_core.tools import tool
-from langchain_openai import ChatOpenAI
+import logging
+from array import array
+from bisect import bisect_left, bisect_right
+from dataclasses import dataclass, field
+from typing import Annotated, Dict, Iterable, List, Optional
+from datetime import datetime, timedelta, date as date_type, time as time_type
+from sqlalchemy import text
+from langchain_core.tools import tool, InjectedToolArg
 from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
-from ..config import JOB_ROLE_MAPPING, OPENAI_API_KEY, DATABASE_URL
-from datetime import datetime
+from ..config import (
+    JOB_ROLE_MAPPING, SLOT_SEARCH_HORIZON_DAYS, SLOT_SEARCH_NEXT_DAYS, SLOT_SEARCH_SLOTS_PER_DAY,
+    DATABASE_URL, DB_TRANSACTION_POOLER, AVAILABILITY_CACHE_MAX_DAYS, AVAILABILITY_CACHE_TTL_SECONDS,
+    AVAILABILITY_NOTIFY, SLOT_HOLD_MINUTES, SLOT_HOLD_SWEEP_SECONDS, SLOT_HOLD_SWEEP_BATCH,
+)
+from .history import build_prompt_history, SQL_HISTORY_BUDGET
+from .openai_clients import create_chat_model
+from .metrics import external_call
+from .database import run_query, engine
+from .availability_cache import (
+    AvailabilityCache, AvailabilityListener, load_free_slots, without_slots, notify_booking, minute_of_day,
+    format_slot,
+)
+from .slot_holds import SlotHolds, release_holds
 
-# --- Environment and Database Setup ---
-engine = create_engine(DATABASE_URL)
+logger = logging.getLogger(__name__)
 
 def get_time_range(time_preference: str):
     """Converts a string like 'morning' into a time range."""
@@ -19,12 +35,179 @@ def get_time_range(time_preference: str):
     else: # Default to any time
         return '09:00:00', '17:00:00'
 
+# Slots listed for the requested window and for other times on the requested day
+WINDOW_LIMIT = 10
+SAME_DAY_LIMIT = 5
+
+# One round trip for the whole fallback chain, ranked by tier:
+#   0 - the requested window on the requested day
+#   1 - other times on the requested day
+#   2 - the requested window on the next days that have any, up to the search horizon
+RANKED_SLOTS_QUERY = text("""
+    WITH candidates AS (
+        SELECT date, time,
+               CASE WHEN date = :date AND time BETWEEN :start_time AND :end_time THEN 0
+                    WHEN date = :date THEN 1
+                    ELSE 2 END AS tier
+        FROM "Schedule"
+        WHERE available = TRUE AND position = :position AND date BETWEEN :date AND :last_date
+          AND (date = :date OR time BETWEEN :start_time AND :end_time)
+    ), ranked AS (
+        SELECT date, time, tier,
+               row_number() OVER (PARTITION BY tier ORDER BY date, time) AS tier_rank,
+               dense_rank() OVER (PARTITION BY tier ORDER BY date) AS day_rank,
+               row_number() OVER (PARTITION BY tier, date ORDER BY time) AS day_slot_rank
+        FROM candidates
+    )
+    SELECT tier, date, time FROM ranked
+    WHERE (tier = 0 AND tier_rank <= :window_limit)
+       OR (tier = 1 AND tier_rank <= :same_day_limit)
+       OR (tier = 2 AND day_rank <= :next_days AND day_slot_rank <= :slots_per_day)
+    ORDER BY tier, date, time;
+""")
+BOOK_SLOT_QUERY = text("""
+    UPDATE "Schedule" SET available = FALSE
+    WHERE position = :position AND date = :date AND time = :time AND available = TRUE;
+""")
+# With slot holds, a slot held by another session is not booked until that hold expires
+BOOK_UNHELD_SLOT_QUERY = text("""
+    UPDATE "Schedule" SET available = FALSE
+    WHERE position = :position AND date = :date AND time = :time AND available = TRUE
+      AND NOT EXISTS (
+          SELECT 1 FROM "ScheduleHold" hold
+          WHERE hold.position = :position AND hold.date = :date AND hold.time = :time
+            AND hold.session_id <> :session_id AND hold.expires_at > now()
+      );
+""")
+
+@dataclass
+class SlotSearch:
+    """Free slots found by one ranked search, as 'YYYY-MM-DD HH:MM' strings per tier."""
+    in_window: List[str] = field(default_factory=list)
+    same_day: List[str] = field(default_factory=list)
+    next_days: List[str] = field(default_factory=list)
+
+    def slots(self) -> List[tuple]:
+        """Every listed slot as a (date, time) pair."""
+        listed = (datetime.strptime(slot, "%Y-%m-%d %H:%M") for slot in self.in_window + self.same_day + self.next_days)
+        return [(parsed.date(), parsed.time()) for parsed in listed]
+
+    def only(self, slots: Iterable[tuple]) -> "SlotSearch":
+        """The same search restricted to the given (date, time) pairs."""
+        keep = {f"{slot_date:%Y-%m-%d} {slot_time:%H:%M}" for slot_date, slot_time in slots}
+        return SlotSearch(*([slot for slot in tier if slot in keep] for tier in (self.in_window, self.same_day, self.next_days)))
+
+def find_slots(connection, position: str, date: date_type, start_time: time_type, end_time: time_type) -> SlotSearch:
+    rows = connection.execute(RANKED_SLOTS_QUERY, {
+        "position": position, "date": date, "start_time": start_time, "end_time": end_time,
+        "last_date": date + timedelta(days=SLOT_SEARCH_HORIZON_DAYS),
+        "window_limit": WINDOW_LIMIT, "same_day_limit": SAME_DAY_LIMIT,
+        "next_days": SLOT_SEARCH_NEXT_DAYS, "slots_per_day": SLOT_SEARCH_SLOTS_PER_DAY,
+    }).fetchall()
+    search = SlotSearch()
+    tiers = (search.in_window, search.same_day, search.next_days)
+    for tier, slot_date, slot_time in rows:
+        tiers[tier].append(f"{slot_date:%Y-%m-%d} {slot_time:%H:%M}")
+    return search
+
+def rank_free_slots(days: Dict[date_type, array], date: date_type, start_time: time_type, end_time: time_type) -> SlotSearch:
+    """The same tiers as RANKED_SLOTS_QUERY, computed from cached free slots of `date` and the days after it."""
+    start, end = minute_of_day(start_time), minute_of_day(end_time)
+    minutes = days[date]
+    first, last = bisect_left(minutes, start), bisect_right(minutes, end)
+    search = SlotSearch(
+        in_window=[format_slot(date, minute) for minute in minutes[first:last][:WINDOW_LIMIT]],
+        same_day=[format_slot(date, minute) for minute in (minutes[:first] + minutes[last:])[:SAME_DAY_LIMIT]],
+    )
+    next_days = 0
+    for offset in range(1, SLOT_SEARCH_HORIZON_DAYS + 1):
+        if next_days == SLOT_SEARCH_NEXT_DAYS:
+            break
+        day = date + timedelta(days=offset)
+        minutes = days[day]
+        window = minutes[bisect_left(minutes, start):bisect_right(minutes, end)][:SLOT_SEARCH_SLOTS_PER_DAY]
+        if window:
+            search.next_days.extend(format_slot(day, minute) for minute in window)
+            next_days += 1
+    return search
+
+def describe_slots(search: SlotSearch, date_preference: str, time_preference: str, friendly_name: str) -> str:
+    """Turns a ranked search into the tool answer, so the fallbacks need no further turn."""
+    window = "" if time_preference.lower() == "any" else f" {time_preference}"
+    if search.in_window:
+        return f"Great! I found these available slots for {date_preference} {time_preference}:\n" + "\n".join(search.in_window)
+    parts = []
+    if search.same_day:
+        parts.append(f"Unfortunately, there are no slots available in the {time_preference} on {date_preference}. "
+                     "However, I did find these other times on that day:\n" + "\n".join(search.same_day))
+    else:
+        parts.append(f"I'm sorry, but there are no available interview slots at all on {date_preference} for the {friendly_name} role.")
+    if search.next_days:
+        parts.append(f"The next available{window} slots after that are:\n" + "\n".join(search.next_days))
+    elif not search.same_day:
+        parts.append(f"There are no{window} slots in the following {SLOT_SEARCH_HORIZON_DAYS} days either.")
+    return "\n\n".join(parts)
+
+def book_slot(connection, position: str, date: date_type, time: time_type, session_id: Optional[str] = None) -> bool:
+    """With a session_id, respects other sessions' holds and releases the session's own holds once booked."""
+    params = {"position": position, "date": date, "time": time}
+    if session_id is None:
+        booked = connection.execute(BOOK_SLOT_QUERY, params).rowcount > 0
+    else:
+        booked = connection.execute(BOOK_UNHELD_SLOT_QUERY, {**params, "session_id": session_id}).rowcount > 0
+        if booked:
+            release_holds(connection, session_id)
+    if booked:
+        notify_booking(connection, position, date, minute_of_day(time))
+    return booked
+
+availability_cache = AvailabilityCache(max_days=AVAILABILITY_CACHE_MAX_DAYS, ttl_seconds=AVAILABILITY_CACHE_TTL_SECONDS)
+# Started by the app on PostgreSQL; a transaction-mode pooler cannot LISTEN, so the TTL covers that setup
+availability_listener = (
+    AvailabilityListener.from_url(availability_cache, DATABASE_URL)
+    if availability_cache.enabled and AVAILABILITY_NOTIFY and engine.dialect.name == "postgresql"
+    and not DB_TRANSACTION_POOLER else None
+)
+# Holds live in PostgreSQL so they apply across workers and replicas; the app runs the sweeper
+slot_holds = (
+    SlotHolds(minutes=SLOT_HOLD_MINUTES, sweep_seconds=SLOT_HOLD_SWEEP_SECONDS, sweep_batch=SLOT_HOLD_SWEEP_BATCH)
+    if SLOT_HOLD_MINUTES > 0 and engine.dialect.name == "postgresql" else None
+)
+
+async def load_availability(position: str, first_date: date_type, last_date: date_type) -> Dict[date_type, array]:
+    with external_call("postgres", "load_availability"):
+        return await run_query(load_free_slots, position, first_date, last_date)
+
+async def search_slots(position: str, date: date_type, start_time: time_type, end_time: time_type) -> SlotSearch:
+    """Answers from the availability cache when it holds the search's date range, else from one ranked query."""
+    if availability_cache.enabled:
+        last_date = date + timedelta(days=SLOT_SEARCH_HORIZON_DAYS)
+        days = await availability_cache.free_slots(position, date, last_date, load_availability)
+        return rank_free_slots(days, date, start_time, end_time)
+    with external_call("postgres", "find_slots"):
+        return await run_query(find_slots, position, date, start_time, end_time)
+
+async def search_and_hold_slots(session_id: str, position: str, date: date_type, start_time: time_type,
+                                end_time: time_type) -> SlotSearch:
+    """Like search_slots, but skips slots other candidates hold and holds the presented ones for the session."""
+    last_date = date + timedelta(days=SLOT_SEARCH_HORIZON_DAYS)
+    days = await availability_cache.free_slots(position, date, last_date, load_availability) if availability_cache.enabled else None
+
+    def rank(connection, held_elsewhere) -> SlotSearch:
+        free = days if days is not None else load_free_slots(connection, position, date, last_date)
+        return rank_free_slots(without_slots(free, held_elsewhere), date, start_time, end_time)
+
+    return await slot_holds.hold_search(session_id, position, date, last_date, rank)
+
+# session_id is an injected argument: the scheduling node fills it in and it is hidden from the model
 @tool
-def get_available_time_slots(role_id: str, date_preference: str, time_preference: str = 'any') -> str:
+async def get_available_time_slots(role_id: str, date_preference: Optional[str] = None, time_preference: str = 'any',
+                                   session_id: Annotated[Optional[str], InjectedToolArg] = None) -> str:
     """
     Finds available interview slots for a specific role_id on a given date and time preference.
+    If that window is full, the answer also lists other times that day and the next days with free slots.
     - role_id: The canonical ID for the job role (e.g., 'python_developer').
-    - date_preference: The desired date in 'YYYY-MM-DD' format.
+    - date_preference: The desired date in 'YYYY-MM-DD' format. Leave it out to find the next free slot from today.
     - time_preference: A string, such as 'morning', 'afternoon', or 'any'.
     """
     role_info = JOB_ROLE_MAPPING.get(role_id)
@@ -33,35 +216,30 @@ def get_available_time_slots(role_id: str, date_preference: str, time_preference
     
     sql_position_name = role_info["sql_position_name"]
     start_time, end_time = get_time_range(time_preference)
+    date_preference = date_preference or datetime.now().strftime('%Y-%m-%d')
     try:
-        with engine.connect() as connection:
-            query = text("""
-                SELECT to_char(date, 'YYYY-MM-DD') || ' ' || to_char(time, 'HH24:MI') as start_time
-                FROM "Schedule"
-                WHERE available = TRUE AND position = :position AND date = :date AND time BETWEEN :start_time AND :end_time
-                ORDER BY date, time LIMIT 10;
-            """)
-            result = connection.execute(query, {"position": sql_position_name, "date": date_preference, "start_time": start_time, "end_time": end_time})
-            slots = [row[0] for row in result.fetchall()]
-            if slots:
-                return f"Great! I found these available slots for {date_preference} {time_preference}:\n" + "\n".join(slots)
-            else:
-                alt_query = text("""
-                    SELECT to_char(date, 'YYYY-MM-DD') || ' ' || to_char(time, 'HH24:MI') as start_time
-                    FROM "Schedule" WHERE available = TRUE AND position = :position AND date = :date
-                    ORDER BY date, time LIMIT 5;
-                """)
-                alt_result = connection.execute(alt_query, {"position": sql_position_name, "date": date_preference})
-                alt_slots = [row[0] for row in alt_result.fetchall()]
-                if alt_slots:
-                    return f"Unfortunately, there are no slots available in the {time_preference} on {date_preference}. However, I did find these other times on that day:\n" + "\n".join(alt_slots)
-                else:
-                    return f"I'm sorry, but there are no available interview slots at all on {date_preference} for the {role_info['friendly_name']} role."
+        # asyncpg only binds date and time objects to date and time columns
+        slot_date = date_type.fromisoformat(date_preference)
+        window = (time_type.fromisoformat(start_time), time_type.fromisoformat(end_time))
+        search = None
+        if slot_holds is not None and session_id:
+            try:
+                search = await search_and_hold_slots(session_id, sql_position_name, slot_date, *window)
+            except Exception as e:
+                logger.warning(f"⚠️ Could not hold slots, searching without holds: {e}")
+        holding = search is not None
+        if search is None:
+            search = await search_slots(sql_position_name, slot_date, *window)
     except Exception as e:
         return f"Database query failed: {e}"
+    answer = describe_slots(search, date_preference, time_preference, role_info['friendly_name'])
+    if holding and search.slots():
+        answer += f"\n\nThese slots are reserved for you for the next {slot_holds.minutes} minutes."
+    return answer
 
 @tool
-def book_interview_slot(role_id: str, date: str, time: str) -> str:
+async def book_interview_slot(role_id: str, date: str, time: str,
+                              session_id: Annotated[Optional[str], InjectedToolArg] = None) -> str:
     """
     Books an interview slot by updating its availability in the database.
     - role_id: The canonical ID for the job role.
@@ -73,26 +251,56 @@ def book_interview_slot(role_id: str, date: str, time: str) -> str:
         return f"Error: Invalid role ID '{role_id}'. Available roles: {list(JOB_ROLE_MAPPING.keys())}"
     sql_position_name = role_info["sql_position_name"]
     try:
-        with engine.connect() as connection:
-            with connection.begin() as transaction:
-                query = text("""
-                    UPDATE "Schedule" SET available = FALSE
-                    WHERE position = :position AND date = :date AND time = :time AND available = TRUE;
-                """)
-                result = connection.execute(query, {"position": sql_position_name, "date": date, "time": time})
-                transaction.commit()
-                if result.rowcount > 0:
-                    return (f"Success! Your interview for the {role_info['friendly_name']} role has been booked for {date} at {time}. "
-                            "Would you like to ask any more questions about the role?")
-                else:
-                    return "It seems that slot was just taken or does not exist. Please try searching for another time."
+        slot_date, slot_time = date_type.fromisoformat(date), time_type.fromisoformat(time)
+        with external_call("postgres", "book_slot"):
+            booked = await run_query(book_slot, sql_position_name, slot_date, slot_time,
+                                     session_id if slot_holds is not None else None, write=True)
     except Exception as e:
         return f"Database update failed: {e}"
+    if booked:
+        # Other processes learn of the booking through NOTIFY
+        availability_cache.remove_slot(sql_position_name, slot_date, minute_of_day(slot_time))
+        return (f"Success! Your interview for the {role_info['friendly_name']} role has been booked for {date} at {time}. "
+                "Would you like to ask any more questions about the role?")
+    # Booked elsewhere or held by another candidate; the next search reloads the day
+    availability_cache.invalidate_day(sql_position_name, slot_date)
+    return ("It seems that slot was just taken, is reserved by another candidate, or does not exist. "
+            "Please try searching for another time.")
 
-llm = ChatOpenAI(model="gpt-4o", openai_api_key=OPENAI_API_KEY, temperature=0)
+llm = create_chat_model("gpt-4o")
 llm_with_tools = llm.bind_tools([get_available_time_slots, book_interview_slot])
 
-def sql_node(state):
+SCHEDULING_SYSTEM_TEMPLATE = """You are a helpful and precise Scheduling Assistant. Your only goal is to get an interview booked for the user.
+        
+        **CRITICAL:** You are scheduling for the **{friendly_name}** role (role_id: '{role_id}').
+        Today's date is {today}.
+        **Booking Status:** An interview has **not yet** been booked.
+        
+        **IMPORTANT:** When calling tools, ALWAYS use role_id = '{role_id}' for the {friendly_name} position.
+        
+        Follow this process strictly:
+        1.  **Gather Information:** If you don't know the user's desired date and time preference, ask for it. If they just want the next free slot, search without a date.
+        2.  **Search for Slots:** Once you have preferences, use the `get_available_time_slots` tool with role_id = '{role_id}'.
+        3.  **Present Options:** Clearly present the available slots.
+        4.  **Await Confirmation:** The user must explicitly confirm which slot they want.
+        5.  **Book the Slot:** Once confirmed, you must call the `book_interview_slot` tool with role_id = '{role_id}' and the exact date and time.
+        6.  **Handle Declines:** If the user declines, ask for a different preference and restart from Step 2.
+        """
+
+scheduling_prompt = ChatPromptTemplate.from_messages([
+    ("system", SCHEDULING_SYSTEM_TEMPLATE),
+    MessagesPlaceholder(variable_name="history"),
+    ("user", "{input}"),
+])
+
+# One chain per role, built at import: the role is bound here and only the date, history
+# and message are filled in per turn, so no template is parsed on the request path.
+SCHEDULING_CHAINS = {
+    role_id: scheduling_prompt.partial(friendly_name=role_info["friendly_name"], role_id=role_id) | llm_with_tools
+    for role_id, role_info in JOB_ROLE_MAPPING.items()
+}
+
+async def sql_node(state):
     logs = state.get("logs", [])
     logs.append("Executing Scheduling Agent Node...")
     
@@ -101,6 +309,9 @@ def sql_node(state):
         state["bot_response"] = "It looks like you already have an interview booked. Can I help with anything else?"
         return state
 
+    # Until a booking succeeds, the candidate's next reply belongs to this scheduling conversation
+    state["booking_status"] = "in_progress"
+
     # READ ONLY - Get role state from router
     role_id = state.get("current_job_role")
     logs.append(f"READING ROLE STATE: '{role_id}'")
@@ -111,29 +322,13 @@ def sql_node(state):
         state["logs"] = logs
         return state
 
-    prompt = ChatPromptTemplate.from_messages([
-        ("system", f"""You are a helpful and precise Scheduling Assistant. Your only goal is to get an interview booked for the user.
-        
-        **CRITICAL:** You are scheduling for the **{JOB_ROLE_MAPPING[role_id]['friendly_name']}** role (role_id: '{role_id}').
-        Today's date is {datetime.now().strftime('%Y-%m-%d')}.
-        **Booking Status:** An interview has **not yet** been booked.
-        
-        **IMPORTANT:** When calling tools, ALWAYS use role_id = '{role_id}' for the {JOB_ROLE_MAPPING[role_id]['friendly_name']} position.
-        
-        Follow this process strictly:
-        1.  **Gather Information:** If you don't know the user's desired date and time preference, ask for it.
-        2.  **Search for Slots:** Once you have preferences, use the `get_available_time_slots` tool with role_id = '{role_id}'.
-        3.  **Present Options:** Clearly present the available slots.
-        4.  **Await Confirmation:** The user must explicitly confirm which slot they want.
-        5.  **Book the Slot:** Once confirmed, you must call the `book_interview_slot` tool with role_id = '{role_id}' and the exact date and time.
-        6.  **Handle Declines:** If the user declines, ask for a different preference and restart from Step 2.
-        """),
-        MessagesPlaceholder(variable_name="history"),
-        ("user", "{input}"),
-    ])
-    
-    chain = prompt | llm_with_tools
-    ai_message = chain.invoke({"input": state["user_message"], "history": state.get("conversation_history", [])})
+    chain = SCHEDULING_CHAINS[role_id]
+    with external_call("openai", "scheduling"):
+        ai_message = await chain.ainvoke({
+            "input": state["user_message"],
+            "history": build_prompt_history(state, SQL_HISTORY_BUDGET),
+            "today": datetime.now().strftime('%Y-%m-%d'),
+        })
     
     if not ai_message.tool_calls:
         bot_response = ai_message.content
@@ -145,8 +340,11 @@ def sql_node(state):
         # ALWAYS use the role_id from state, never trust the LLM's role_id
         tool_args['role_id'] = role_id
         logs.append(f"FORCING role_id to: '{role_id}'")
+        # Slot holds belong to the session, which the model never sees
+        tool_args['session_id'] = state.get("session_id")
         
-        tool_output = (get_available_time_slots if tool_call['name'] == 'get_available_time_slots' else book_interview_slot).invoke(tool_args)
+        # The tools await the database, so the event loop stays free for other sessions
+        tool_output = await (get_available_time_slots if tool_call['name'] == 'get_available_time_slots' else book_interview_slot).ainvoke(tool_args)
         bot_response = tool_output
         
         if tool_call['name'] == 'book_interview_slot' and 'Success!' in tool_output:
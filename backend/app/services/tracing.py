@@ -0,0 +1,71 @@
+import re
+import time
+from contextvars import ContextVar
+from typing import Dict, Optional
+from uuid import uuid4
+
+# Stages reported in the Server-Timing header, in display order
+STAGES = ("router", "retrieval", "generation", "sql")
+
+# Which stage each timed external call counts towards. Router time is taken from the
+# whole router node instead, so fast-path and cache hits are attributed too.
+EXTERNAL_CALL_STAGES = {
+    ("openai", "embedding"): "retrieval",
+    ("vector_store", "query"): "retrieval",
+    ("vector_store", "overview"): "retrieval",
+    ("openai", "generation"): "generation",
+    ("openai", "scheduling"): "generation",
+    ("postgres", "find_slots"): "sql",
+    ("postgres", "load_availability"): "sql",
+    ("postgres", "book_slot"): "sql",
+    ("postgres", "hold_slots"): "sql",
+}
+NODE_STAGES = {"router": "router"}
+
+# Caller-supplied IDs end up in HTTP headers and SQL comments, so only plain tokens are accepted
+TRACE_ID_PATTERN = re.compile(r"^[A-Za-z0-9._-]{1,128}$")
+
+class RequestTrace:
+    """Trace ID and per-stage time of one chat turn. Overlapping stages (speculative retrieval) are each counted in full."""
+
+    def __init__(self, trace_id: str):
+        self.trace_id = trace_id
+        self.started = time.perf_counter()
+        self.stages: Dict[str, float] = {}
+
+    def add(self, stage: str, seconds: float) -> None:
+        self.stages[stage] = self.stages.get(stage, 0.0) + seconds
+
+    def timings_ms(self) -> Dict[str, float]:
+        timings = {stage: round(self.stages[stage] * 1000, 1) for stage in STAGES if stage in self.stages}
+        timings["total"] = round((time.perf_counter() - self.started) * 1000, 1)
+        return timings
+
+    def server_timing(self) -> str:
+        return ", ".join(f"{stage};dur={ms}" for stage, ms in self.timings_ms().items())
+
+# Tasks and worker threads started during a turn inherit the trace through the context
+current_trace: ContextVar[Optional[RequestTrace]] = ContextVar("current_trace", default=None)
+
+def start_trace(requested_id: Optional[str] = None) -> RequestTrace:
+    """Starts the trace of a turn, keeping a well-formed caller-supplied ID (e.g. X-Request-ID)."""
+    trace_id = requested_id if requested_id and TRACE_ID_PATTERN.match(requested_id) else uuid4().hex
+    trace = RequestTrace(trace_id)
+    current_trace.set(trace)
+    return trace
+
+def current_trace_id() -> Optional[str]:
+    trace = current_trace.get()
+    return trace.trace_id if trace else None
+
+def record_external_call(service: str, operation: str, seconds: float) -> None:
+    trace = current_trace.get()
+    stage = EXTERNAL_CALL_STAGES.get((service, operation))
+    if trace is not None and stage is not None:
+        trace.add(stage, seconds)
+
+def record_node(name: str, seconds: float) -> None:
+    trace = current_trace.get()
+    stage = NODE_STAGES.get(name)
+    if trace is not None and stage is not None:
+        trace.add(stage, seconds)
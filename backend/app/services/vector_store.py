@@ -0,0 +1,390 @@
+import asyncio
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+import uuid
+from typing import Dict, List, Optional
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_FILENAME = "manifest.json"
+# Per-role overviews generated at ingestion: role_id -> {"text", "source_hash"}
+OVERVIEWS_FILENAME = "overviews.json"
+
+# --- Index Versions ---
+# Ingestion can build a complete new version of the index next to the live one and then
+# switch a small pointer to it. The pointer is {"version", "previous", "swapped_at", "retired",
+# "revision"}; the backend re-reads it cheaply, and every version retired within the grace period
+# is kept so workers that have not seen a switch yet keep answering from it. The revision changes
+# on every ingestion that changed content, so caches of derived answers know when to drop them.
+POINTER_FILENAME = "CURRENT"
+VERSIONS_DIRNAME = "versions"
+# Pinecone has no key-value storage, so the pointer is the metadata of a placeholder record.
+POINTER_NAMESPACE = "__index_versions__"
+POINTER_ID = "active"
+
+def new_version_name() -> str:
+    return f"v{time.strftime('%Y%m%d%H%M%S')}-{uuid.uuid4().hex[:6]}"
+
+def retired_versions(pointer: dict) -> Dict[str, float]:
+    """Versions replaced so far and when, from the pointer's "<version>@<retired_at>" entries."""
+    if "retired" not in pointer:
+        # Pointers written before retired versions were recorded only know the version they replaced
+        return {pointer["previous"]: pointer["swapped_at"]} if "previous" in pointer else {}
+    retired = {}
+    # Flat strings, since Pinecone metadata cannot hold nested objects
+    for entry in pointer["retired"]:
+        version, _, retired_at = entry.rpartition("@")
+        retired[version] = float(retired_at)
+    return retired
+
+def make_pointer(version: str, previous: Optional[dict], grace_seconds: Optional[float] = None) -> dict:
+    """
+    Pointer switching to `version`. The replaced version joins the retired ones, and those
+    retired longer than `grace_seconds` ago are dropped from the record.
+    """
+    now = time.time()
+    retired = retired_versions(previous) if previous else {}
+    retired[previous["version"] if previous else ""] = now
+    retired.pop(version, None)
+    if grace_seconds is not None:
+        retired = {name: retired_at for name, retired_at in retired.items() if now - retired_at < grace_seconds}
+    return {"version": version, "previous": previous["version"] if previous else "", "swapped_at": now,
+            "retired": [f"{name}@{retired_at}" for name, retired_at in retired.items()], "revision": version}
+
+def new_revision(pointer: Optional[dict], version: str) -> dict:
+    """Pointer for an in-place update of `version`: same version and grace period, new revision."""
+    updated = dict(pointer) if pointer else make_pointer(version, None)
+    updated["revision"] = new_version_name()
+    return updated
+
+def versions_to_keep(pointer: Optional[dict], grace_seconds: float) -> set:
+    """The live version, plus every version retired within the grace period."""
+    if not pointer:
+        return set()
+    now = time.time()
+    keep = {pointer["version"]}
+    keep.update(name for name, retired_at in retired_versions(pointer).items() if now - retired_at < grace_seconds)
+    return keep
+
+class VectorStore:
+    """Retrieval backend: returns the texts of the chunks closest to a query embedding."""
+    backend = "base"
+    # Identifies the indexed content; changes whenever ingestion changes it
+    revision: Optional[str] = None
+
+    async def query(self, vector: np.ndarray, top_k: int, role_id: Optional[str] = None) -> List[str]:
+        raise NotImplementedError
+
+    async def get_overview(self, role_id: str) -> Optional[str]:
+        """Returns the overview of a role precomputed at ingestion, if there is one."""
+        return None
+
+    async def current_revision(self) -> Optional[str]:
+        """Returns the revision of the live index, re-reading the version pointer if it is due."""
+        return self.revision
+
+    def stats(self) -> dict:
+        return {"backend": self.backend}
+
+# --- Pinecone ---
+def read_pinecone_pointer(index) -> Optional[dict]:
+    record = index.fetch(ids=[POINTER_ID], namespace=POINTER_NAMESPACE).vectors.get(POINTER_ID)
+    return dict(record.metadata) if record else None
+
+def write_pinecone_pointer(index, pointer: dict, dimension: int) -> None:
+    placeholder = [1.0] + [0.0] * (dimension - 1)
+    index.upsert(vectors=[{"id": POINTER_ID, "values": placeholder, "metadata": pointer}], namespace=POINTER_NAMESPACE)
+
+# Overviews live next to the pointer, as metadata of placeholder records, one per role.
+def overview_record_id(role_id: str) -> str:
+    return f"overview#{role_id}"
+
+def read_pinecone_overviews(index, role_ids: List[str]) -> Dict[str, dict]:
+    records = index.fetch(ids=[overview_record_id(role_id) for role_id in role_ids], namespace=POINTER_NAMESPACE).vectors
+    return {role_id: dict(records[overview_record_id(role_id)].metadata)
+            for role_id in role_ids if overview_record_id(role_id) in records}
+
+def write_pinecone_overview(index, role_id: str, overview: dict, dimension: int) -> None:
+    placeholder = [1.0] + [0.0] * (dimension - 1)
+    index.upsert(vectors=[{"id": overview_record_id(role_id), "values": placeholder, "metadata": overview}],
+                 namespace=POINTER_NAMESPACE)
+
+class PineconeVectorStore(VectorStore):
+    """
+    Queries the remote Pinecone index, filtering chunks by their role_id metadata.
+    Each index version is a namespace; without a pointer the default namespace is used.
+    """
+    backend = "pinecone"
+
+    def __init__(self, api_key: str, index_name: str, version_check_seconds: float):
+        from pinecone import Pinecone
+        self.client = Pinecone(api_key=api_key)
+        self.index_name = index_name
+        self.version_check_seconds = version_check_seconds
+        self._index = None
+        self._namespace = ""
+        self._checked_at = None
+        # role_id -> (fetched_at, overview text or None)
+        self._overviews: Dict[str, tuple] = {}
+
+    def get_index(self):
+        """Returns the Pinecone index handle, resolving the index host once on first use."""
+        if self._index is None:
+            self._index = self.client.Index(self.index_name)
+        return self._index
+
+    def active_namespace(self) -> str:
+        """Returns the namespace of the live version, re-reading the pointer at most every few seconds."""
+        now = time.monotonic()
+        if self._checked_at is None or now - self._checked_at >= self.version_check_seconds:
+            try:
+                pointer = read_pinecone_pointer(self.get_index())
+                self._namespace = pointer["version"] if pointer else ""
+                self.revision = pointer.get("revision", pointer["version"]) if pointer else None
+            except Exception as e:
+                # Keep serving the version we know; the next query retries
+                logger.warning(f"Could not read the index version pointer: {e}")
+            self._checked_at = now
+        return self._namespace
+
+    async def current_revision(self) -> Optional[str]:
+        if self._checked_at is None or time.monotonic() - self._checked_at >= self.version_check_seconds:
+            await asyncio.to_thread(self.active_namespace)
+        return self.revision
+
+    def _query(self, vector: np.ndarray, top_k: int, role_id: Optional[str]):
+        return self.get_index().query(
+            vector=vector.tolist(), top_k=top_k, namespace=self.active_namespace(),
+            filter={"role_id": role_id} if role_id else None, include_metadata=True,
+        )
+
+    async def query(self, vector: np.ndarray, top_k: int, role_id: Optional[str] = None) -> List[str]:
+        # The Pinecone client is synchronous, so run the query in a worker thread
+        # to keep the event loop free for other sessions.
+        results = await asyncio.to_thread(self._query, vector, top_k, role_id)
+        return [match["metadata"]["text"] for match in results["matches"]]
+
+    def _fetch_overview(self, role_id: str) -> Optional[str]:
+        overview = read_pinecone_overviews(self.get_index(), [role_id]).get(role_id)
+        return overview["text"] if overview else None
+
+    async def get_overview(self, role_id: str) -> Optional[str]:
+        cached = self._overviews.get(role_id)
+        if cached is None or time.monotonic() - cached[0] >= self.version_check_seconds:
+            try:
+                text = await asyncio.to_thread(self._fetch_overview, role_id)
+            except Exception as e:
+                # Without an overview the caller falls back to retrieval and generation
+                logger.warning(f"Could not read the overview of '{role_id}': {e}")
+                return cached[1] if cached else None
+            cached = (time.monotonic(), text)
+            self._overviews[role_id] = cached
+        return cached[1]
+
+    def stats(self) -> dict:
+        return {"backend": self.backend, "index_name": self.index_name, "version": self._namespace or "default"}
+
+# --- Local Index ---
+def read_local_pointer(index_dir: str) -> Optional[dict]:
+    try:
+        with open(os.path.join(index_dir, POINTER_FILENAME), encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+def local_version_dir(index_dir: str, pointer: Optional[dict]) -> str:
+    """Directory of the pointed-to version; an index written before versioning lives in index_dir itself."""
+    return os.path.join(index_dir, VERSIONS_DIRNAME, pointer["version"]) if pointer else index_dir
+
+def publish_local_version(index_dir: str, version: str, grace_seconds: Optional[float] = None) -> dict:
+    """Atomically points the local index at `version`, which must already be fully written."""
+    pointer = make_pointer(version, read_local_pointer(index_dir), grace_seconds)
+    pointer_path = os.path.join(index_dir, POINTER_FILENAME)
+    with open(pointer_path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(pointer, f)
+    os.replace(pointer_path + ".tmp", pointer_path)
+    return pointer
+
+def collect_local_garbage(index_dir: str, grace_seconds: float) -> List[str]:
+    """Deletes the versions that are neither live nor within the grace period. Returns their names."""
+    versions_dir = os.path.join(index_dir, VERSIONS_DIRNAME)
+    pointer = read_local_pointer(index_dir)
+    if not pointer or not os.path.isdir(versions_dir):
+        return []
+    keep = versions_to_keep(pointer, grace_seconds)
+    removed = [version for version in sorted(os.listdir(versions_dir)) if version not in keep]
+    for version in removed:
+        shutil.rmtree(os.path.join(versions_dir, version))
+    return removed
+
+def write_local_index(index_dir: str, model_name: str, chunks_by_role: Dict[str, List[dict]],
+                      vectors_by_role: Dict[str, np.ndarray], overviews: Optional[Dict[str, dict]] = None) -> None:
+    """
+    Writes a local index: per role, a float32 matrix of unit-length vectors (`<role_id>.npy`)
+    and the matching chunk metadata (`<role_id>.json`), plus the role overviews. The manifest
+    is replaced last, so a reader never sees a manifest that points at half-written files.
+    """
+    os.makedirs(index_dir, exist_ok=True)
+    with open(os.path.join(index_dir, OVERVIEWS_FILENAME), "w", encoding="utf-8") as f:
+        json.dump(overviews or {}, f)
+    roles = {}
+    for role_id, chunks in chunks_by_role.items():
+        matrix = np.asarray(vectors_by_role[role_id], dtype=np.float32)
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        matrix = matrix / np.where(norms == 0, 1, norms)
+        np.save(os.path.join(index_dir, f"{role_id}.npy"), matrix)
+        with open(os.path.join(index_dir, f"{role_id}.json"), "w", encoding="utf-8") as f:
+            json.dump(chunks, f)
+        roles[role_id] = {"count": len(chunks)}
+
+    dimension = next((np.shape(v)[1] for v in vectors_by_role.values() if len(v)), 0)
+    manifest_path = os.path.join(index_dir, MANIFEST_FILENAME)
+    with open(manifest_path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump({"model": model_name, "dimension": dimension, "roles": roles}, f)
+    os.replace(manifest_path + ".tmp", manifest_path)
+
+def read_local_overviews(index_dir: str) -> Dict[str, dict]:
+    """Returns the overviews stored with a local index, or {} if there are none."""
+    try:
+        with open(os.path.join(index_dir, OVERVIEWS_FILENAME), encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+def read_local_index_vectors(index_dir: str) -> Dict[str, np.ndarray]:
+    """Returns chunk ID -> vector for an existing local index, or {} if there is none."""
+    manifest_path = os.path.join(index_dir, MANIFEST_FILENAME)
+    if not os.path.exists(manifest_path):
+        return {}
+    with open(manifest_path, encoding="utf-8") as f:
+        manifest = json.load(f)
+    vectors = {}
+    for role_id in manifest["roles"]:
+        matrix = np.load(os.path.join(index_dir, f"{role_id}.npy"))
+        with open(os.path.join(index_dir, f"{role_id}.json"), encoding="utf-8") as f:
+            chunks = json.load(f)
+        vectors.update((chunk["id"], row) for chunk, row in zip(chunks, matrix) if "id" in chunk)
+    return vectors
+
+class LocalVectorStore(VectorStore):
+    """
+    In-process index for small corpora. Each role's vectors are a memory-mapped float32
+    matrix, so a query is one dot product over that role's rows instead of a network
+    round trip, and all workers on a host share the same pages of the file.
+    A new version is picked up on the first query after the pointer file is replaced.
+    """
+    backend = "local"
+
+    def __init__(self, index_dir: str, model_name: str):
+        self.index_dir = index_dir
+        self.model_name = model_name
+        self.version = None
+        # role_id -> (matrix, chunk texts); loaded on first query
+        self._partitions: Optional[Dict[str, tuple]] = None
+        self._overviews: Dict[str, dict] = {}
+        # Identity of the pointer file the partitions were loaded from
+        self._pointer_stamp = None
+        self._lock = threading.Lock()
+
+    def _current_pointer_stamp(self):
+        # os.replace gives the pointer a new inode, so a swap is one stat() away
+        try:
+            stat = os.stat(os.path.join(self.index_dir, POINTER_FILENAME))
+            return (stat.st_ino, stat.st_mtime_ns)
+        except FileNotFoundError:
+            return None
+
+    def is_stale(self) -> bool:
+        return self._partitions is None or self._current_pointer_stamp() != self._pointer_stamp
+
+    def load(self) -> Dict[str, tuple]:
+        with self._lock:
+            stamp = self._current_pointer_stamp()
+            if self._partitions is not None and stamp == self._pointer_stamp:
+                return self._partitions
+            pointer = read_local_pointer(self.index_dir)
+            version_dir = local_version_dir(self.index_dir, pointer)
+            with open(os.path.join(version_dir, MANIFEST_FILENAME), encoding="utf-8") as f:
+                manifest = json.load(f)
+            if manifest["model"] != self.model_name:
+                raise ValueError(
+                    f"FATAL ERROR: Local index at '{version_dir}' was built with '{manifest['model']}', "
+                    f"but EMBEDDING_MODEL is '{self.model_name}'. Re-run the ingestion script."
+                )
+            partitions = {}
+            for role_id in manifest["roles"]:
+                matrix = np.load(os.path.join(version_dir, f"{role_id}.npy"), mmap_mode="r")
+                with open(os.path.join(version_dir, f"{role_id}.json"), encoding="utf-8") as f:
+                    texts = [chunk["text"] for chunk in json.load(f)]
+                partitions[role_id] = (matrix, texts)
+            # Queries already running keep the old matrices; the mapping outlives a deleted file
+            self._overviews = read_local_overviews(version_dir)
+            self._partitions = partitions
+            self._pointer_stamp = stamp
+            self.version = pointer["version"] if pointer else None
+            self.revision = self.version
+            return partitions
+
+    def search(self, vector: np.ndarray, top_k: int, role_id: Optional[str] = None) -> List[str]:
+        partitions = self.load()
+        if role_id:
+            selected = [partitions[role_id]] if role_id in partitions else []
+        else:
+            selected = list(partitions.values())
+        if not selected or top_k <= 0:
+            return []
+
+        query = np.asarray(vector, dtype=np.float32)
+        query = query / (np.linalg.norm(query) or 1.0)
+        scores = np.concatenate([matrix @ query for matrix, _ in selected])
+        texts = [text for _, partition_texts in selected for text in partition_texts]
+        k = min(top_k, len(scores))
+        if k == 0:
+            return []
+        # argpartition finds the top k in linear time; only those k are then sorted
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [texts[i] for i in top]
+
+    async def query(self, vector: np.ndarray, top_k: int, role_id: Optional[str] = None) -> List[str]:
+        if self.is_stale():
+            # Loading reads the manifest and chunk texts, so keep it off the event loop
+            await asyncio.to_thread(self.load)
+        return self.search(vector, top_k, role_id)
+
+    async def current_revision(self) -> Optional[str]:
+        if self.is_stale():
+            await asyncio.to_thread(self.load)
+        return self.revision
+
+    async def get_overview(self, role_id: str) -> Optional[str]:
+        if self.is_stale():
+            await asyncio.to_thread(self.load)
+        overview = self._overviews.get(role_id)
+        return overview["text"] if overview else None
+
+    def stats(self) -> dict:
+        partitions = self._partitions or {}
+        return {
+            "backend": self.backend,
+            "index_dir": self.index_dir,
+            "loaded": self._partitions is not None,
+            "version": self.version,
+            "chunks": {role_id: len(texts) for role_id, (_, texts) in partitions.items()},
+            "overviews": sorted(self._overviews),
+        }
+
+def create_vector_store(backend: str, model_name: str, local_index_dir: str = None,
+                        pinecone_api_key: str = None, pinecone_index_name: str = None,
+                        version_check_seconds: float = 30) -> VectorStore:
+    """Builds the retrieval backend selected by configuration."""
+    if backend == "pinecone":
+        return PineconeVectorStore(pinecone_api_key, pinecone_index_name, version_check_seconds)
+    if backend == "local":
+        return LocalVectorStore(local_index_dir, model_name)
+    raise ValueError(f"FATAL ERROR: Unknown VECTOR_STORE_BACKEND '{backend}'. Use 'pinecone' or 'local'.")
@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+"""
+Test script for the per-role semantic answer cache.
+Uses hand-made vectors, so no embeddings API call is made.
+"""
+
+import time
+import numpy as np
+from app.services.answer_cache import SemanticAnswerCache
+
+def vector(*values):
+    return np.array(values, dtype=np.float32)
+
+def test_similar_question_hits():
+    """A question close enough to a cached one gets its answer; the saved time is counted."""
+    cache = SemanticAnswerCache(similarity_threshold=0.95, max_entries_per_role=10, ttl_seconds=60)
+    cache.store("data_analyst", vector(1.0, 0.0, 0.0), "Bachelor's degree.", 1.5, revision="v1")
+
+    assert cache.lookup("data_analyst", vector(0.99, 0.05, 0.0), "v1") == "Bachelor's degree."
+    assert cache.lookup("data_analyst", vector(0.7, 0.7, 0.0), "v1") is None
+    stats = cache.stats()
+    assert stats["hits"] == 1 and stats["misses"] == 1 and stats["hit_rate"] == 0.5
+    assert stats["saved_seconds"] == 1.5 and stats["avg_saved_ms"] == 1500.0
+    print("✅ Similar questions hit, dissimilar ones miss")
+
+def test_scoped_by_role():
+    """The same question about another role is never answered from this role's entries."""
+    cache = SemanticAnswerCache(0.95, 10, 60)
+    cache.store("data_analyst", vector(1.0, 0.0), "Analyst answer", 1.0, "v1")
+    assert cache.lookup("python_developer", vector(1.0, 0.0), "v1") is None
+    print("✅ Entries are scoped by role")
+
+def test_new_revision_invalidates():
+    """Answers generated from an older index revision are dropped."""
+    cache = SemanticAnswerCache(0.95, 10, 60)
+    cache.store("data_analyst", vector(1.0, 0.0), "Old answer", 1.0, "v1")
+    assert cache.lookup("data_analyst", vector(1.0, 0.0), "v2") is None
+    assert cache.stats()["invalidations"] == 1 and cache.stats()["entries"] == {}
+    print("✅ Re-ingestion invalidates cached answers")
+
+def test_size_and_ttl_bounds():
+    """Each role keeps at most max entries, oldest out first; expired entries never hit."""
+    cache = SemanticAnswerCache(0.95, max_entries_per_role=2, ttl_seconds=60)
+    for i, axis in enumerate(np.eye(3, dtype=np.float32)):
+        cache.store("data_analyst", axis, f"answer {i}", 1.0, "v1")
+    assert cache.stats()["entries"] == {"data_analyst": 2}
+    assert cache.lookup("data_analyst", vector(1.0, 0.0, 0.0), "v1") is None
+    assert cache.lookup("data_analyst", vector(0.0, 0.0, 1.0), "v1") == "answer 2"
+
+    short = SemanticAnswerCache(0.95, 10, ttl_seconds=0.01)
+    short.store("data_analyst", vector(1.0, 0.0), "answer", 1.0, "v1")
+    time.sleep(0.02)
+    assert short.lookup("data_analyst", vector(1.0, 0.0), "v1") is None
+    print("✅ Size and TTL bounds")
+
+if __name__ == "__main__":
+    print("🧪 Testing semantic answer cache...")
+    test_similar_question_hits()
+    test_scoped_by_role()
+    test_new_revision_invalidates()
+    test_size_and_ttl_bounds()
+    print("🎉 All answer cache tests passed!")
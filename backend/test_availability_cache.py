@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""
+Test script for the in-memory availability cache.
+The query and LISTEN/NOTIFY checks run only when TEST_DATABASE_URL points at a PostgreSQL
+database; they use a temporary Schedule table, so existing data is not touched.
+"""
+
+import random
+import asyncio
+from array import array
+from datetime import date, time, timedelta
+
+from testing_support import run_checks, require_postgres
+
+from sqlalchemy import text
+from app.config import SLOT_SEARCH_HORIZON_DAYS
+from app.services.database import create_database_engine
+from app.services.availability_cache import (
+    AvailabilityCache, AvailabilityListener, load_free_slots, notify_booking, notify_reset,
+)
+from app.services.sql_database import find_slots, rank_free_slots
+
+DAY = date(2025, 3, 4)
+
+def free_days(slots: dict) -> dict:
+    """Search range starting at DAY with the given free hours per day offset."""
+    return {DAY + timedelta(days=offset): array("H", [hour * 60 for hour in slots.get(offset, [])])
+            for offset in range(SLOT_SEARCH_HORIZON_DAYS + 1)}
+
+def test_cached_search_ranks_like_the_query():
+    search = rank_free_slots(free_days({0: [10, 15], 1: [15], 2: [11], 3: [9, 10]}), DAY, time(9), time(12))
+    assert search.in_window == ["2025-03-04 10:00"]
+    assert search.same_day == ["2025-03-04 15:00"]
+    assert search.next_days == ["2025-03-06 11:00", "2025-03-07 09:00", "2025-03-07 10:00"]
+    print("✅ Window, same-day and next-day slots from cached arrays")
+
+def test_searches_are_served_from_memory_and_updated_write_through():
+    loads = []
+
+    async def load(position, first_date, last_date):
+        loads.append((position, first_date, last_date))
+        return free_days({0: [9, 10, 11]})
+
+    async def scenario():
+        cache = AvailabilityCache(max_days=1000, ttl_seconds=60)
+        last_date = DAY + timedelta(days=SLOT_SEARCH_HORIZON_DAYS)
+        await cache.free_slots("Analyst", DAY, last_date, load)
+        cached = await cache.free_slots("Analyst", DAY, last_date, load)
+        cache.remove_slot("Analyst", DAY, 10 * 60)
+        updated = await cache.free_slots("Analyst", DAY, last_date, load)
+        cache.apply_notification(f"Analyst\t{DAY.isoformat()}\t11:00")
+        notified = await cache.free_slots("Analyst", DAY, last_date, load)
+        return cache, cached, updated, notified
+
+    cache, cached, updated, notified = asyncio.run(scenario())
+    assert len(loads) == 1
+    assert list(cached[DAY]) == [540, 600, 660], "a write-through update must not change arrays already handed out"
+    assert list(updated[DAY]) == [540, 660] and list(notified[DAY]) == [540]
+    stats = cache.stats()
+    assert stats["hits"] == 3 and stats["misses"] == 1 and stats["write_through_updates"] == 2
+    print("✅ One load, then hits with write-through and notified bookings applied")
+
+def test_load_racing_a_booking_is_not_cached():
+    async def scenario():
+        cache = AvailabilityCache(max_days=1000, ttl_seconds=60)
+        calls = 0
+
+        async def load(position, first_date, last_date):
+            nonlocal calls
+            calls += 1
+            if calls == 1:
+                # The booking commits while the first load is still reading the old state
+                cache.remove_slot("Analyst", DAY, 9 * 60)
+                return free_days({0: [9]})
+            return free_days({})
+
+        last_date = DAY + timedelta(days=SLOT_SEARCH_HORIZON_DAYS)
+        await cache.free_slots("Analyst", DAY, last_date, load)
+        second = await cache.free_slots("Analyst", DAY, last_date, load)
+        return calls, second
+
+    calls, second = asyncio.run(scenario())
+    assert calls == 2 and list(second[DAY]) == []
+    print("✅ A stale load is used once but not cached")
+
+def test_cache_matches_ranked_query_and_receives_notifications():
+    database_url = require_postgres()
+    rng = random.Random(7)
+    slots = [(DAY + timedelta(days=offset), time(hour), rng.random() < 0.3)
+             for offset in range(60) for hour in range(9, 18) if rng.random() < 0.8]
+    engine = create_database_engine(database_url)
+    try:
+        with engine.connect() as connection:
+            # A temporary table shadows the real one for this connection only
+            connection.execute(text('CREATE TEMP TABLE "Schedule" (date DATE, time TIME, position VARCHAR(20), available BOOLEAN)'))
+            connection.execute(text('INSERT INTO "Schedule" VALUES (:date, :time, \'Analyst\', :available)'),
+                               [{"date": d, "time": t, "available": a} for d, t, a in slots])
+            for _ in range(50):
+                day = DAY + timedelta(days=rng.randrange(30))
+                start, end = rng.choice([(time(9), time(12)), (time(12, 1), time(17)), (time(9), time(17))])
+                days = load_free_slots(connection, "Analyst", day, day + timedelta(days=SLOT_SEARCH_HORIZON_DAYS))
+                assert rank_free_slots(days, day, start, end) == find_slots(connection, "Analyst", day, start, end)
+    finally:
+        engine.dispose()
+    print("✅ Cached searches match the ranked query")
+
+    async def scenario():
+        cache = AvailabilityCache(max_days=1000, ttl_seconds=60)
+
+        async def load(position, first_date, last_date):
+            return free_days({0: [9, 10]})
+
+        last_date = DAY + timedelta(days=SLOT_SEARCH_HORIZON_DAYS)
+        listener = AvailabilityListener.from_url(cache, database_url)
+        task = asyncio.create_task(listener.run())
+        await asyncio.wait_for(listener.connected.wait(), 10)
+        await cache.free_slots("Analyst", DAY, last_date, load)
+
+        sender = create_database_engine(database_url)
+        try:
+            with sender.begin() as connection:
+                notify_booking(connection, "Analyst", DAY, 9 * 60)
+            for _ in range(100):
+                if cache.notifications:
+                    break
+                await asyncio.sleep(0.05)
+            after_booking = list((await cache.free_slots("Analyst", DAY, last_date, load))[DAY])
+            with sender.begin() as connection:
+                notify_reset(connection)
+            for _ in range(100):
+                if cache.notifications == 2:
+                    break
+                await asyncio.sleep(0.05)
+            after_reset = cache.stats()["days"]
+        finally:
+            sender.dispose()
+            task.cancel()
+        return after_booking, after_reset
+
+    after_booking, after_reset = asyncio.run(scenario())
+    assert after_booking == [600] and after_reset == 0
+    print("✅ Bookings and resets from another connection arrive through LISTEN/NOTIFY")
+
+if __name__ == "__main__":
+    run_checks(
+        "the availability cache",
+        test_cached_search_ranks_like_the_query,
+        test_searches_are_served_from_memory_and_updated_write_through,
+        test_load_racing_a_booking_is_not_cached,
+        test_cache_matches_ranked_query_and_receives_notifications,
+    )
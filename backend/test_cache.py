@@ -0,0 +1,41 @@
+#!/usr/bin/env python3
+"""
+Test script for the bounded TTL/LRU cache used by the router decision cache.
+Runs in-process, no backend server required.
+"""
+
+import time
+from app.services.cache import TTLCache
+
+def test_hits_and_misses():
+    cache = TTLCache(max_entries=10, ttl_seconds=60)
+    assert cache.get("opener") is None
+    cache.set("opener", "rag_system")
+    assert cache.get("opener") == "rag_system"
+    stats = cache.stats()
+    assert stats["hits"] == 1 and stats["misses"] == 1 and stats["hit_rate"] == 0.5
+    print("✅ Hit/miss accounting")
+
+def test_lru_eviction():
+    cache = TTLCache(max_entries=2, ttl_seconds=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")  # "b" is now the least recently used
+    cache.set("c", 3)
+    assert cache.get("b") is None and cache.get("a") == 1 and cache.get("c") == 3
+    assert cache.stats()["evictions"] == 1
+    print("✅ LRU eviction")
+
+def test_ttl_expiry():
+    cache = TTLCache(max_entries=10, ttl_seconds=0.05)
+    cache.set("a", 1)
+    time.sleep(0.1)
+    assert cache.get("a") is None
+    assert len(cache) == 0
+    print("✅ TTL expiry")
+
+if __name__ == "__main__":
+    print("=== Cache Test ===")
+    test_hits_and_misses()
+    test_lru_eviction()
+    test_ttl_expiry()
@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark of the per-turn Python overhead of the scheduling and RAG prompts.
+Compares building the prompt and chain on every turn (the previous behaviour) with
+the prebuilt per-role chains, and checks both render the same messages.
+No LLM is called: only the prompt step of each chain is run.
+"""
+
+import time
+from datetime import datetime
+
+import testing_support
+
+from langchain_core.messages import HumanMessage, AIMessage
+from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
+from langchain_core.output_parsers import StrOutputParser
+from app.config import JOB_ROLE_MAPPING
+from app.services import sql_database, rag_system
+
+ROLE_ID = "python_developer"
+RUNS = 2000
+
+def per_turn_scheduling_chain(role_id):
+    """How sql_node used to build its chain on every turn."""
+    friendly_name = JOB_ROLE_MAPPING[role_id]['friendly_name']
+    system = sql_database.SCHEDULING_SYSTEM_TEMPLATE.format(
+        friendly_name=friendly_name, role_id=role_id, today=datetime.now().strftime('%Y-%m-%d'))
+    prompt = ChatPromptTemplate.from_messages([
+        ("system", system),
+        MessagesPlaceholder(variable_name="history"),
+        ("user", "{input}"),
+    ])
+    return prompt | sql_database.llm_with_tools
+
+def inputs():
+    return {
+        "input": "Tomorrow morning works for me",
+        "history": [HumanMessage(content="Can I book an interview?"), AIMessage(content="Sure, which day suits you?")],
+    }
+
+def per_turn_us(step):
+    start = time.perf_counter()
+    for _ in range(RUNS):
+        step()
+    return (time.perf_counter() - start) / RUNS * 1e6
+
+def test_prebuilt_prompt_renders_the_same_messages():
+    today = datetime.now().strftime('%Y-%m-%d')
+    before = per_turn_scheduling_chain(ROLE_ID).first.invoke(inputs()).to_messages()
+    after = sql_database.SCHEDULING_CHAINS[ROLE_ID].first.invoke({**inputs(), "today": today}).to_messages()
+    assert before == after
+    assert set(sql_database.SCHEDULING_CHAINS) == set(JOB_ROLE_MAPPING)
+    print("✅ Prebuilt scheduling prompt renders the same messages")
+
+def test_per_turn_overhead():
+    today = datetime.now().strftime('%Y-%m-%d')
+    scheduling_before = per_turn_us(lambda: per_turn_scheduling_chain(ROLE_ID).first.invoke(inputs()))
+    scheduling_after = per_turn_us(
+        lambda: sql_database.SCHEDULING_CHAINS[ROLE_ID].first.invoke({**inputs(), "today": today}))
+
+    rag_inputs = {"context": "SQL and dashboards", "question": "Is it remote?"}
+    rag_before = per_turn_us(lambda: (rag_system.prompt | rag_system.llm | StrOutputParser()).first.invoke(rag_inputs))
+    rag_after = per_turn_us(lambda: rag_system.rag_chain.first.invoke(rag_inputs))
+
+    print(f"   Scheduling prompt: {scheduling_before:.1f} µs -> {scheduling_after:.1f} µs per turn")
+    print(f"   RAG prompt:        {rag_before:.1f} µs -> {rag_after:.1f} µs per turn")
+    assert scheduling_after < scheduling_before
+    print("✅ Prebuilt chains reduce per-turn overhead")
+
+if __name__ == "__main__":
+    print("🧪 Benchmarking per-turn chain overhead...")
+    test_prebuilt_prompt_renders_the_same_messages()
+    test_per_turn_overhead()
+    print("🎉 Chain overhead benchmark complete!")
@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""
+Concurrency benchmark for the chat endpoint.
+Fires many conversations at the backend at once and compares the wall-clock time
+with the summed per-request latency. With the async graph path the LLM calls of
+different sessions overlap, so the wall-clock time should be close to the slowest
+single request instead of the sum of all of them.
+"""
+
+import requests
+import time
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+BASE_URL = "http://localhost:8000"
+
+def send_message(index: int) -> float:
+    """Send one message on its own session and return the request latency in seconds."""
+    test_data = {
+        "session_id": f"test_concurrency_{index}",
+        "user_message": "What are the requirements for the Data Analyst position?"
+    }
+    start = time.perf_counter()
+    response = requests.post(
+        f"{BASE_URL}/chat",
+        json=test_data,
+        headers={"Content-Type": "application/json"},
+        timeout=120
+    )
+    elapsed = time.perf_counter() - start
+    if response.status_code != 200:
+        print(f"❌ Request {index} failed: {response.status_code} {response.text[:100]}")
+    return elapsed
+
+def test_concurrency(concurrency: int = 10):
+    """Run `concurrency` conversations in parallel and report the overlap factor."""
+    print(f"=== Concurrency Benchmark ({concurrency} parallel sessions) ===")
+    try:
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            latencies = list(executor.map(send_message, range(concurrency)))
+        wall_time = time.perf_counter() - start
+    except requests.exceptions.ConnectionError:
+        print("ERROR: Could not connect to the backend server.")
+        print(f"Make sure the backend is running on {BASE_URL}")
+        return
+    except Exception as e:
+        print(f"ERROR: {str(e)}")
+        return
+
+    total_latency = sum(latencies)
+    print(f"Wall-clock time:       {wall_time:.2f}s")
+    print(f"Sum of latencies:      {total_latency:.2f}s")
+    print(f"Slowest request:       {max(latencies):.2f}s")
+    print(f"Mean request latency:  {total_latency / len(latencies):.2f}s")
+    overlap = total_latency / wall_time if wall_time else 0
+    print(f"Overlap factor:        {overlap:.1f}x (1.0x means requests were serialized)")
+    if overlap > concurrency / 2:
+        print("✅ Requests overlapped on the event loop")
+    else:
+        print("❌ Requests look serialized - check for blocking calls in the graph")
+
+if __name__ == "__main__":
+    concurrency = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    test_concurrency(concurrency)
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Test script for the scheduling database engines and pool metrics.
+The PostgreSQL checks run only when TEST_DATABASE_URL points at a scratch database,
+e.g. TEST_DATABASE_URL=postgresql://postgres@localhost:5432/postgres
+"""
+
+import asyncio
+
+from testing_support import run_checks, require_postgres
+
+from prometheus_client import REGISTRY
+from sqlalchemy import text
+from app.config import DB_STATEMENT_TIMEOUT_MS
+from app.services import database
+from app.services.database import (
+    sync_database_url, async_database_url, create_database_engine, create_async_database_engine,
+    run_query, pool_stats,
+)
+
+def test_urls_select_the_shipped_drivers():
+    assert sync_database_url("postgres://u:p@db:5432/app").drivername == "postgresql+psycopg2"
+    url, connect_args = async_database_url("postgresql://u:p@db:6543/app?sslmode=require")
+    assert url.drivername == "postgresql+asyncpg" and "sslmode" not in url.query
+    assert connect_args == {"ssl": "require"}
+    print("✅ psycopg2 and asyncpg URLs")
+
+def test_sync_engine_runs_work_in_a_transaction():
+    def work(connection):
+        connection.execute(text("CREATE TABLE IF NOT EXISTS slots (id INTEGER)"))
+        connection.execute(text("INSERT INTO slots VALUES (1)"))
+        return connection.execute(text("SELECT count(*) FROM slots")).scalar()
+
+    checkouts = REGISTRY.get_sample_value("chatbot_db_pool_checkout_seconds_count", {"engine": "sync"}) or 0
+    assert asyncio.run(run_query(work, write=True)) >= 1
+    assert REGISTRY.get_sample_value("chatbot_db_pool_checkout_seconds_count", {"engine": "sync"}) == checkouts + 1
+    assert pool_stats()["pooled"] is False
+    print("✅ Work runs on the sync engine and the checkout is timed")
+
+def test_postgres_pool_saturation_and_statement_timeout():
+    database_url = require_postgres()
+
+    def slow(connection):
+        return connection.execute(text("SELECT current_setting('statement_timeout'), pg_sleep(0.2)")).first()[0]
+
+    async def scenario():
+        database.async_engine = create_async_database_engine(database_url)
+        try:
+            queries = [asyncio.ensure_future(run_query(slow)) for _ in range(3)]
+            await asyncio.sleep(0.1)
+            during = pool_stats()
+            timeouts = await asyncio.gather(*queries)
+            return during, timeouts
+        finally:
+            await database.async_engine.dispose()
+            database.async_engine = None
+
+    saved_engine = database.engine
+    database.engine = create_database_engine(database_url)
+    try:
+        during, timeouts = asyncio.run(scenario())
+        sync_timeout = asyncio.run(run_query(slow))
+    finally:
+        database.engine.dispose()
+        database.engine = saved_engine
+
+    assert during["engine"] == "async" and during["checked_out"] == 3
+    assert during["saturation"] == round(3 / during["capacity"], 4)
+    expected = f"{DB_STATEMENT_TIMEOUT_MS // 1000}s"
+    assert set(timeouts) == {expected} and sync_timeout == expected
+    print(f"✅ Pool saturation {during['saturation']} with 3 concurrent queries; statement_timeout {expected}")
+
+if __name__ == "__main__":
+    run_checks(
+        "the scheduling database engines",
+        test_urls_select_the_shipped_drivers,
+        test_sync_engine_runs_work_in_a_transaction,
+        test_postgres_pool_saturation_and_statement_timeout,
+    )
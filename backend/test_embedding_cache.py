@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Test script for the two-tier query-embedding cache.
+A counting function stands in for the embeddings API, so no OpenAI call is made.
+"""
+
+import os
+import asyncio
+import tempfile
+import numpy as np
+from app.services.embedding_cache import EmbeddingCache
+
+class CountingEmbedder:
+    def __init__(self):
+        self.calls = 0
+
+    async def __call__(self, text):
+        self.calls += 1
+        return [float(len(text)), 0.5, 0.25]
+
+def test_memory_tier():
+    """Repeat and trivially different queries are served from memory."""
+    embedder = CountingEmbedder()
+    cache = EmbeddingCache("text-embedding-3-small", embedder, max_entries=10, ttl_seconds=60)
+
+    first = asyncio.run(cache.embed_query("What are the requirements?"))
+    second = asyncio.run(cache.embed_query("  what are the   REQUIREMENTS? "))
+    assert embedder.calls == 1
+    assert np.array_equal(first, second) and first.dtype == np.float32
+    assert cache.stats()["hit_rate"] == 0.5
+    print("✅ Memory tier")
+
+def test_disk_tier_survives_restart():
+    """A new process (new cache instance) reads vectors from the shared disk store."""
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "embeddings.sqlite3")
+        embedder = CountingEmbedder()
+        asyncio.run(EmbeddingCache("m", embedder, 10, 60, disk_path=path, dtype="float16").embed_query("is it remote?"))
+
+        restarted = EmbeddingCache("m", embedder, 10, 60, disk_path=path, dtype="float16")
+        vector = asyncio.run(restarted.embed_query("is it remote?"))
+        assert embedder.calls == 1
+        assert vector.dtype == np.float16 and vector[1] == np.float16(0.5)
+        assert restarted.stats()["disk_hits"] == 1
+    print("✅ Disk tier survives restarts")
+
+def test_model_name_is_part_of_the_key():
+    embedder = CountingEmbedder()
+    small = EmbeddingCache("text-embedding-3-small", embedder, 10, 60)
+    large = EmbeddingCache("text-embedding-3-large", embedder, 10, 60)
+    assert small.key("salary") != large.key("salary")
+    print("✅ Keys are scoped by model")
+
+def test_concurrent_requests_share_one_call():
+    """Requests for the same text made while a call is in flight wait for that call."""
+    class SlowEmbedder(CountingEmbedder):
+        async def __call__(self, text):
+            await asyncio.sleep(0.05)
+            return await super().__call__(text)
+
+    async def scenario():
+        embedder = SlowEmbedder()
+        cache = EmbeddingCache("m", embedder, 10, 60)
+        first = asyncio.ensure_future(cache.embed_query("is it remote?"))
+        await asyncio.sleep(0)
+        # The first caller giving up does not fail the others
+        first.cancel()
+        vectors = await asyncio.gather(*(cache.embed_query("Is it remote?") for _ in range(3)))
+        return embedder.calls, cache.stats()["coalesced"], vectors
+
+    calls, coalesced, vectors = asyncio.run(scenario())
+    assert calls == 1 and coalesced == 3
+    assert all(np.array_equal(vectors[0], vector) for vector in vectors)
+    print("✅ Concurrent requests coalesced")
+
+if __name__ == "__main__":
+    print("=== Embedding Cache Test ===")
+    test_memory_tier()
+    test_disk_tier_survives_restart()
+    test_model_name_is_part_of_the_key()
+    test_concurrent_requests_share_one_call()
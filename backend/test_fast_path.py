@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Test script for the router's fast-path matcher.
+Unambiguous messages must be resolved locally; anything else must fall through to the LLM.
+Runs in-process, no backend server or OpenAI call required.
+"""
+
+import time
+import asyncio
+
+import testing_support
+
+from app.services.fast_path import FastPathMatcher, build_phrase_intents
+from app.services.sql_database import sql_node
+
+def test_role_mentions():
+    matcher = FastPathMatcher(build_phrase_intents())
+    for message, role_id in [
+        ("Data Analyst", "data_analyst"),
+        ("data analyst.", "data_analyst"),
+        ("The Python Developer role please", "python_developer"),
+        ("ML", "ml_engineer"),
+        ("Senior SQL Developer", "sql_developer"),
+    ]:
+        decision = matcher.match(message)
+        assert decision and decision.next_node == "rag_system" and decision.job_role_id == role_id, message
+    print("✅ Bare role mentions resolved locally")
+
+def test_sign_offs_and_greetings():
+    matcher = FastPathMatcher(build_phrase_intents())
+    assert matcher.match("Goodbye!").next_node == "end_conversation"
+    assert matcher.match("Thanks, bye").next_node == "end_conversation"
+    assert matcher.match("not interested").next_node == "end_conversation"
+    assert matcher.match("hi").next_node == "rag_system"
+    assert matcher.match("What positions are open?").intent == "position_inquiry"
+    print("✅ Sign-offs, greetings and position questions resolved locally")
+
+def test_ambiguous_messages_fall_through():
+    matcher = FastPathMatcher(build_phrase_intents())
+    for message in [
+        "What are the requirements for the Data Analyst position?",
+        "Data analyst or python developer",
+        "Hi, my name is Sam and I like data",
+        "I can come at 15:00",
+        "yes",
+    ]:
+        assert matcher.match(message) is None, message
+    # Questions around an exit phrase must not end the session
+    for message in [
+        "is the job not for me?",
+        "are you not interested?",
+        "is there no interest?",
+        "are there no more questions?",
+        "do you have no more questions?",
+    ]:
+        assert matcher.match(message) is None, message
+    # A greeting has no fixed answer once a role is being discussed
+    assert matcher.match("hello", current_job_role="ml_engineer") is None
+    print("✅ Ambiguous messages go to the LLM")
+
+def test_role_reply_during_scheduling_goes_to_the_llm():
+    """A bare role answering the scheduling agent's "which position?" must not divert to an overview."""
+    state = asyncio.run(sql_node({"user_message": "I want to book an interview", "logs": []}))
+    assert "which role" in state["bot_response"] and state["booking_status"] == "in_progress"
+
+    matcher = FastPathMatcher(build_phrase_intents())
+    assert matcher.match("Data Analyst", booking_in_progress=True) is None
+    assert matcher.match("Data Analyst").next_node == "rag_system"
+    # Exits still end the session mid-scheduling
+    assert matcher.match("Goodbye!", booking_in_progress=True).next_node == "end_conversation"
+    print("✅ Role replies during scheduling go to the LLM")
+
+def test_hit_rate_and_speed():
+    matcher = FastPathMatcher(build_phrase_intents())
+    messages = ["Data Analyst", "goodbye", "When can I interview?", "hi"] * 2500
+    start = time.perf_counter()
+    for message in messages:
+        matcher.match(message)
+    per_message_us = (time.perf_counter() - start) / len(messages) * 1e6
+    stats = matcher.stats()
+    assert stats["hit_rate"] == 0.75
+    print(f"✅ Hit rate {stats['hit_rate']:.0%}, {per_message_us:.1f}µs per message")
+
+if __name__ == "__main__":
+    print("=== Router Fast-Path Test ===")
+    test_role_mentions()
+    test_sign_offs_and_greetings()
+    test_ambiguous_messages_fall_through()
+    test_role_reply_during_scheduling_goes_to_the_llm()
+    test_hit_rate_and_speed()
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Test script for conversation-history budgeting.
+Checks that nodes get a bounded window of recent messages plus the rolling summary,
+and that a compaction only applies to the history it was computed from.
+Runs in-process, no backend server or OpenAI call required.
+"""
+
+import asyncio
+
+import testing_support
+
+from langchain_core.messages import HumanMessage, AIMessage, SystemMessage
+from app.services.history import (
+    HistoryBudget, HistoryCompaction, build_prompt_history, apply_compaction, needs_compaction,
+    count_message_tokens, count_tokens, get_encoding,
+)
+from app.config import HISTORY_SUMMARY_KEEP_MESSAGES, HISTORY_SUMMARY_BATCH_MESSAGES
+
+def make_history(turns: int, words: int = 5):
+    history = []
+    for turn in range(turns):
+        history.append(HumanMessage(content=f"question {turn} " + "word " * words))
+        history.append(AIMessage(content=f"answer {turn} " + "word " * words))
+    return history
+
+def test_turn_budget():
+    """Only the last max_turns turns are sent."""
+    state = {"conversation_history": make_history(10)}
+    window = build_prompt_history(state, HistoryBudget(max_turns=2, max_tokens=10_000))
+    assert [m.content.split()[:2] for m in window] == [
+        ["question", "8"], ["answer", "8"], ["question", "9"], ["answer", "9"]
+    ]
+    print("✅ Turn budget")
+
+def test_token_budget():
+    """The window stops before the token budget is exceeded but keeps the newest message."""
+    state = {"conversation_history": make_history(10, words=200)}
+    last_two = sum(count_message_tokens(message) for message in state["conversation_history"][-2:])
+    window = build_prompt_history(state, HistoryBudget(max_turns=10, max_tokens=last_two + 1))
+    assert len(window) == 2
+
+    window = build_prompt_history(state, HistoryBudget(max_turns=10, max_tokens=1))
+    assert len(window) == 1 and window[0].content.startswith("answer 9")
+    print("✅ Token budget")
+
+def test_summary_is_prepended():
+    state = {"conversation_history": make_history(3), "history_summary": "The candidate wants the ML role."}
+    window = build_prompt_history(state, HistoryBudget(max_turns=1, max_tokens=10_000))
+    assert isinstance(window[0], SystemMessage) and "ML role" in window[0].content
+    assert len(window) == 3
+    print("✅ Summary prepended")
+
+def test_apply_compaction():
+    """A compaction replaces the summarized prefix, and is skipped if another one won the race."""
+    turns = (HISTORY_SUMMARY_KEEP_MESSAGES + HISTORY_SUMMARY_BATCH_MESSAGES) // 2
+    session = {"conversation_history": make_history(turns), "history_summary": None}
+    assert needs_compaction(session)
+
+    cutoff = len(session["conversation_history"]) - HISTORY_SUMMARY_KEEP_MESSAGES
+    compaction = HistoryCompaction(previous_summary=None, summary="Earlier turns.", cutoff=cutoff)
+    assert apply_compaction(session, compaction)
+    assert len(session["conversation_history"]) == HISTORY_SUMMARY_KEEP_MESSAGES
+    assert session["history_summary"] == "Earlier turns."
+    assert not needs_compaction(session)
+
+    # Applying the same compaction again must not drop more messages
+    assert not apply_compaction(session, compaction)
+    assert len(session["conversation_history"]) == HISTORY_SUMMARY_KEEP_MESSAGES
+    print("✅ Compaction applied once")
+
+def test_token_count_works_offline():
+    """Without a tokenizer the count falls back to about four characters per token."""
+    assert get_encoding() is None
+    assert count_tokens("word " * 200) == 250
+    print("✅ Approximate token count")
+
+if __name__ == "__main__":
+    print("=== History Budget Test ===")
+    test_turn_budget()
+    test_token_budget()
+    test_summary_is_prepended()
+    test_apply_compaction()
+    test_token_count_works_offline()
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+Test script for the Prometheus metrics: scrape output, callback metrics, node timers, external call
+timers and aggregation across worker processes. No external service is called.
+"""
+
+import asyncio
+import os
+import subprocess
+import sys
+import tempfile
+from prometheus_client import REGISTRY
+from app.services.metrics import (
+    NODE_SECONDS, EXTERNAL_CALL_SECONDS, ERRORS, register_callback, render, external_call, timed_node,
+)
+
+def sample(name, **labels):
+    return REGISTRY.get_sample_value(name, labels) or 0
+
+def test_scrape_includes_histograms_and_callback_metrics():
+    NODE_SECONDS.labels(node="demo_scrape", route="rag_system", role="none").observe(0.05)
+    register_callback("demo_cache_lookups_total", "Read at scrape time.", "counter", ("result",),
+                      lambda: {("hit",): 7})
+    text = render().decode()
+    assert "# TYPE chatbot_node_duration_seconds histogram" in text
+    assert 'chatbot_node_duration_seconds_bucket{le="0.05",node="demo_scrape",role="none",route="rag_system"} 1.0' in text
+    assert 'demo_cache_lookups_total{result="hit"} 7.0' in text
+    print("✅ Scrape output has histogram buckets and callback metrics")
+
+def test_timed_node_labels_route_and_role():
+    async def node(state):
+        state["next_node"] = "rag_system"
+        state["current_job_role"] = "data_analyst"
+        return state
+
+    labels = {"node": "demo_node", "route": "rag_system", "role": "data_analyst"}
+    before = sample("chatbot_node_duration_seconds_count", **labels)
+    asyncio.run(timed_node("demo_node", node)({"logs": []}))
+    assert sample("chatbot_node_duration_seconds_count", **labels) == before + 1
+    print("✅ Node latency labelled with route and role")
+
+def test_failures_are_counted_but_cancellation_is_not():
+    async def failing(state):
+        raise RuntimeError("boom")
+
+    try:
+        asyncio.run(timed_node("demo_failing", failing)({}))
+    except RuntimeError:
+        pass
+    assert sample("chatbot_errors_total", component="node", operation="demo_failing") == 1
+
+    async def cancelled_call():
+        with external_call("demo_service", "slow"):
+            await asyncio.sleep(10)
+
+    async def scenario():
+        task = asyncio.ensure_future(cancelled_call())
+        await asyncio.sleep(0)
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+
+    asyncio.run(scenario())
+    assert sample("chatbot_external_call_duration_seconds_count", service="demo_service", operation="slow") == 1
+    assert sample("chatbot_errors_total", component="demo_service", operation="slow") == 0
+    print("✅ Errors counted, cancelled calls timed but not counted as errors")
+
+def test_workers_are_aggregated_in_multiprocess_mode():
+    worker = ("from app.services.metrics import ERRORS; "
+              "ERRORS.labels(component='demo_worker', operation='chat').inc()")
+    with tempfile.TemporaryDirectory() as directory:
+        env = dict(os.environ, PROMETHEUS_MULTIPROC_DIR=directory)
+        for _ in range(2):
+            subprocess.run([sys.executable, "-c", worker], env=env, check=True,
+                           cwd=os.path.dirname(os.path.abspath(__file__)))
+        text = render(multiprocess_dir=directory).decode()
+    assert 'chatbot_errors_total{component="demo_worker",operation="chat"} 2.0' in text
+    print("✅ Counters of two worker processes are summed in one scrape")
+
+if __name__ == "__main__":
+    print("🧪 Testing metrics...")
+    test_scrape_includes_histograms_and_callback_metrics()
+    test_timed_node_labels_route_and_role()
+    test_failures_are_counted_but_cancellation_is_not()
+    test_workers_are_aggregated_in_multiprocess_mode()
+    print("🎉 All metrics tests passed!")
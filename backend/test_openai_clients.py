@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Test script for the shared OpenAI HTTP connection pool.
+Requests go to a local keep-alive server instead of the OpenAI API.
+"""
+
+import asyncio
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import testing_support
+
+import httpx
+from app.services import openai_clients
+from app.services.openai_clients import ConnectionPoolStats, build_http_clients
+
+class KeepAliveHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        body = b'{"ok": true}'
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+def start_server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), KeepAliveHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}/"
+
+def new_clients(stats):
+    return build_http_clients(stats, limits=httpx.Limits(max_connections=4), timeout=httpx.Timeout(5))
+
+def test_sync_requests_reuse_one_connection():
+    server, url = start_server()
+    stats = ConnectionPoolStats()
+    client, async_client = new_clients(stats)
+    try:
+        for _ in range(5):
+            assert client.get(url).status_code == 200
+    finally:
+        client.close()
+        server.shutdown()
+    result = stats.stats()
+    assert result["requests"] == 5 and result["connections_opened"] == 1
+    assert result["connection_reuse_rate"] == 0.8
+    print("✅ Sync requests reuse one kept-alive connection")
+
+def test_async_requests_reuse_one_connection():
+    server, url = start_server()
+    stats = ConnectionPoolStats()
+    client, async_client = new_clients(stats)
+
+    async def scenario():
+        try:
+            for _ in range(5):
+                assert (await async_client.get(url)).status_code == 200
+        finally:
+            await async_client.aclose()
+
+    try:
+        asyncio.run(scenario())
+    finally:
+        client.close()
+        server.shutdown()
+    assert stats.requests == 5 and stats.connections_opened == 1
+    print("✅ Async requests reuse one kept-alive connection")
+
+def test_models_share_the_pool():
+    """Every chat model and the embeddings client are built on the same two clients."""
+    from app.services import router, rag_system, sql_database, history
+    for model in (router.llm, rag_system.llm, sql_database.llm, history.summary_llm):
+        assert model.http_client is openai_clients.http_client
+        assert model.http_async_client is openai_clients.async_http_client
+    assert rag_system.embeddings_model.http_async_client is openai_clients.async_http_client
+    print("✅ All models share the pooled clients")
+
+if __name__ == "__main__":
+    print("🧪 Testing the shared OpenAI connection pool...")
+    test_sync_requests_reuse_one_connection()
+    test_async_requests_reuse_one_connection()
+    test_models_share_the_pool()
+    print("🎉 All connection pool tests passed!")
@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+"""
+Test script for precomputed role overviews.
+A bare role mention is answered from the overview stored with the index, without
+retrieval or an LLM call; other questions still go through retrieval.
+Runs in-process against a temporary local index, no OpenAI or Pinecone call required.
+"""
+
+import os
+import asyncio
+import tempfile
+
+import testing_support
+
+from app.services import rag_system
+from app.services.vector_store import LocalVectorStore, write_local_index, publish_local_version, VERSIONS_DIRNAME
+
+OVERVIEW = "The Data Analyst turns data into decisions."
+
+def write_version(directory, version, overviews):
+    write_local_index(os.path.join(directory, VERSIONS_DIRNAME, version), rag_system.EMBEDDING_MODEL,
+                      {"data_analyst": [{"text": "SQL and dashboards"}]}, {"data_analyst": [[1.0, 0.0]]},
+                      overviews)
+    publish_local_version(directory, version)
+
+def test_overview_served_for_bare_mention():
+    """The stored overview is the answer, with the scheduling call-to-action appended."""
+    with tempfile.TemporaryDirectory() as directory:
+        write_version(directory, "v1", {"data_analyst": {"text": OVERVIEW, "source_hash": "abc"}})
+        rag_system.vector_store = LocalVectorStore(directory, rag_system.EMBEDDING_MODEL)
+        misses = rag_system.embedding_cache.misses
+
+        state = {"user_message": "Data analyst", "current_job_role": "data_analyst",
+                 "role_mention_only": True, "logs": []}
+        result = asyncio.run(rag_system.rag_node(state))
+        assert result["bot_response"].startswith(OVERVIEW)
+        assert "book an interview" in result["bot_response"]
+        assert rag_system.embedding_cache.misses == misses, "no embedding call expected"
+        assert any("precomputed overview" in log for log in result["logs"])
+        print("✅ Overview served for a bare role mention")
+
+def test_new_version_replaces_overview():
+    """Re-ingesting a changed PDF publishes a new overview; a dropped one is no longer served."""
+    with tempfile.TemporaryDirectory() as directory:
+        write_version(directory, "v1", {"data_analyst": {"text": OVERVIEW, "source_hash": "abc"}})
+        store = LocalVectorStore(directory, rag_system.EMBEDDING_MODEL)
+        assert asyncio.run(store.get_overview("data_analyst")) == OVERVIEW
+        assert asyncio.run(store.get_overview("ml_engineer")) is None
+
+        write_version(directory, "v2", {"data_analyst": {"text": "Updated overview.", "source_hash": "def"}})
+        assert asyncio.run(store.get_overview("data_analyst")) == "Updated overview."
+        write_version(directory, "v3", {})
+        assert asyncio.run(store.get_overview("data_analyst")) is None
+        print("✅ Overviews follow the live index version")
+
+if __name__ == "__main__":
+    print("🧪 Testing precomputed role overviews...")
+    test_overview_served_for_bare_mention()
+    test_new_version_replaces_overview()
+    print("🎉 All role overview tests passed!")
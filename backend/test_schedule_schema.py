@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+Test script for the free-slot index migration.
+The checks run only when TEST_DATABASE_URL points at a scratch PostgreSQL database as a
+superuser (a failed concurrent build is simulated through pg_index); they use a temporary
+Schedule table, so existing data is not touched.
+"""
+
+from testing_support import run_checks, require_postgres
+
+from sqlalchemy import text
+from app.services.database import create_database_engine
+from app.services.schedule_schema import (
+    SCHEDULE_SLOTS_INDEX, TRY_BUILD_LOCK_QUERY, BUILD_UNLOCK_QUERY,
+    ensure_schedule_index, schedule_index_state, check_schedule_index, check_schedule_schema,
+)
+
+def test_startup_check_skips_other_databases():
+    engine = create_database_engine("sqlite://")
+    assert check_schedule_index(engine) is None
+    check_schedule_schema(engine)
+    engine.dispose()
+    print("✅ Index check is skipped outside PostgreSQL")
+
+def test_index_is_created_once_and_rebuilt_when_invalid():
+    database_url = require_postgres()
+    engine = create_database_engine(database_url)
+    try:
+        with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as connection:
+            # A temporary table shadows the real one for this connection only
+            connection.execute(text('CREATE TEMP TABLE "Schedule" (date DATE, time TIME, position VARCHAR(20), available BOOLEAN)'))
+            results = [ensure_schedule_index(connection), ensure_schedule_index(connection)]
+            connection.execute(text(
+                f"UPDATE pg_index SET indisvalid = false WHERE indexrelid = 'pg_temp.{SCHEDULE_SLOTS_INDEX}'::regclass"
+            ))
+            invalid_state = schedule_index_state(connection)
+            # Startup only reports an invalid index; the migration rebuilds it
+            results.append(ensure_schedule_index(connection, rebuild=False))
+            results.append(ensure_schedule_index(connection))
+            final_state = schedule_index_state(connection)
+            timeout = connection.execute(text("SHOW statement_timeout")).scalar()
+    finally:
+        engine.dispose()
+
+    assert results == ["created", "present", "invalid", "rebuilt"]
+    assert invalid_state is False and final_state is True
+    assert timeout != "0", "the statement timeout must be restored after the build"
+    print(f"✅ Index created, reused and rebuilt; statement_timeout back to {timeout}")
+
+def test_index_is_left_alone_while_another_session_builds_it():
+    database_url = require_postgres()
+    engine = create_database_engine(database_url)
+    try:
+        with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as builder, \
+                engine.connect().execution_options(isolation_level="AUTOCOMMIT") as connection:
+            connection.execute(text('CREATE TEMP TABLE "Schedule" (date DATE, time TIME, position VARCHAR(20), available BOOLEAN)'))
+            # Another worker is checking or building the index
+            builder.execute(TRY_BUILD_LOCK_QUERY, {"name": SCHEDULE_SLOTS_INDEX})
+            while_locked = ensure_schedule_index(connection)
+            state_while_locked = schedule_index_state(connection)
+            builder.execute(BUILD_UNLOCK_QUERY, {"name": SCHEDULE_SLOTS_INDEX})
+            after_unlock = ensure_schedule_index(connection)
+    finally:
+        engine.dispose()
+
+    assert while_locked == "building" and state_while_locked is None
+    assert after_unlock == "created"
+    print("✅ Index is not touched while another session holds the build lock")
+
+if __name__ == "__main__":
+    run_checks(
+        "the free-slot index migration",
+        test_startup_check_skips_other_databases,
+        test_index_is_created_once_and_rebuilt_when_invalid,
+        test_index_is_left_alone_while_another_session_builds_it,
+    )
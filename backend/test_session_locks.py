@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""
+Test script to verify per-session request serialization.
+Turns of the same session must run one at a time and in order, different sessions
+must run in parallel, and no locks may be left behind. No backend server required.
+"""
+
+import time
+import asyncio
+from app.services.session_locks import SessionLockManager
+
+async def fake_turn(locks, session_id, turn, timeline, duration=0.05):
+    async with locks.hold(session_id):
+        timeline.append((session_id, turn, "start"))
+        await asyncio.sleep(duration)
+        timeline.append((session_id, turn, "end"))
+
+def test_same_session_is_serialized():
+    """Two quick messages of one session never overlap and keep their order."""
+    async def scenario():
+        locks = SessionLockManager()
+        timeline = []
+        await asyncio.gather(*(fake_turn(locks, "s1", turn, timeline) for turn in range(3)))
+        return locks, timeline
+
+    locks, timeline = asyncio.run(scenario())
+    assert timeline == [("s1", turn, phase) for turn in range(3) for phase in ("start", "end")]
+    assert locks.stats()["contended_acquisitions"] == 2
+    assert len(locks) == 0
+    print("✅ Same-session turns run in order")
+
+def test_different_sessions_run_in_parallel():
+    """Turns of different sessions overlap."""
+    async def scenario():
+        locks = SessionLockManager()
+        await asyncio.gather(*(fake_turn(locks, f"s{i}", 0, [], duration=0.1) for i in range(10)))
+        return locks
+
+    start = time.perf_counter()
+    locks = asyncio.run(scenario())
+    elapsed = time.perf_counter() - start
+    assert elapsed < 0.5, f"sessions were serialized ({elapsed:.2f}s)"
+    assert len(locks) == 0
+    print(f"✅ Different sessions run in parallel ({elapsed:.2f}s for 10 x 0.1s)")
+
+def test_lock_released_on_error():
+    """A failing turn releases the lock and removes it from the table."""
+    async def scenario():
+        locks = SessionLockManager()
+        try:
+            async with locks.hold("s1"):
+                raise RuntimeError("graph failed")
+        except RuntimeError:
+            pass
+        return locks
+
+    assert len(asyncio.run(scenario())) == 0
+    print("✅ Lock released after an error")
+
+if __name__ == "__main__":
+    print("=== Session Lock Test ===")
+    test_same_session_is_serialized()
+    test_different_sessions_run_in_parallel()
+    test_lock_released_on_error()
@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+Test script to verify the session stores.
+Checks that the in-memory store evicts idle, excess and oversized sessions, and that
+the SQLite and Redis backends round-trip sessions. Redis is replaced by a local
+stand-in, so no backend server or Redis instance is required.
+"""
+
+import os
+import time
+import asyncio
+import tempfile
+from langchain_core.messages import HumanMessage, AIMessage
+from app.services.session_store import (
+    InMemorySessionStore, SQLiteSessionStore, RedisSessionStore,
+    serialize_session, deserialize_session,
+)
+
+run = asyncio.run
+
+class LocalRedisStandIn:
+    """Minimal in-process stand-in for the asyncio Redis client methods the store uses."""
+
+    def __init__(self):
+        self.values = {}
+
+    def _live(self, key):
+        value, expires_at = self.values.get(key, (None, 0))
+        return value if time.monotonic() < expires_at else None
+
+    async def getex(self, key, ex):
+        value = self._live(key)
+        if value is not None:
+            self.values[key] = (value, time.monotonic() + ex)
+        return value
+
+    async def set(self, key, value, ex):
+        self.values[key] = (value, time.monotonic() + ex)
+
+    async def delete(self, key):
+        self.values.pop(key, None)
+
+def make_session(role="data_analyst"):
+    return {
+        "conversation_history": [HumanMessage(content="Data analyst"), AIMessage(content="Here is an overview... " * 50)],
+        "current_job_role": role,
+        "booking_status": None,
+    }
+
+def test_lru_eviction():
+    """The least recently used session is evicted once max_entries is exceeded."""
+    store = InMemorySessionStore(max_entries=2, idle_ttl_seconds=60, max_memory_bytes=10**9)
+    run(store.create("a"))
+    run(store.create("b"))
+    run(store.get("a"))  # "b" is now the least recently used
+    run(store.create("c"))
+
+    assert run(store.get("a")) is not None and run(store.get("c")) is not None
+    assert run(store.get("b")) is None
+    assert run(store.stats())["evictions"]["lru"] == 1
+    print("✅ LRU eviction")
+
+def test_idle_ttl_eviction():
+    """Sessions idle for longer than the TTL are dropped."""
+    store = InMemorySessionStore(max_entries=10, idle_ttl_seconds=0.05, max_memory_bytes=10**9)
+    run(store.create("idle"))
+    time.sleep(0.1)
+
+    assert run(store.get("idle")) is None
+    assert run(store.stats())["evictions"]["ttl"] == 1
+    print("✅ Idle TTL eviction")
+
+def test_memory_ceiling():
+    """Old sessions are evicted when the estimated memory exceeds the ceiling."""
+    store = InMemorySessionStore(max_entries=10, idle_ttl_seconds=60, max_memory_bytes=20_000)
+    for session_id in ("first", "second"):
+        session = run(store.create(session_id))
+        session["conversation_history"].append(HumanMessage(content="x" * 12_000))
+        run(store.save(session_id, session))
+
+    assert run(store.get("second")) is not None
+    assert run(store.get("first")) is None
+    assert run(store.stats())["evictions"]["memory"] == 1
+    print("✅ Memory ceiling eviction")
+
+def test_current_session_is_kept():
+    """A single session larger than the ceiling is still kept while it is in use."""
+    store = InMemorySessionStore(max_entries=1, idle_ttl_seconds=60, max_memory_bytes=1)
+    session = run(store.create("big"))
+    session["conversation_history"].append(HumanMessage(content="hello"))
+    run(store.save("big", session))
+
+    assert run(store.get("big")) is session
+    print("✅ Current session is never evicted")
+
+def test_serialization_round_trip():
+    """Sessions survive serialization, and long histories are compressed."""
+    session = make_session()
+    data = serialize_session(session)
+    restored = deserialize_session(data)
+
+    assert data[:1] == b"z"
+    assert restored["current_job_role"] == "data_analyst"
+    assert [type(m) for m in restored["conversation_history"]] == [HumanMessage, AIMessage]
+    assert restored["conversation_history"][1].content == session["conversation_history"][1].content
+    print(f"✅ Serialization round trip ({len(data)} bytes)")
+
+def test_sqlite_backend():
+    """Two store instances on the same file (like two workers) see the same sessions."""
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "sessions.sqlite3")
+        worker_1 = SQLiteSessionStore(path, idle_ttl_seconds=60, max_entries=100)
+        worker_2 = SQLiteSessionStore(path, idle_ttl_seconds=60, max_entries=100)
+
+        run(worker_1.save("shared", make_session("ml_engineer")))
+        restored = run(worker_2.get("shared"))
+        assert restored["current_job_role"] == "ml_engineer"
+
+        run(worker_2.delete("shared"))
+        assert run(worker_1.get("shared")) is None
+    print("✅ SQLite backend shared between workers")
+
+def test_redis_backend():
+    """The Redis backend round-trips and deletes sessions."""
+    client = LocalRedisStandIn()
+    store = RedisSessionStore(client, idle_ttl_seconds=60)
+    run(store.save("s1", make_session("sql_developer")))
+    assert run(store.get("s1"))["current_job_role"] == "sql_developer"
+
+    run(store.delete("s1"))
+    assert run(store.get("s1")) is None
+    print("✅ Redis backend")
+
+if __name__ == "__main__":
+    print("=== Session Store Test ===")
+    test_lru_eviction()
+    test_idle_ttl_eviction()
+    test_memory_ceiling()
+    test_current_session_is_kept()
+    test_serialization_round_trip()
+    test_sqlite_backend()
+    test_redis_backend()
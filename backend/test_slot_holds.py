@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Test script for slot holds.
+The hold and booking checks run only when TEST_DATABASE_URL points at a PostgreSQL database;
+they use temporary Schedule and ScheduleHold tables, so existing data is not touched.
+"""
+
+from datetime import date, time, timedelta
+
+from testing_support import run_checks, require_postgres
+
+from sqlalchemy import text
+from app.config import SLOT_SEARCH_HORIZON_DAYS
+from app.services.database import create_database_engine
+from app.services.availability_cache import load_free_slots, without_slots
+from app.services.schedule_schema import HOLDS_TABLE_DDL
+from app.services.slot_holds import hold_slots, hold_ranked_slots, sweep_expired_holds
+from app.services.sql_database import SlotSearch, book_slot, rank_free_slots
+
+DAY = date(2025, 3, 4)
+
+def test_search_keeps_only_held_slots():
+    search = SlotSearch(in_window=["2025-03-04 09:00", "2025-03-04 10:00"], same_day=["2025-03-04 15:00"],
+                        next_days=["2025-03-05 09:00"])
+    assert search.slots()[0] == (DAY, time(9)) and len(search.slots()) == 4
+    held = search.only({(DAY, time(10)), (date(2025, 3, 5), time(9))})
+    assert held == SlotSearch(in_window=["2025-03-04 10:00"], next_days=["2025-03-05 09:00"])
+    print("✅ Slots held by other sessions are left out of the answer")
+
+def test_slots_are_held_in_date_and_time_order():
+    class RecordingConnection:
+        def __init__(self):
+            self.params = []
+
+        def execute(self, query, params):
+            self.params.append(params)
+            return []
+
+    slots = [(date(2025, 3, 5), time(9)), (DAY, time(15)), (DAY, time(10))]
+    orders = []
+    for ranked in (slots, list(reversed(slots))):
+        connection = RecordingConnection()
+        hold_slots(connection, "alice", "Analyst", ranked, minutes=5)
+        orders.append((connection.params[-1]["dates"], connection.params[-1]["times"]))
+    assert orders[0] == orders[1] == ([DAY, DAY, date(2025, 3, 5)], [time(10), time(15), time(9)])
+    print("✅ Holds are taken in (date, time) order whatever the ranking")
+
+def test_holds_protect_presented_slots_until_they_expire():
+    database_url = require_postgres()
+    nine, ten, eleven = (DAY, time(9)), (DAY, time(10)), (DAY, time(11))
+    engine = create_database_engine(database_url)
+    try:
+        with engine.connect() as connection:
+            # Temporary tables shadow the real ones for this connection only
+            connection.execute(text('CREATE TEMP TABLE "Schedule" (date DATE, time TIME, position VARCHAR(20), available BOOLEAN)'))
+            connection.execute(text(str(HOLDS_TABLE_DDL[0]).replace("CREATE TABLE IF NOT EXISTS", "CREATE TEMP TABLE")))
+            connection.execute(text('INSERT INTO "Schedule" VALUES (:date, :time, \'Analyst\', TRUE)'),
+                               [{"date": d, "time": t} for d, t in (nine, ten, eleven)])
+
+            first = hold_slots(connection, "alice", "Analyst", [nine, ten], minutes=5)
+            second = hold_slots(connection, "bob", "Analyst", [nine, eleven], minutes=5)
+            bob_books_held = book_slot(connection, "Analyst", *nine, session_id="bob")
+            alice_books = book_slot(connection, "Analyst", *nine, session_id="alice")
+            # Booking released Alice's hold on 10:00
+            released = hold_slots(connection, "bob", "Analyst", [ten, eleven], minutes=5)
+
+            connection.execute(text('UPDATE "ScheduleHold" SET expires_at = now() - interval \'1 minute\' WHERE session_id = \'bob\''))
+            expired = hold_slots(connection, "carol", "Analyst", [ten], minutes=5)
+            swept = [sweep_expired_holds(connection, batch=1), sweep_expired_holds(connection, batch=1),
+                     sweep_expired_holds(connection, batch=1)]
+            remaining = connection.execute(text('SELECT session_id FROM "ScheduleHold"')).scalars().all()
+
+            # A new search skips Carol's 10:00 and holds what it presents
+            last_date = DAY + timedelta(days=SLOT_SEARCH_HORIZON_DAYS)
+
+            def rank(connection, held_elsewhere):
+                days = without_slots(load_free_slots(connection, "Analyst", DAY, last_date), held_elsewhere)
+                return rank_free_slots(days, DAY, time(9), time(12))
+
+            ranked, requested = hold_ranked_slots(connection, "dave", "Analyst", DAY, last_date, rank, minutes=5)
+    finally:
+        engine.dispose()
+
+    assert first == {nine, ten} and second == {eleven}
+    assert bob_books_held is False and alice_books is True
+    assert released == {ten, eleven}
+    assert expired == {ten}
+    assert swept == [1, 0, 0] and remaining == ["carol"]
+    assert ranked == SlotSearch(in_window=["2025-03-04 11:00"]) and requested == 1
+    print("✅ Holds block other sessions, are released on booking and are taken over and swept once expired")
+
+if __name__ == "__main__":
+    run_checks(
+        "slot holds",
+        test_search_keeps_only_held_slots,
+        test_slots_are_held_in_date_and_time_order,
+        test_holds_protect_presented_slots_until_they_expire,
+    )
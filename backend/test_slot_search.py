@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""
+Test script for the single-round-trip ranked slot search.
+The query checks run only when TEST_DATABASE_URL points at a PostgreSQL database; they use a
+temporary Schedule table, so existing data is not touched.
+"""
+
+from datetime import date, time
+
+from testing_support import run_checks, require_postgres
+
+from sqlalchemy import text
+from app.services.database import create_database_engine
+from app.services.sql_database import SlotSearch, find_slots, describe_slots
+
+def test_answer_falls_back_within_one_tool_call():
+    full = describe_slots(SlotSearch(in_window=["2025-03-04 09:00"]), "2025-03-04", "morning", "Data Analyst")
+    assert full.startswith("Great!") and "next available" not in full
+
+    fallback = describe_slots(SlotSearch(same_day=["2025-03-04 15:00"], next_days=["2025-03-05 09:00"]),
+                              "2025-03-04", "morning", "Data Analyst")
+    assert "other times on that day:\n2025-03-04 15:00" in fallback
+    assert "The next available morning slots after that are:\n2025-03-05 09:00" in fallback
+
+    empty = describe_slots(SlotSearch(), "2025-03-04", "any", "Data Analyst")
+    assert "no available interview slots at all" in empty and "following" in empty
+    print("✅ Ranked results become a single answer")
+
+def test_ranked_query_returns_every_tier():
+    database_url = require_postgres()
+    engine = create_database_engine(database_url)
+    slots = [
+        (date(2025, 3, 4), time(10), True),   # requested window
+        (date(2025, 3, 4), time(15), True),   # same day, other time
+        (date(2025, 3, 5), time(15), True),   # later day, outside the window
+        (date(2025, 3, 6), time(9), False),   # booked
+        (date(2025, 3, 6), time(11), True),   # later day, in the window
+        (date(2025, 3, 7), time(9), True),
+        (date(2025, 3, 7), time(10), True),
+    ]
+    try:
+        with engine.connect() as connection:
+            # A temporary table shadows the real one for this connection only
+            connection.execute(text('CREATE TEMP TABLE "Schedule" (date DATE, time TIME, position VARCHAR(20), available BOOLEAN)'))
+            connection.execute(text('INSERT INTO "Schedule" VALUES (:date, :time, \'Analyst\', :available)'),
+                               [{"date": d, "time": t, "available": a} for d, t, a in slots])
+            search = find_slots(connection, "Analyst", date(2025, 3, 4), time(9), time(12))
+            empty_day = find_slots(connection, "Analyst", date(2025, 3, 3), time(9), time(12))
+    finally:
+        engine.dispose()
+
+    assert search.in_window == ["2025-03-04 10:00"]
+    assert search.same_day == ["2025-03-04 15:00"]
+    assert search.next_days == ["2025-03-06 11:00", "2025-03-07 09:00", "2025-03-07 10:00"]
+    assert empty_day.in_window == [] and empty_day.same_day == []
+    assert empty_day.next_days[:1] == ["2025-03-04 10:00"]
+    print("✅ Window, same-day and next-day slots in one query")
+
+if __name__ == "__main__":
+    run_checks(
+        "ranked slot search",
+        test_answer_falls_back_within_one_tool_call,
+        test_ranked_query_returns_every_tier,
+    )
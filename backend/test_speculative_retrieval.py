@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+Test script for speculative retrieval alongside the router.
+The router and retrieval are replaced by timed stand-ins, so no OpenAI or Pinecone call is made.
+"""
+
+import asyncio
+
+import testing_support
+
+from app.services import speculative
+from app.services.speculative import SpeculativeRetrieval, SpeculationStats, speculative_router_node
+
+ROUTER_SECONDS = 0.2
+RETRIEVAL_SECONDS = 0.15
+
+def fake_router(next_node, job_role_id=None):
+    async def router(state):
+        await asyncio.sleep(ROUTER_SECONDS)
+        state["next_node"] = next_node
+        if job_role_id:
+            state["current_job_role"] = job_role_id
+        return state
+    return router
+
+async def fake_retrieval(query, logs, role_id=None, k=5):
+    await asyncio.sleep(RETRIEVAL_SECONDS)
+    logs.append("retrieved")
+    return f"context for {role_id}"
+
+def run_router(router, role="data_analyst"):
+    speculative.intelligent_router_node = router
+    speculative.get_retrieved_documents = fake_retrieval
+    state = {"user_message": "is it remote?", "current_job_role": role, "logs": []}
+    return asyncio.run(speculative_router_node(state))
+
+def test_used_when_route_and_role_match():
+    """Retrieval finishes behind the router, so the RAG node gets the context without waiting."""
+    async def scenario():
+        speculative.intelligent_router_node = fake_router("rag_system")
+        speculative.get_retrieved_documents = fake_retrieval
+        state = {"user_message": "is it remote?", "current_job_role": "data_analyst", "logs": []}
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        state = await speculative_router_node(state)
+        context = await state["speculative_retrieval"].take()
+        return context, loop.time() - start
+
+    used_before = speculative.speculation_stats.used
+    context, elapsed = asyncio.run(scenario())
+    assert context == "context for data_analyst"
+    assert elapsed < ROUTER_SECONDS + RETRIEVAL_SECONDS, f"retrieval was not overlapped ({elapsed:.3f}s)"
+    assert speculative.speculation_stats.used == used_before + 1
+    print(f"✅ Speculative retrieval used ({elapsed:.3f}s instead of {ROUTER_SECONDS + RETRIEVAL_SECONDS:.3f}s)")
+
+def test_discarded_when_route_or_role_changes():
+    """Scheduling turns and role switches throw the speculative result away and count it."""
+    discarded = dict(speculative.speculation_stats.discarded)
+    state = run_router(fake_router("sql_database"))
+    assert state["speculative_retrieval"] is None
+    state = run_router(fake_router("rag_system", job_role_id="ml_engineer"))
+    assert state["speculative_retrieval"] is None
+    stats = speculative.speculation_stats.stats()
+    assert stats["discarded"]["route"] == discarded.get("route", 0) + 1
+    assert stats["discarded"]["role_changed"] == discarded.get("role_changed", 0) + 1
+    assert stats["wasted_seconds"] > 0
+    print("✅ Discarded on route or role change")
+
+def test_discarded_when_router_fails_or_is_cancelled():
+    """A router error or a cancelled turn stops the retrieval and counts it as discarded."""
+    async def failing_router(state):
+        await asyncio.sleep(0.01)
+        raise RuntimeError("router unavailable")
+
+    async def cancelled_turn():
+        speculative.intelligent_router_node = fake_router("rag_system")
+        task = asyncio.ensure_future(speculative_router_node(
+            {"user_message": "is it remote?", "current_job_role": "data_analyst", "logs": []}))
+        await asyncio.sleep(0.01)
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            return True
+        return False
+
+    discarded = speculative.speculation_stats.discarded.get("error", 0)
+    try:
+        run_router(failing_router)
+        raised = False
+    except RuntimeError:
+        raised = True
+    assert raised, "the router error must propagate"
+    assert asyncio.run(cancelled_turn())
+    assert speculative.speculation_stats.discarded["error"] == discarded + 2
+    print("✅ Discarded when the router fails or the turn is cancelled")
+
+def test_no_speculation_without_role():
+    """Without a current role there is nothing to prefetch."""
+    launched = speculative.speculation_stats.launched
+    state = run_router(fake_router("rag_system", job_role_id="data_analyst"), role=None)
+    assert state["speculative_retrieval"] is None
+    assert speculative.speculation_stats.launched == launched
+    print("✅ No speculation without a role")
+
+def test_failed_retrieval_falls_back():
+    """A failed speculative retrieval returns None, so the RAG node retrieves normally."""
+    async def failing(logs):
+        raise RuntimeError("index unavailable")
+
+    async def scenario():
+        stats = SpeculationStats()
+        result = await SpeculativeRetrieval("data_analyst", failing, stats).take()
+        return result, stats
+
+    result, stats = asyncio.run(scenario())
+    assert result is None and stats.failed == 1 and stats.used == 0
+    print("✅ Failed speculation falls back")
+
+if __name__ == "__main__":
+    print("🧪 Testing speculative retrieval...")
+    test_used_when_route_and_role_match()
+    test_discarded_when_route_or_role_changes()
+    test_discarded_when_router_fails_or_is_cancelled()
+    test_no_speculation_without_role()
+    test_failed_retrieval_falls_back()
+    print("🎉 All speculative retrieval tests passed!")
@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""
+Test script for the streaming chat endpoint.
+Prints the server-sent events as they arrive and compares the time to the
+first answer token with the total turn latency.
+"""
+
+import requests
+import json
+import time
+
+def test_streaming():
+    """Stream a RAG question and report time-to-first-token."""
+    test_data = {
+        "session_id": "test_streaming",
+        "user_message": "What are the requirements for the Data Analyst position?"
+    }
+
+    print("=== Streaming Chat Test ===")
+    try:
+        start = time.perf_counter()
+        first_token_at = None
+        event_name = None
+        final_payload = None
+        with requests.post(
+            "http://localhost:8000/chat/stream",
+            json=test_data,
+            headers={"Content-Type": "application/json"},
+            stream=True,
+            timeout=120
+        ) as response:
+            print(f"Status Code: {response.status_code}")
+            for line in response.iter_lines(decode_unicode=True):
+                if line.startswith("event:"):
+                    event_name = line[len("event:"):].strip()
+                elif line.startswith("data:"):
+                    data = json.loads(line[len("data:"):].strip())
+                    if event_name == "token":
+                        if first_token_at is None:
+                            first_token_at = time.perf_counter() - start
+                    elif event_name in ("node", "route"):
+                        print(f"[{time.perf_counter() - start:6.2f}s] {event_name}: {data}")
+                    elif event_name in ("done", "error"):
+                        final_payload = data
+                        print(f"[{time.perf_counter() - start:6.2f}s] {event_name}")
+        total = time.perf_counter() - start
+
+        if final_payload is None:
+            print("❌ Stream ended without a done event")
+            return
+        print(f"Bot Response: {final_payload.get('bot_response', 'No response')[:200]}...")
+        print(f"Logs: {final_payload.get('logs', [])}")
+        if first_token_at is not None:
+            print(f"✅ Time to first token: {first_token_at:.2f}s (total {total:.2f}s)")
+        else:
+            print(f"❌ No tokens were streamed (total {total:.2f}s)")
+    except Exception as e:
+        print(f"ERROR: {str(e)}")
+
+if __name__ == "__main__":
+    test_streaming()
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Test script for request trace IDs and the Server-Timing breakdown.
+No external service is called: Postgres is replaced by in-memory SQLite.
+"""
+
+import asyncio
+
+import testing_support
+
+import httpx
+from sqlalchemy import event, text
+from app.services.tracing import start_trace, current_trace, RequestTrace
+from app.services.metrics import external_call, timed_node
+from app.services.openai_clients import ConnectionPoolStats, build_http_clients
+
+def run_in_trace(scenario, trace_id=None):
+    """Runs `scenario` in a fresh context, as each request is, and returns its trace."""
+    async def main():
+        trace = start_trace(trace_id)
+        await scenario()
+        return trace
+    return asyncio.run(main())
+
+def test_stages_add_up_across_tasks_and_threads():
+    async def router(state):
+        await asyncio.sleep(0.02)
+        return state
+
+    async def retrieval():
+        with external_call("vector_store", "query"):
+            await asyncio.to_thread(lambda: None)
+            await asyncio.sleep(0.01)
+
+    async def scenario():
+        await timed_node("router", router)({})
+        # Like speculative retrieval, started as its own task
+        await asyncio.ensure_future(retrieval())
+        with external_call("openai", "generation"):
+            await asyncio.sleep(0.01)
+
+    timings = run_in_trace(scenario).timings_ms()
+    assert list(timings) == ["router", "retrieval", "generation", "total"]
+    assert timings["router"] >= 20 and timings["retrieval"] >= 10 and timings["generation"] >= 10
+    assert timings["total"] >= timings["router"] + timings["retrieval"] + timings["generation"]
+    print(f"✅ Stage timings: {timings}")
+
+def test_server_timing_header_format():
+    trace = RequestTrace("abc")
+    trace.add("sql", 0.0123)
+    header = trace.server_timing()
+    assert header.startswith("sql;dur=12.3, total;dur=")
+    print(f"✅ Server-Timing: {header}")
+
+def test_requested_ids_are_kept_only_when_well_formed():
+    assert run_in_trace(lambda: asyncio.sleep(0), "turn-42").trace_id == "turn-42"
+    generated = run_in_trace(lambda: asyncio.sleep(0), "bad id */ DROP TABLE").trace_id
+    assert generated != "bad id */ DROP TABLE" and len(generated) == 32
+    print("✅ Caller trace IDs validated")
+
+def test_trace_id_sent_with_openai_requests():
+    seen = []
+
+    async def handler(request):
+        seen.append(request.headers.get("X-Client-Request-Id"))
+        return httpx.Response(200, json={})
+
+    async def scenario():
+        _, client = build_http_clients(ConnectionPoolStats(), httpx.Limits(), httpx.Timeout(5))
+        client._transport = httpx.MockTransport(handler)
+        await client.get("http://openai.test/v1/models")
+        await client.aclose()
+
+    trace = run_in_trace(scenario)
+    assert seen == [trace.trace_id]
+    print("✅ Trace ID sent as X-Client-Request-Id")
+
+def test_sql_text_stays_the_same_across_traces():
+    import logging
+    from app.services import database
+    statements, messages = [], []
+
+    def capture(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    class Capture(logging.Handler):
+        def emit(self, record):
+            messages.append(record.getMessage())
+
+    handler = Capture(level=logging.DEBUG)
+    database.logger.addHandler(handler)
+    previous_level = database.logger.level
+    database.logger.setLevel(logging.DEBUG)
+    event.listen(database.engine, "after_cursor_execute", capture)
+    try:
+        async def scenario():
+            with database.engine.connect() as connection:
+                connection.execute(text("SELECT 1"))
+        traces = [run_in_trace(scenario), run_in_trace(scenario)]
+    finally:
+        event.remove(database.engine, "after_cursor_execute", capture)
+        database.logger.removeHandler(handler)
+        database.logger.setLevel(previous_level)
+    # Identical text, so prepared statements are reused from one turn to the next
+    assert statements == ["SELECT 1", "SELECT 1"]
+    assert [f"trace_id={trace.trace_id}" in message for trace, message in zip(traces, messages)] == [True, True]
+    assert current_trace.get() is None
+    print("✅ SQL text is shared across turns; trace IDs are logged with statement timings")
+
+if __name__ == "__main__":
+    print("🧪 Testing request tracing...")
+    test_stages_add_up_across_tasks_and_threads()
+    test_server_timing_header_format()
+    test_requested_ids_are_kept_only_when_well_formed()
+    test_trace_id_sent_with_openai_requests()
+    test_sql_text_stays_the_same_across_traces()
+    print("🎉 All tracing tests passed!")
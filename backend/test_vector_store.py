@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+"""
+Test script for the local in-process vector index.
+Builds a tiny index in a temporary directory, so no embeddings API or Pinecone call is made.
+"""
+
+import os
+import time
+import asyncio
+import tempfile
+import numpy as np
+from app.services.vector_store import (
+    LocalVectorStore, write_local_index, read_local_index_vectors, create_vector_store,
+    publish_local_version, collect_local_garbage, read_local_pointer, VERSIONS_DIRNAME,
+    make_pointer, retired_versions, versions_to_keep,
+)
+
+def build_index(directory, model_name="text-embedding-3-small"):
+    chunks_by_role = {
+        "data_analyst": [{"text": "SQL and dashboards"}, {"text": "Excel reporting"}],
+        "python_developer": [{"text": "Django services"}, {"text": "Async Python"}, {"text": "Testing"}],
+    }
+    vectors_by_role = {
+        "data_analyst": [[1.0, 0.0, 0.0], [0.0, 2.0, 0.0]],
+        "python_developer": [[0.0, 0.0, 3.0], [0.6, 0.8, 0.0], [0.8, 0.0, 0.6]],
+    }
+    write_local_index(directory, model_name, chunks_by_role, vectors_by_role)
+
+def test_top_k_per_role():
+    """Results are ordered by cosine similarity and restricted to the requested role."""
+    with tempfile.TemporaryDirectory() as directory:
+        build_index(directory)
+        store = LocalVectorStore(directory, "text-embedding-3-small")
+
+        query = np.array([1.0, 0.1, 0.0], dtype=np.float32)
+        assert asyncio.run(store.query(query, top_k=2, role_id="data_analyst")) == ["SQL and dashboards", "Excel reporting"]
+        assert asyncio.run(store.query(query, top_k=1, role_id="python_developer")) == ["Testing"]
+        assert asyncio.run(store.query(query, top_k=10, role_id="ml_engineer")) == []
+        # Without a role every partition is searched
+        assert asyncio.run(store.query(query, top_k=2)) == ["SQL and dashboards", "Testing"]
+        assert store.stats()["chunks"] == {"data_analyst": 2, "python_developer": 3}
+        print("✅ Top-k per role")
+
+def test_float16_query_and_memory_map():
+    """Cached float16 query vectors work, and the matrices are memory-mapped rather than copied."""
+    with tempfile.TemporaryDirectory() as directory:
+        build_index(directory)
+        store = LocalVectorStore(directory, "text-embedding-3-small")
+        results = store.search(np.array([0.0, 0.0, 1.0], dtype=np.float16), top_k=1, role_id="python_developer")
+        assert results == ["Django services"]
+        matrix, _ = store.load()["python_developer"]
+        assert isinstance(matrix, np.memmap)
+        assert np.allclose(np.linalg.norm(matrix, axis=1), 1.0)
+        print("✅ float16 queries and memory-mapped matrices")
+
+def test_model_mismatch_is_rejected():
+    """An index built with another embedding model is never queried."""
+    with tempfile.TemporaryDirectory() as directory:
+        build_index(directory, model_name="text-embedding-ada-002")
+        store = create_vector_store("local", "text-embedding-3-small", local_index_dir=directory)
+        try:
+            store.search(np.ones(3, dtype=np.float32), top_k=1)
+        except ValueError:
+            print("✅ Model mismatch rejected")
+            return
+        raise AssertionError("expected ValueError")
+
+def test_read_back_vectors_by_id():
+    """Re-ingestion can reuse the stored vector of every chunk whose ID is unchanged."""
+    with tempfile.TemporaryDirectory() as directory:
+        assert read_local_index_vectors(directory) == {}
+        write_local_index(directory, "m",
+                          {"data_analyst": [{"id": "data_analyst#a", "text": "x"}, {"id": "data_analyst#b", "text": "y"}]},
+                          {"data_analyst": [[3.0, 4.0], [0.0, 1.0]]})
+        vectors = read_local_index_vectors(directory)
+        assert sorted(vectors) == ["data_analyst#a", "data_analyst#b"]
+        assert np.allclose(vectors["data_analyst#a"], [0.6, 0.8])
+        print("✅ Stored vectors read back by chunk ID")
+
+def write_version(directory, version, text):
+    write_local_index(os.path.join(directory, VERSIONS_DIRNAME, version), "m",
+                      {"data_analyst": [{"text": text}]}, {"data_analyst": [[1.0, 0.0]]})
+    publish_local_version(directory, version)
+
+def test_version_swap():
+    """A published version is served from the next query on; queries never see a partial index."""
+    with tempfile.TemporaryDirectory() as directory:
+        write_version(directory, "v1", "old")
+        store = LocalVectorStore(directory, "m")
+        query = np.array([1.0, 0.0], dtype=np.float32)
+        assert asyncio.run(store.query(query, top_k=1)) == ["old"]
+
+        # Writing the next version does not touch the live one
+        write_local_index(os.path.join(directory, VERSIONS_DIRNAME, "v2"), "m",
+                          {"data_analyst": [{"text": "new"}]}, {"data_analyst": [[1.0, 0.0]]})
+        assert not store.is_stale()
+        assert asyncio.run(store.query(query, top_k=1)) == ["old"]
+
+        publish_local_version(directory, "v2")
+        assert store.is_stale()
+        assert asyncio.run(store.query(query, top_k=1)) == ["new"]
+        assert store.stats()["version"] == "v2"
+        assert read_local_pointer(directory)["previous"] == "v1"
+        print("✅ Version swap")
+
+def test_garbage_collection_grace_period():
+    """Every version retired within the grace period survives, even after back-to-back rebuilds."""
+    with tempfile.TemporaryDirectory() as directory:
+        for version in ("v1", "v2", "v3"):
+            write_version(directory, version, version)
+        # v1 was replaced by v2 moments before v3 replaced v2; workers may still query either
+        assert set(retired_versions(read_local_pointer(directory))) >= {"v1", "v2"}
+        assert collect_local_garbage(directory, grace_seconds=60) == []
+        assert sorted(os.listdir(os.path.join(directory, VERSIONS_DIRNAME))) == ["v1", "v2", "v3"]
+        assert collect_local_garbage(directory, grace_seconds=0) == ["v1", "v2"]
+        # The live version is always kept
+        assert asyncio.run(LocalVectorStore(directory, "m").query(np.ones(2), top_k=1)) == ["v3"]
+        print("✅ Garbage collection after the grace period")
+
+def test_retired_versions_expire_one_by_one():
+    """Each retired version has its own grace period, and expired ones are dropped from the pointer."""
+    now = time.time()
+    pointer = {"version": "v3", "previous": "v2", "swapped_at": now - 10,
+               "retired": [f"v1@{now - 100}", f"v2@{now - 10}"], "revision": "v3"}
+    assert versions_to_keep(pointer, grace_seconds=60) == {"v2", "v3"}
+    assert set(retired_versions(make_pointer("v4", pointer, grace_seconds=60))) == {"v2", "v3"}
+    # Pointers written before retired versions were recorded keep the version they replaced
+    legacy = {"version": "v3", "previous": "v2", "swapped_at": now - 10, "revision": "v3"}
+    assert versions_to_keep(legacy, grace_seconds=60) == {"v2", "v3"}
+    print("✅ Retired versions expire one by one")
+
+def test_query_latency():
+    """A realistic per-role partition (a few hundred 1536-d chunks) is searched in well under a millisecond."""
+    with tempfile.TemporaryDirectory() as directory:
+        rng = np.random.default_rng(0)
+        vectors = rng.standard_normal((400, 1536)).astype(np.float32)
+        write_local_index(directory, "m", {"data_analyst": [{"text": str(i)} for i in range(400)]},
+                          {"data_analyst": vectors})
+        store = LocalVectorStore(directory, "m")
+        query = vectors[123]
+        assert store.search(query, top_k=5, role_id="data_analyst")[0] == "123"
+
+        runs = 1000
+        start = time.perf_counter()
+        for _ in range(runs):
+            store.search(query, top_k=5, role_id="data_analyst")
+        per_query_us = (time.perf_counter() - start) / runs * 1e6
+        print(f"✅ Local query latency: {per_query_us:.1f} µs")
+        assert per_query_us < 5000
+
+if __name__ == "__main__":
+    print("🧪 Testing local vector store...")
+    test_top_k_per_role()
+    test_float16_query_and_memory_map()
+    test_model_mismatch_is_rejected()
+    test_read_back_vectors_by_id()
+    test_version_swap()
+    test_garbage_collection_grace_period()
+    test_retired_versions_expire_one_by_one()
+    test_query_latency()
+    print("🎉 All local vector store tests passed!")
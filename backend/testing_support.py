@@ -0,0 +1,47 @@
+"""
+Shared setup for the in-process test scripts.
+Importing this module points the app config at offline stand-ins (a dummy OpenAI key, in-memory
+SQLite, the local vector store and approximate token counts instead of tiktoken's downloaded BPE
+file), so test scripts import it before anything from `app`.
+"""
+
+import os
+
+os.environ.setdefault("OPENAI_API_KEY", "test")
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+os.environ["VECTOR_STORE_BACKEND"] = "local"
+os.environ["HISTORY_TOKENIZER_MODEL"] = ""
+
+# Scratch PostgreSQL database for the checks that need one,
+# e.g. TEST_DATABASE_URL=postgresql://postgres@localhost:5432/postgres
+TEST_DATABASE_URL = os.getenv("TEST_DATABASE_URL")
+
+try:
+    import pytest
+    # Raised as pytest's own skip, so pytest reports the check as skipped
+    Skipped = pytest.skip.Exception
+except ImportError:
+    class Skipped(Exception):
+        """A check that could not run in this environment."""
+
+def require_postgres() -> str:
+    """Returns TEST_DATABASE_URL, or skips the calling check when it is not set."""
+    if not TEST_DATABASE_URL:
+        raise Skipped("TEST_DATABASE_URL not set - skipping PostgreSQL checks")
+    return TEST_DATABASE_URL
+
+def run_checks(name: str, *checks) -> None:
+    """Runs test functions as a script; skipped checks are listed in the summary instead of passing silently."""
+    print(f"🧪 Testing {name}...")
+    skipped = []
+    for check in checks:
+        try:
+            check()
+        except Skipped as e:
+            skipped.append(check.__name__)
+            print(f"⏭️  {check.__name__}: {e}")
+    if skipped:
+        print(f"⚠️ {len(checks) - len(skipped)} of {len(checks)} {name} checks passed, "
+              f"{len(skipped)} skipped: {', '.join(skipped)}")
+    else:
+        print(f"🎉 All {name} checks passed!")
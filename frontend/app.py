@@ -1,6 +1,7 @@
 import streamlit as st
 import requests
 import uuid
+import json
 import sys
 import os
 
@@ -16,6 +17,8 @@ except Exception as e:
     class FallbackConfig:
         def get_chat_endpoint(self):
             return "http://localhost:8000/chat"
+        def get_chat_stream_endpoint(self):
+            return "http://localhost:8000/chat/stream"
         def get_health_endpoint(self):
             return "http://localhost:8000/health"
         def get_env_test_endpoint(self):
@@ -50,6 +53,36 @@ except Exception as e:
 
 st.set_page_config(page_title="AI Career Assistant", page_icon="🤖")
 
+def stream_chat(payload, placeholder):
+    """
+    Sends the message to the streaming endpoint and renders answer tokens as they arrive.
+    Returns the final response payload from the `done` event.
+    """
+    with requests.post(config.get_chat_stream_endpoint(), json=payload, stream=True, timeout=60) as response:
+        response.raise_for_status()
+        streamed_text = ""
+        event_name = None
+        for line in response.iter_lines(decode_unicode=True):
+            if line.startswith("event:"):
+                event_name = line[len("event:"):].strip()
+            elif line.startswith("data:"):
+                data = json.loads(line[len("data:"):].strip())
+                if event_name == "token":
+                    streamed_text += data.get("content", "")
+                    placeholder.markdown(streamed_text + "▌")
+                elif event_name in ("done", "error"):
+                    return data
+    raise requests.exceptions.RequestException("The response stream ended unexpectedly.")
+
+def format_trace(trace_id, timings):
+    """Header lines for the logs expander, so a slow turn can be matched to its backend trace."""
+    lines = []
+    if trace_id:
+        lines.append(f"Trace ID: {trace_id}")
+    if timings:
+        lines.append("Timings: " + ", ".join(f"{stage} {ms:.0f} ms" for stage, ms in timings.items()))
+    return lines
+
 # --- Page Title ---
 st.title("🤖 AI Career Assistant")
 
@@ -97,7 +130,8 @@ for message in st.session_state.messages:
         if "logs" in message and message["logs"]:
             log_title = f"Show logs for session: {message.get('session_id', st.session_state.session_id)}"
             with st.expander(log_title):
-                st.code("\n".join(message["logs"]), language="log")
+                trace_lines = format_trace(message.get("trace_id"), message.get("timings"))
+                st.code("\n".join(trace_lines + message["logs"]), language="log")
 
 # --- User Input Handling ---
 if prompt := st.chat_input("Ask me anything..."):
@@ -115,12 +149,11 @@ if prompt := st.chat_input("Ask me anything..."):
         try:
             request_session_id = st.session_state.session_id
             payload = {"session_id": request_session_id, "user_message": prompt}
-            response = requests.post(config.get_chat_endpoint(), json=payload, timeout=60)
-            response.raise_for_status()
-            
-            response_data = response.json()
+            response_data = stream_chat(payload, message_placeholder)
             bot_response = response_data.get("bot_response", "Sorry, something went wrong.")
             logs = response_data.get("logs", [])
+            trace_id = response_data.get("trace_id")
+            timings = response_data.get("timings")
             new_session_required = response_data.get("new_session_required", False)
             backend_new_session_id = response_data.get("new_session_id")
             backend_welcome_message = response_data.get("welcome_message")
@@ -129,16 +162,19 @@ if prompt := st.chat_input("Ask me anything..."):
             st.error(f"Could not connect to the backend: {e}")
             bot_response = "I'm having trouble connecting to my brain. Please make sure the backend is running and the URL is correct."
             logs = []
+            trace_id = None
+            timings = None
             new_session_required = False
         
         message_placeholder.markdown(bot_response)
         if logs:
             log_title = f"Show logs for session: {st.session_state.session_id}"
             with st.expander(log_title):
-                st.code("\n".join(logs), language="log")
+                st.code("\n".join(format_trace(trace_id, timings) + logs), language="log")
 
     st.session_state.messages.append({
-        "role": "assistant", "content": bot_response, "logs": logs, "session_id": request_session_id
+        "role": "assistant", "content": bot_response, "logs": logs, "session_id": request_session_id,
+        "trace_id": trace_id, "timings": timings,
     })
     
     # Check if we need to start a new session (based on explicit backend signal)
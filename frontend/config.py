@@ -90,6 +90,10 @@ class Config:
         """Get the chat endpoint URL."""
         return self.get_backend_endpoint("chat")
     
+    def get_chat_stream_endpoint(self) -> str:
+        """Get the streaming (server-sent events) chat endpoint URL."""
+        return self.get_backend_endpoint("chat/stream")
+    
     def get_health_endpoint(self) -> str:
         """Get the health endpoint URL."""
         return self.get_backend_endpoint("health")
@@ -109,6 +113,7 @@ class Config:
             st.sidebar.markdown("### 🔗 Endpoints")
             st.sidebar.markdown(f"**Health:** {self.get_health_endpoint()}")
             st.sidebar.markdown(f"**Chat:** {self.get_chat_endpoint()}")
+            st.sidebar.markdown(f"**Chat stream:** {self.get_chat_stream_endpoint()}")
 
 # Global configuration instance
 config = Config()
@@ -0,0 +1,104 @@
+import os
+import sys
+import time
+import random
+import argparse
+import statistics
+from datetime import date, time as time_of_day, timedelta
+from sqlalchemy import text
+from dotenv import load_dotenv
+
+# Add project root to sys.path to allow importing from backend
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+dotenv_path = os.path.join(os.path.dirname(__file__), '..', 'backend', '.env')
+load_dotenv(dotenv_path=dotenv_path)
+
+from backend.app.services.database import create_database_engine
+from backend.app.services.schedule_schema import ensure_schedule_index
+from backend.app.services.sql_database import find_slots, get_time_range
+
+# Everything is created in its own schema, so the real "Schedule" table is never touched
+BENCHMARK_SCHEMA = "slot_search_benchmark"
+START_DATE = date(2025, 1, 1)
+
+def build_dataset(connection, years: int, positions: int) -> int:
+    connection.execute(text(f"DROP SCHEMA IF EXISTS {BENCHMARK_SCHEMA} CASCADE"))
+    connection.execute(text(f"CREATE SCHEMA {BENCHMARK_SCHEMA}"))
+    connection.execute(text(f"SET search_path TO {BENCHMARK_SCHEMA}"))
+    connection.execute(text("""
+        CREATE TABLE "Schedule" (
+            "ScheduleID" SERIAL PRIMARY KEY,
+            date DATE NOT NULL, time TIME NOT NULL,
+            position VARCHAR(20) NOT NULL, available BOOLEAN NOT NULL
+        )
+    """))
+    # Same shape as the seeder: weekdays except Monday and Saturday, hourly 09:00-17:00, half booked
+    connection.execute(text("""
+        INSERT INTO "Schedule" (date, time, position, available)
+        SELECT day::date, make_time(hour, 0, 0), 'Position ' || position, random() >= 0.5
+        FROM generate_series(CAST(:start AS date), CAST(:end AS date), interval '1 day') AS day,
+             generate_series(9, 17) AS hour,
+             generate_series(1, :positions) AS position
+        WHERE extract(dow FROM day) NOT IN (1, 6)
+    """), {"start": START_DATE, "end": START_DATE + timedelta(days=365 * years - 1), "positions": positions})
+    connection.execute(text('ANALYZE "Schedule"'))
+    return connection.execute(text('SELECT count(*) FROM "Schedule"')).scalar()
+
+def random_searches(count: int, years: int, positions: int):
+    rng = random.Random(42)
+    preferences = ("morning", "afternoon", "any")
+    return [
+        (f"Position {rng.randint(1, positions)}", START_DATE + timedelta(days=rng.randrange(365 * years)),
+         rng.choice(preferences))
+        for _ in range(count)
+    ]
+
+def time_searches(connection, searches) -> list:
+    timings = []
+    for position, day, preference in searches:
+        start_time, end_time = get_time_range(preference)
+        started = time.perf_counter()
+        find_slots(connection, position, day, time_of_day.fromisoformat(start_time), time_of_day.fromisoformat(end_time))
+        timings.append((time.perf_counter() - started) * 1000)
+    return timings
+
+def summarize(label: str, timings: list) -> str:
+    ordered = sorted(timings)
+    p95 = ordered[int(len(ordered) * 0.95) - 1]
+    return f"{label:<16} mean {statistics.mean(timings):7.2f} ms   p50 {statistics.median(timings):7.2f} ms   p95 {p95:7.2f} ms"
+
+def run_benchmark(years: int, positions: int, searches: int, keep: bool):
+    engine = create_database_engine(os.environ["DATABASE_URL"])
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as connection:
+        # Building multi-year datasets takes longer than the app's statement timeout
+        connection.execute(text("SET statement_timeout = 0"))
+        print(f"Building {years} year(s) x {positions} positions...")
+        rows = build_dataset(connection, years, positions)
+        print(f"{rows} slots in {BENCHMARK_SCHEMA}.\"Schedule\"")
+
+        workload = random_searches(searches, years, positions)
+        time_searches(connection, workload[:20])  # warm the cache
+        without_index = time_searches(connection, workload)
+
+        ensure_schedule_index(connection, concurrently=False)
+        # Sets the visibility map, so the index can answer searches without visiting the table
+        connection.execute(text('VACUUM ANALYZE "Schedule"'))
+        time_searches(connection, workload[:20])
+        with_index = time_searches(connection, workload)
+
+        print(summarize("Without index", without_index))
+        print(summarize("With index", with_index))
+        print(f"Speed-up (p50): {statistics.median(without_index) / statistics.median(with_index):.1f}x")
+
+        if not keep:
+            connection.execute(text(f"DROP SCHEMA {BENCHMARK_SCHEMA} CASCADE"))
+    engine.dispose()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark slot search latency with and without the free-slot index.")
+    parser.add_argument("--years", type=int, default=3, help="Years of hourly slots to generate.")
+    parser.add_argument("--positions", type=int, default=50, help="Number of positions to generate.")
+    parser.add_argument("--searches", type=int, default=500, help="Slot searches to time per run.")
+    parser.add_argument("--keep", action="store_true", help=f"Keep the {BENCHMARK_SCHEMA} schema afterwards.")
+    args = parser.parse_args()
+    run_benchmark(args.years, args.positions, args.searches, args.keep)
@@ -1,14 +1,27 @@
 import os
 import sys
+import time
+import argparse
+import hashlib
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, FIRST_COMPLETED, wait
 from pinecone import Pinecone
-from langchain_openai import OpenAIEmbeddings
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain_community.document_loaders import PyPDFLoader
 from dotenv import load_dotenv
 
 # Add project root to sys.path to allow importing from backend
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
-from backend.app.config import JOB_ROLE_MAPPING
+from backend.app.config import (
+    JOB_ROLE_MAPPING, VECTOR_STORE_BACKEND, LOCAL_INDEX_DIR, EMBEDDING_MODEL, VECTOR_VERSION_GRACE_SECONDS,
+)
+from backend.app.services.vector_store import (
+    VERSIONS_DIRNAME, POINTER_NAMESPACE, new_version_name, make_pointer, new_revision, versions_to_keep,
+    write_local_index, read_local_index_vectors, read_local_overviews, read_local_pointer, local_version_dir,
+    publish_local_version, collect_local_garbage, read_pinecone_pointer, write_pinecone_pointer,
+    read_pinecone_overviews, write_pinecone_overview, overview_record_id,
+)
+from backend.app.services.rag_system import generate_role_overview
+from backend.app.services.openai_clients import create_embeddings
 
 # --- Configuration ---
 dotenv_path = os.path.join(os.path.dirname(__file__), '..', 'backend', '.env')
@@ -18,80 +31,283 @@ OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 PINECONE_API_KEY = os.getenv("PINECONE_API_KEY")
 PINECONE_INDEX_NAME = os.getenv("PINECONE_INDEX_NAME")
 SOURCE_DOCS_DIR = os.path.join(os.path.dirname(__file__), 'job_descriptions/')
+# Chunks per embeddings API request, and how many requests run at once.
+EMBED_BATCH_SIZE = int(os.getenv("INGEST_EMBED_BATCH_SIZE", "100"))
+EMBED_CONCURRENCY = int(os.getenv("INGEST_EMBED_CONCURRENCY", "4"))
+# PDFs parsed at once; parsed files waiting for the embedding stage are capped at twice that.
+PARSE_WORKERS = int(os.getenv("INGEST_PARSE_WORKERS", str(os.cpu_count() or 1)))
+UPSERT_BATCH_SIZE = 100
+DELETE_BATCH_SIZE = 1000
 
-if not all([OPENAI_API_KEY, PINECONE_API_KEY, PINECONE_INDEX_NAME]):
+if not OPENAI_API_KEY:
+    raise ValueError("API keys must be set.")
+if VECTOR_STORE_BACKEND == "pinecone" and not all([PINECONE_API_KEY, PINECONE_INDEX_NAME]):
     raise ValueError("API keys must be set.")
 
-pc = Pinecone(api_key=PINECONE_API_KEY)
-embeddings_model = OpenAIEmbeddings(model="text-embedding-3-small", openai_api_key=OPENAI_API_KEY)
+embeddings_model = create_embeddings(EMBEDDING_MODEL, chunk_size=EMBED_BATCH_SIZE)
 
-def load_and_chunk_documents():
-    print(f"Loading documents based on config...")
-    all_chunks = []
-    text_splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=150)
+text_splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=150)
 
+def parse_pdf(role_id, pdf_path):
+    """
+    Loads and chunks one PDF. Runs in a worker process, so it returns plain tuples
+    (cheap to send back) instead of LangChain documents.
+    """
+    start = time.perf_counter()
+    with open(pdf_path, "rb") as f:
+        pdf_hash = hashlib.sha256(f.read()).hexdigest()
+    documents = PyPDFLoader(pdf_path).load()
+    chunks = [
+        (chunk.page_content, chunk.metadata.get('source', 'Unknown'), chunk.metadata.get('page', 0))
+        for chunk in text_splitter.split_documents(documents)
+    ]
+    return role_id, os.path.basename(pdf_path), pdf_hash, chunks, time.perf_counter() - start
+
+def find_source_documents():
+    print(f"Loading documents based on config...")
+    jobs = []
     for role_id, role_info in JOB_ROLE_MAPPING.items():
         pdf_path = os.path.join(SOURCE_DOCS_DIR, role_info["pdf_filename"])
-        
         if not os.path.exists(pdf_path):
             print(f"Warning: PDF file not found for role '{role_id}': {pdf_path}")
             continue
+        jobs.append((role_id, pdf_path))
+    return jobs
 
-        print(f"Processing {role_info['pdf_filename']} for role ID: {role_id}...")
-        loader = PyPDFLoader(pdf_path)
-        documents = loader.load()
-        chunks = text_splitter.split_documents(documents)
-        
-        for chunk in chunks:
-            chunk.metadata['role_id'] = role_id
-            
-        all_chunks.extend(chunks)
-        print(f"  -> Created {len(chunks)} chunks.")
-        
-    return all_chunks
-
-def ingest_data():
-    try:
-        chunks = load_and_chunk_documents()
-        if not chunks:
-            print("No data to ingest. Exiting.")
-            return
-
-        print(f"Connecting to Pinecone index: '{PINECONE_INDEX_NAME}'...")
-        index = pc.Index(PINECONE_INDEX_NAME)
-        
-        # --- NEW: Check if the index has any vectors before deleting ---
-        index_stats = index.describe_index_stats()
-        if index_stats.total_vector_count > 0:
-            print("Clearing existing data from index...")
-            index.delete(delete_all=True)
-        else:
-            print("Index is already empty. Skipping deletion.")
-
-        print("Creating embeddings and uploading to Pinecone...")
-        vectors_to_upsert = []
-        for i, chunk in enumerate(chunks):
-            embedding = embeddings_model.embed_query(chunk.page_content)
-            vector = {
-                "id": f"jd_chunk_{i}",
+def iter_parsed_documents():
+    """
+    Parses the PDFs across a process pool and yields (role_id, pdf_hash, records) for each
+    file as soon as it is done, so embedding starts while the remaining files are still being parsed.
+    At most 2 x PARSE_WORKERS files are parsed or waiting at any time, which bounds memory.
+    """
+    jobs = iter(find_source_documents())
+    with ProcessPoolExecutor(max_workers=PARSE_WORKERS) as pool:
+        pending = set()
+        while True:
+            for role_id, pdf_path in jobs:
+                pending.add(pool.submit(parse_pdf, role_id, pdf_path))
+                if len(pending) >= 2 * PARSE_WORKERS:
+                    break
+            if not pending:
+                return
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                role_id, filename, pdf_hash, chunks, seconds = future.result()
+                print(f"Parsed {filename} for role ID: {role_id} -> {len(chunks)} chunks in {seconds:.2f}s.")
+                yield role_id, pdf_hash, build_records(role_id, chunks)
+
+def chunk_id(role_id, text):
+    """
+    Stable ID derived from the chunk content and the embedding model, so unchanged chunks
+    keep their ID across runs and a model change re-embeds everything.
+    The role prefix lets the IDs of one role be listed by prefix.
+    """
+    digest = hashlib.sha256(f"{EMBEDDING_MODEL}\0{text}".encode("utf-8")).hexdigest()[:32]
+    return f"{role_id}#{digest}"
+
+def build_records(role_id, chunks):
+    """Maps chunk ID -> chunk record. Identical chunks of one role collapse into one record."""
+    records = {}
+    for text, source, page in chunks:
+        record_id = chunk_id(role_id, text)
+        records.setdefault(record_id, {
+            "id": record_id,
+            "text": text,
+            "role_id": role_id,
+            "source": source,
+            "page": page
+        })
+    return records
+
+def embed_texts(texts):
+    """Embeds texts in batches of EMBED_BATCH_SIZE, with up to EMBED_CONCURRENCY requests in flight."""
+    if not texts:
+        return []
+    start = time.perf_counter()
+    batches = [texts[i:i + EMBED_BATCH_SIZE] for i in range(0, len(texts), EMBED_BATCH_SIZE)]
+    with ThreadPoolExecutor(max_workers=EMBED_CONCURRENCY) as pool:
+        results = list(pool.map(embeddings_model.embed_documents, batches))
+    print(f"  -> Embedded {len(texts)} chunks in {len(batches)} requests ({time.perf_counter() - start:.1f}s).")
+    return [vector for batch in results for vector in batch]
+
+def new_record_ids(records, existing_ids, seen_ids):
+    """IDs of the records that are neither in the index nor already handled earlier in this run."""
+    return [record_id for record_id in records if record_id not in existing_ids and record_id not in seen_ids]
+
+def refresh_overview(role_id, pdf_hash, records, stored_overviews, rebuild):
+    """
+    Returns the role's overview, generating it only when the PDF changed since it was stored.
+    Returns None when the stored overview is still current.
+    """
+    stored = stored_overviews.get(role_id)
+    if stored and stored["source_hash"] == pdf_hash and not rebuild:
+        return None
+    start = time.perf_counter()
+    text = generate_role_overview(role_id, [record["text"] for record in records.values()])
+    print(f"  -> Generated overview for role ID: {role_id} ({time.perf_counter() - start:.1f}s).")
+    return {"text": text, "source_hash": pdf_hash}
+
+def report_changes(seen_ids, new_count, orphan_ids):
+    print(f"{len(seen_ids)} chunks: {new_count} new or changed, "
+          f"{len(seen_ids) - new_count} unchanged, {len(orphan_ids)} orphaned.")
+
+def ingest_local_index(rebuild=False):
+    """
+    Writes a new version of the memory-mapped index served by VECTOR_STORE_BACKEND=local
+    and switches the pointer to it. Files of the live version are never modified.
+    """
+    print(f"Building a new version of the local index at '{LOCAL_INDEX_DIR}'...")
+    current_dir = local_version_dir(LOCAL_INDEX_DIR, read_local_pointer(LOCAL_INDEX_DIR))
+    existing_vectors = {} if rebuild else read_local_index_vectors(current_dir)
+    stored_overviews = read_local_overviews(current_dir)
+    # Only roles parsed in this run keep an overview, so a removed PDF takes its overview along
+    overviews = {}
+
+    # Orphans are dropped simply by not being written to the new version
+    chunks_by_role = {}
+    vectors_by_role = {}
+    seen_ids = set()
+    new_count = 0
+    for role_id, pdf_hash, records in iter_parsed_documents():
+        new_ids = new_record_ids(records, existing_vectors, seen_ids)
+        vectors = dict(zip(new_ids, embed_texts([records[record_id]["text"] for record_id in new_ids])))
+        new_count += len(new_ids)
+        overviews[role_id] = (refresh_overview(role_id, pdf_hash, records, stored_overviews, rebuild)
+                              or stored_overviews[role_id])
+        for record_id, record in records.items():
+            if record_id in seen_ids:
+                continue
+            seen_ids.add(record_id)
+            chunks_by_role.setdefault(record["role_id"], []).append(record)
+            vectors_by_role.setdefault(record["role_id"], []).append(vectors.get(record_id, existing_vectors.get(record_id)))
+
+    if not seen_ids:
+        print("No data to ingest. Exiting.")
+        return
+    report_changes(seen_ids, new_count, set(existing_vectors) - seen_ids)
+
+    version = new_version_name()
+    write_local_index(os.path.join(LOCAL_INDEX_DIR, VERSIONS_DIRNAME, version),
+                      EMBEDDING_MODEL, chunks_by_role, vectors_by_role, overviews)
+    publish_local_version(LOCAL_INDEX_DIR, version, VECTOR_VERSION_GRACE_SECONDS)
+    print(f"Local index now serves version '{version}' ({len(seen_ids)} vectors).")
+    collect_local_versions()
+
+def collect_local_versions():
+    for version in collect_local_garbage(LOCAL_INDEX_DIR, VECTOR_VERSION_GRACE_SECONDS):
+        print(f"Deleted expired local index version '{version}'.")
+
+def ingest_pinecone(rebuild=False):
+    """
+    Incremental runs update the live namespace in place. A rebuild fills a fresh namespace
+    and only then switches the version pointer to it, so queries never see a partial index.
+    Each file's new chunks are embedded and upserted as soon as it is parsed.
+    """
+    print(f"Connecting to Pinecone index: '{PINECONE_INDEX_NAME}'...")
+    pc = Pinecone(api_key=PINECONE_API_KEY)
+    index = pc.Index(PINECONE_INDEX_NAME)
+
+    dimension = index.describe_index_stats().dimension
+    pointer = read_pinecone_pointer(index)
+    stored_overviews = read_pinecone_overviews(index, list(JOB_ROLE_MAPPING))
+    if rebuild:
+        namespace = new_version_name()
+        existing_ids = set()
+        print(f"Rebuilding into new namespace '{namespace}'...")
+    else:
+        namespace = pointer["version"] if pointer else ""
+        existing_ids = {record_id for page in index.list(namespace=namespace) for record_id in page}
+
+    # New vectors go in before orphans are removed, so the index is never empty mid-run
+    seen_ids = set()
+    seen_roles = set()
+    new_count = 0
+    overviews_changed = False
+    for role_id, pdf_hash, records in iter_parsed_documents():
+        new_ids = new_record_ids(records, existing_ids, seen_ids)
+        seen_ids.update(records)
+        seen_roles.add(role_id)
+        overview = refresh_overview(role_id, pdf_hash, records, stored_overviews, rebuild)
+        if overview:
+            write_pinecone_overview(index, role_id, overview, dimension)
+            overviews_changed = True
+        if not new_ids:
+            continue
+        embeddings = embed_texts([records[record_id]["text"] for record_id in new_ids])
+        vectors_to_upsert = [
+            {
+                "id": record_id,
                 "values": embedding,
-                "metadata": {
-                    "text": chunk.page_content,
-                    "role_id": chunk.metadata['role_id'],
-                    "source": chunk.metadata.get('source', 'Unknown'),
-                    "page": chunk.metadata.get('page', 0)
-                }
+                "metadata": {key: value for key, value in records[record_id].items() if key != "id"}
             }
-            vectors_to_upsert.append(vector)
-        
-        print(f"Upserting {len(vectors_to_upsert)} vectors in batches...")
-        index.upsert(vectors=vectors_to_upsert, batch_size=100)
-        print("Successfully uploaded all vectors to Pinecone.")
+            for record_id, embedding in zip(new_ids, embeddings)
+        ]
+        index.upsert(vectors=vectors_to_upsert, batch_size=UPSERT_BATCH_SIZE, namespace=namespace)
+        new_count += len(new_ids)
+
+    if not seen_ids:
+        print("No data to ingest. Exiting.")
+        return
+    orphan_ids = sorted(existing_ids - seen_ids)
+    report_changes(seen_ids, new_count, orphan_ids)
+
+    for i in range(0, len(orphan_ids), DELETE_BATCH_SIZE):
+        index.delete(ids=orphan_ids[i:i + DELETE_BATCH_SIZE], namespace=namespace)
+    if orphan_ids:
+        print(f"Deleted {len(orphan_ids)} orphaned vectors.")
+    # Roles whose PDF is gone lose their overview along with their chunks
+    stale_overviews = [overview_record_id(role_id) for role_id in stored_overviews if role_id not in seen_roles]
+    if stale_overviews:
+        index.delete(ids=stale_overviews, namespace=POINTER_NAMESPACE)
+
+    if rebuild:
+        write_pinecone_pointer(index, make_pointer(namespace, pointer, VECTOR_VERSION_GRACE_SECONDS),
+                               dimension=dimension)
+        print(f"Pinecone index now serves namespace '{namespace}'.")
+    elif new_count or orphan_ids or stale_overviews or overviews_changed:
+        # Same namespace, new revision: tells the backend to drop answers cached from the old content
+        write_pinecone_pointer(index, new_revision(pointer, namespace), dimension=dimension)
+    print("Pinecone index is up to date.")
+    collect_pinecone_versions(index)
+
+def collect_pinecone_versions(index=None):
+    """Deletes the namespaces of versions that are neither live nor within the grace period."""
+    if index is None:
+        index = Pinecone(api_key=PINECONE_API_KEY).Index(PINECONE_INDEX_NAME)
+    pointer = read_pinecone_pointer(index)
+    if not pointer:
+        return
+    keep = versions_to_keep(pointer, VECTOR_VERSION_GRACE_SECONDS) | {POINTER_NAMESPACE}
+    for namespace in index.describe_index_stats().namespaces:
+        if namespace not in keep:
+            index.delete(delete_all=True, namespace=namespace)
+            print(f"Deleted expired namespace '{namespace or '(default)'}'.")
+
+def ingest_data(rebuild=False):
+    try:
+        start = time.perf_counter()
+        if VECTOR_STORE_BACKEND == "local":
+            ingest_local_index(rebuild)
+        else:
+            ingest_pinecone(rebuild)
+        print(f"Ingestion took {time.perf_counter() - start:.1f}s.")
 
     except Exception as e:
         print(f"An error occurred during data ingestion: {e}")
 
 if __name__ == "__main__":
-    print("Starting data ingestion process...")
-    ingest_data()
-    print("Ingestion process finished.")
+    parser = argparse.ArgumentParser(description="Ingest the job description PDFs into the vector store.")
+    parser.add_argument("--rebuild", action="store_true",
+                        help="re-embed every chunk into a new index version and switch to it when complete")
+    parser.add_argument("--gc-only", action="store_true",
+                        help="only delete index versions whose grace period has expired")
+    args = parser.parse_args()
+
+    if args.gc_only and VECTOR_STORE_BACKEND == "local":
+        collect_local_versions()
+    elif args.gc_only:
+        collect_pinecone_versions()
+    else:
+        print("Starting data ingestion process...")
+        ingest_data(rebuild=args.rebuild)
+        print("Ingestion process finished.")
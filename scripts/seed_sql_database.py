@@ -1,6 +1,7 @@
 import os
 import sys
 import random
+import argparse
 from sqlalchemy import create_engine, text, Table, Column, Integer, String, Date, Time, Boolean, MetaData
 from dotenv import load_dotenv
 from datetime import date, time, timedelta
@@ -8,6 +9,8 @@ from datetime import date, time, timedelta
 # Add project root to sys.path to allow importing from backend
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 from backend.app.config import JOB_ROLE_MAPPING
+from backend.app.services.schedule_schema import ensure_schedule_index, ensure_hold_table, SCHEDULE_SLOTS_INDEX
+from backend.app.services.availability_cache import notify_reset
 
 # --- Configuration ---
 dotenv_path = os.path.join(os.path.dirname(__file__), '..', 'backend', '.env')
@@ -69,11 +72,43 @@ def seed_database():
                     connection.execute(schedule_table.insert(), slots_to_add)
                 
                 print(f"Successfully inserted {len(slots_to_add)} sample time slots for 2025.")
+
+                # Built after the bulk insert, which is faster than maintaining it row by row
+                print(f"Creating index '{SCHEDULE_SLOTS_INDEX}'...")
+                ensure_schedule_index(connection, concurrently=False)
+
+                # Holds refer to slots of the old schedule
+                print("Creating 'ScheduleHold' table and clearing old holds...")
+                ensure_hold_table(connection)
+                connection.execute(text('DELETE FROM "ScheduleHold";'))
+                # Running backends drop their cached availability once the new schedule is committed
+                notify_reset(connection)
                 transaction.commit()
     except Exception as e:
         print(f"An error occurred during database seeding: {e}")
 
+def migrate_database():
+    """Applies schema changes to an existing 'Schedule' table without touching its data."""
+    try:
+        # CREATE INDEX CONCURRENTLY keeps the table writable but cannot run inside a transaction
+        with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as connection:
+            ensure_hold_table(connection)
+            print("Table 'ScheduleHold': present")
+            result = ensure_schedule_index(connection, concurrently=True)
+            print(f"Index '{SCHEDULE_SLOTS_INDEX}': {result}")
+    except Exception as e:
+        print(f"An error occurred during database migration: {e}")
+
 if __name__ == "__main__":
-    print("Starting PostgreSQL database seeding process...")
-    seed_database()
-    print("Seeding process finished.")
+    parser = argparse.ArgumentParser(description="Seed or migrate the interview schedule database.")
+    parser.add_argument("--migrate-only", action="store_true",
+                        help="Only apply schema changes (indexes, hold table) to the existing tables, keeping their data.")
+    args = parser.parse_args()
+    if args.migrate_only:
+        print("Starting PostgreSQL database migration...")
+        migrate_database()
+        print("Migration finished.")
+    else:
+        print("Starting PostgreSQL database seeding process...")
+        seed_database()
+        print("Seeding process finished.")